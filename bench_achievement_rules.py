@@ -0,0 +1,100 @@
+"""成就检查基准测试
+
+在临时数据库中生成不同规模的成就目录，对比原做法（每次读取全部成就、
+解析条件并逐条判断）与编译后的阈值数组（二分查找）在每次点击后检查成就的耗时。
+
+用法: python bench_achievement_rules.py [重复次数]
+"""
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from database.connection import registry
+from database.events import events, COUNT_ADDED
+from services.achievement_service import AchievementService
+
+CATALOG_SIZES = (33, 100, 300, 1000)
+
+
+def seed_catalog(db: DatabaseManager, size: int):
+    """补充自定义成就到指定数量（阈值随机，大部分尚未达到）"""
+    rng = random.Random(size)
+    conn = db.get_connection()
+    existing = conn.execute("SELECT COUNT(*) FROM achievements").fetchone()[0]
+    rows = []
+    for i in range(existing, size):
+        achievement_type, key = rng.choice([('QUANTITY', 'total_count'), ('STREAK', 'streak_days'),
+                                            ('SPEED', 'single_submit')])
+        rows.append((f"自定义成就{i}", achievement_type, 'BRONZE',
+                     json.dumps({key: rng.randint(100, 100000)}), int(achievement_type == 'SPEED')))
+    conn.executemany("""
+        INSERT INTO achievements (name, type, rarity, condition, repeatable)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+
+
+def linear_check(db: DatabaseManager, service: AchievementService) -> int:
+    """原做法：读取全部成就，逐条判断条件"""
+    achievements = db.get_all_achievements()
+    total_count = db.get_total_count()
+    streak_days = db.get_streak_days()
+    reached = 0
+    for achievement in achievements:
+        if not achievement.get('repeatable') and achievement['is_unlocked']:
+            continue
+        condition = achievement['condition']
+        if achievement['type'] == 'QUANTITY' and 'total_count' in condition:
+            reached += total_count >= condition['total_count']
+        elif achievement['type'] == 'STREAK' and 'streak_days' in condition:
+            reached += streak_days >= condition['streak_days']
+    return reached
+
+
+def compiled_check(db: DatabaseManager, service: AchievementService) -> int:
+    """新做法：模拟一次点击写入事件，快照 + 编译后的阈值数组"""
+    events.publish(COUNT_ADDED, db.db_path, records=[], single_submit=None)
+    return len(service.check_achievements())
+
+
+def bench(func, db, service, rounds: int) -> float:
+    """平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(db, service)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print(f"{'成就数':>8} {'逐条判断(ms)':>14} {'阈值数组(ms)':>14}")
+        for size in CATALOG_SIZES:
+            db_path = os.path.join(temp_dir, f'bench_rules_{size}.db')
+            db = DatabaseManager(db_path)
+            seed_catalog(db, size)
+            db.record_study(db.get_all_subjects()[0]['id'], 50, date.today())
+
+            service = AchievementService(db)
+            service.check_achievements()  # 解锁已达到的成就并编译规则
+
+            linear = bench(linear_check, db, service, rounds)
+            compiled = bench(compiled_check, db, service, rounds)
+            print(f"{size:>8} {linear:>14.3f} {compiled:>14.3f}")
+            registry.reset(db_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
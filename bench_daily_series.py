@@ -0,0 +1,112 @@
+"""每日序列基准测试
+
+在临时数据库中生成5年的模拟记录，对比逐日查询（原周/月趋势和热力图的做法）
+与一次分组查询生成连续序列的耗时。
+
+用法: python bench_daily_series.py [重复次数]
+"""
+import os
+import sys
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from database.connection import registry
+
+YEARS = 5
+
+
+def seed_database(db: DatabaseManager) -> int:
+    """写入5年的模拟记录（每天0~3个科目）"""
+    rng = random.Random(42)
+    subject_ids = [s['id'] for s in db.get_all_subjects()]
+    today = date.today()
+    start = today - timedelta(days=365 * YEARS)
+
+    def _records():
+        for offset in range(365 * YEARS + 1):
+            day = start + timedelta(days=offset)
+            for subject_id in rng.sample(subject_ids, rng.randint(0, len(subject_ids))):
+                yield subject_id, rng.randint(1, 40), day
+
+    return db.add_study_records_bulk(_records())['rows']
+
+
+def per_day_views(db: DatabaseManager) -> int:
+    """原做法：本周7次、本月每天1次逐日查询，热力图查询后建字典"""
+    conn = db.get_connection()
+    today = date.today()
+    total = 0
+
+    week_start = today - timedelta(days=today.weekday())
+    month_start = date(today.year, today.month, 1)
+    for start, days in ((week_start, 7), (month_start, 31)):
+        for i in range(days):
+            row = conn.execute("SELECT total FROM daily_totals WHERE record_date = ?",
+                               ((start + timedelta(days=i)).strftime('%Y-%m-%d'),)).fetchone()
+            total += row['total'] if row else 0
+
+    heatmap_start = today - timedelta(days=364)
+    rows = conn.execute("""
+        SELECT record_date, total FROM daily_totals
+        WHERE record_date >= ? AND record_date <= ?
+    """, (heatmap_start.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'))).fetchall()
+    data = {row['record_date']: row['total'] for row in rows}
+    for i in range(365):
+        total += data.get((heatmap_start + timedelta(days=i)).strftime('%Y-%m-%d'), 0)
+    return total
+
+
+def series_views(db: DatabaseManager) -> int:
+    """新做法：一次查询得到连续序列，各视图切片"""
+    today = date.today()
+    window_start = min(today - timedelta(days=364), date(today.year, 1, 1))
+    series = db.get_daily_series(window_start, date(today.year, 12, 31))
+
+    week_start = today - timedelta(days=today.weekday())
+    month_start = date(today.year, today.month, 1)
+    total = 0
+    for start, days in ((week_start, 7), (month_start, 31), (today - timedelta(days=364), 365)):
+        offset = (start - window_start).days
+        total += int(sum(series[offset:offset + days]))
+    return total
+
+
+def bench(func, db, rounds: int) -> float:
+    """平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(db)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, 'bench_series.db')
+    try:
+        db = DatabaseManager(db_path)
+        rows = seed_database(db)
+        print(f"模拟数据: {YEARS}年，{rows} 条记录")
+
+        per_day = bench(per_day_views, db, rounds)
+        series = bench(series_views, db, rounds)
+        full = bench(lambda d: d.get_daily_series(date.today() - timedelta(days=365 * YEARS), date.today()),
+                     db, rounds)
+
+        print(f"逐日查询（周+月+热力图）: {per_day:8.3f} ms")
+        print(f"连续序列（周+月+年+热力图）: {series:8.3f} ms")
+        print(f"5年完整序列: {full:8.3f} ms")
+    finally:
+        registry.reset(db_path)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""AI平台HTTP连接池基准测试
+
+在本地启动一个模拟OpenAI兼容接口的HTTP服务，对比每次 requests.post 新建连接
+（原做法）与按平台复用keep-alive会话的单次请求耗时，并统计服务端建立的连接数。
+本地回环没有DNS和TLS握手，真实平台上冷连接的开销更大。
+
+用法: python bench_http_pool.py [请求次数]
+"""
+import os
+import sys
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+from services.http_pool import HttpSessionPool
+from config.settings import AI_HTTP_POOL_MAXSIZE
+
+RESPONSE = json.dumps({
+    'choices': [{'message': {'role': 'assistant', 'content': '继续加油！'}}]
+}, ensure_ascii=False).encode('utf-8')
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """模拟 /chat/completions 接口（HTTP/1.1，支持keep-alive）"""
+
+    protocol_version = 'HTTP/1.1'
+    # 响应头和内容一次发送，避免Nagle算法和延迟确认造成的40ms等待
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def _payload():
+    return {
+        'headers': {'Authorization': 'Bearer test', 'Content-Type': 'application/json'},
+        'json': {'model': 'stub', 'messages': [{'role': 'user', 'content': '鼓励一下'}]},
+        'timeout': 5,
+    }
+
+
+def bench(func, rounds: int):
+    """平均耗时（毫秒）和服务端新建连接数"""
+    _StubHandler.connections = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        response = func()
+        assert response.status_code == 200
+    return (time.perf_counter() - start) * 1000 / rounds, _StubHandler.connections
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    pool = HttpSessionPool()
+    try:
+        cold, cold_connections = bench(
+            lambda: requests.post(f"{base_url}/chat/completions", **_payload()), rounds)
+        warm, warm_connections = bench(
+            lambda: pool.post(base_url, 'chat/completions', **_payload()), rounds)
+
+        # 后台线程并发请求（每次请求一个新线程，同异步鼓励；并发数等于每主机连接数）
+        _StubHandler.connections = 0
+        threads = [threading.Thread(target=pool.post, args=(base_url, 'chat/completions'),
+                                    kwargs=_payload()) for _ in range(rounds)]
+        start = time.perf_counter()
+        for i in range(0, rounds, AI_HTTP_POOL_MAXSIZE):
+            batch = threads[i:i + AI_HTTP_POOL_MAXSIZE]
+            for thread in batch:
+                thread.start()
+            for thread in batch:
+                thread.join()
+        threaded = (time.perf_counter() - start) * 1000 / rounds
+
+        print(f"请求次数: {rounds}")
+        print(f"每次新建连接 requests.post: {cold:7.3f} ms/次，服务端连接 {cold_connections}")
+        print(f"复用keep-alive会话:        {warm:7.3f} ms/次，服务端连接 {warm_connections}")
+        print(f"{AI_HTTP_POOL_MAXSIZE}个后台线程并发（复用）:    {threaded:7.3f} ms/次，服务端连接 {_StubHandler.connections}")
+    finally:
+        pool.close()
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
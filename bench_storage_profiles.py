@@ -0,0 +1,58 @@
+"""存储方案提交延迟基准测试
+
+对每个存储方案在临时数据库中执行多次"+1"写入（每次一个提交），
+输出单次提交的平均值、中位数和P95延迟。
+
+用法: python bench_storage_profiles.py [写入次数]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import DATABASE_STORAGE_PROFILES
+from database.db_manager import DatabaseManager
+from database.connection import registry
+
+
+def bench_profile(profile: str, iterations: int) -> dict:
+    """测试单个存储方案"""
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, f'bench_{profile}.db')
+    try:
+        db = DatabaseManager(db_path, storage_profile=profile)
+        subject_id = db.get_all_subjects()[0]['id']
+
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            db.add_study_record(subject_id, 1)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        latencies.sort()
+        return {
+            'profile': profile,
+            'mean': sum(latencies) / len(latencies),
+            'p50': latencies[len(latencies) // 2],
+            'p95': latencies[int(len(latencies) * 0.95) - 1]
+        }
+    finally:
+        registry.reset(db_path)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    print(f"存储方案提交延迟（{iterations}次写入，单位ms）")
+    print(f"{'方案':<10}{'平均':>10}{'P50':>10}{'P95':>10}")
+    for profile in DATABASE_STORAGE_PROFILES:
+        result = bench_profile(profile, iterations)
+        print(f"{result['profile']:<10}{result['mean']:>10.3f}{result['p50']:>10.3f}{result['p95']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
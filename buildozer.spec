@@ -18,7 +18,8 @@ source.include_exts = py,png,jpg,kv,atlas,json,txt
 # 版本号
 version = 1.0.0
 
-# 应用依赖
+# 应用依赖（sqlite3 为打包的SQLite，需3.25+支持UPSERT和窗口函数；
+# 早于3.35时 RETURNING 和 UPDATE ... FROM 自动改为先写入再查询，见 database/db_manager.py）
 requirements = python3==3.9,kivy==2.2.1,kivymd==1.1.1,requests,cryptography,pillow,sqlite3
 
 # 排除不必要的文件
@@ -5,7 +5,8 @@ ACHIEVEMENT_TYPES = {
     'QUANTITY': '数量型',
     'STREAK': '连续型',
     'SPEED': '速度型',
-    'VERSATILE': '全能型'
+    'VERSATILE': '全能型',
+    'CUSTOM': '自定义'
 }
 
 # 成就稀有度
@@ -336,6 +337,24 @@ PRESET_ACHIEVEMENTS = [
         'condition': {'single_submit': 100},
         'icon': '💨',
         'repeatable': True
+    },
+    {
+        'name': '一气呵成',
+        'description': '10分钟内完成30题',
+        'type': 'SPEED',
+        'rarity': 'BRONZE',
+        'condition': {'tap_rate': 30, 'window_minutes': 10},
+        'icon': '🔥',
+        'repeatable': True
+    },
+    {
+        'name': '势如破竹',
+        'description': '30分钟内完成100题',
+        'type': 'SPEED',
+        'rarity': 'SILVER',
+        'condition': {'tap_rate': 100, 'window_minutes': 30},
+        'icon': '🎯',
+        'repeatable': True
     }
 ]
 
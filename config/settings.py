@@ -14,6 +14,47 @@ ASSETS_DIR = os.path.join(BASE_DIR, 'assets')
 # 确保数据目录存在
 os.makedirs(os.path.join(BASE_DIR, 'data'), exist_ok=True)
 
+# 数据库存储配置
+DATABASE_STORAGE_PROFILE = 'balanced'  # 存储方案：durable / balanced / fast
+DATABASE_STORAGE_PROFILES = {
+    # 最稳妥：回滚日志 + 每次提交完整同步
+    'durable': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'mmap_size': 0,
+        'cache_size': -2000,  # 负数表示KB
+        'temp_store': 'DEFAULT'
+    },
+    # 均衡（默认）：WAL日志，断电最多丢失最后一次提交，不会损坏数据库
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 32 * 1024 * 1024,
+        'cache_size': -8000,
+        'temp_store': 'MEMORY'
+    },
+    # 最快：不等待磁盘同步，系统崩溃时可能丢失最近的数据
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'mmap_size': 128 * 1024 * 1024,
+        'cache_size': -16000,
+        'temp_store': 'MEMORY'
+    }
+}
+
+# 数据库查询统计（开发调试用）
+DB_PROFILING_ENABLED = False  # 是否记录每条SQL的耗时（只影响新建连接）
+DB_SLOW_QUERY_MS = 50  # 慢查询阈值（毫秒）
+DB_EXPLAIN_SAMPLE_RATE = 0.05  # 采样 EXPLAIN QUERY PLAN 的比例
+DB_SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'data', 'slow_queries.log')
+
+# 导入配置
+IMPORT_CHUNK_SIZE = 1000  # 批量导入时每个事务写入的记录数
+
+# 内存学习历史
+HISTORY_STORE_MAX_BYTES = 8 * 1024 * 1024  # 按天展开的历史数组内存上限（超出时改用SQL查询）
+
 # 默认配置
 DEFAULT_DAILY_TARGET = 20  # 默认每日目标
 DEFAULT_TOTAL_TARGET = 10000  # 默认总目标
@@ -24,8 +65,24 @@ AI_REQUEST_TIMEOUT = 30  # API请求超时（秒）增加到30秒
 AI_MIN_INTERVAL = 300  # 最小请求间隔（秒）
 AI_MAX_TOKENS = 1500  # 最大生成token数（报告需要更多token）
 AI_TEMPERATURE = 0.8  # 温度参数
+AI_HTTP_POOL_CONNECTIONS = 4  # 每个平台会话缓存的主机连接池数
+AI_HTTP_POOL_MAXSIZE = 4  # 每个主机保持的keep-alive连接数（同时请求的后台线程数）
+AI_STREAM_RENDER_INTERVAL = 0.1  # 流式输出刷新界面的最小间隔（秒）
+AI_EXECUTOR_WORKERS = 2  # 执行AI请求的后台线程数
+AI_CACHE_TTL_SECONDS = 3 * 24 * 3600  # 缓存的鼓励在多久内直接复用（秒）
+AI_CACHE_VARIANTS = 3  # 每种情况缓存几条不同的鼓励（集满后轮换使用）
+AI_CACHE_MAX_ENTRIES = 300  # 缓存的鼓励总条数上限（超出时淘汰最久未用的）
+AI_CACHE_OFFLINE_RETRY_SECONDS = 60  # 连不上API后多久内直接使用缓存（秒）
+AI_PREGEN_DAILY_CALLS = 6  # 每天最多预生成几条鼓励（API调用次数）
+AI_PREGEN_QUEUE_SIZE = 3  # 每个身份最多预先准备几条鼓励
+AI_PREGEN_IDLE_SECONDS = 30  # 多久没有操作算空闲（秒）
+AI_PREGEN_CHECK_INTERVAL = 60  # 多久检查一次是否需要预生成（秒）
+AI_PREGEN_GOAL_RATIO = 0.7  # 今日完成目标的多少比例后预生成"完成每日目标"的鼓励
+AI_PREGEN_NETWORK_TIMEOUT = 2  # 预生成前检查网络时连接API主机的超时（秒）
 
 # UI配置
 ANIMATION_DURATION = 0.3  # 动画时长（秒）
 PARTICLE_COUNT = 30  # 粒子数量
 COMBO_THRESHOLD = 1.0  # Combo触发间隔（秒）
+TAP_FLUSH_IDLE_SECONDS = 1.5  # "+1"停止点击多久后写入数据库（秒）
+STUDY_SESSION_GAP_SECONDS = 300  # 停止刷题多久后结束一段学习会话（秒）
@@ -0,0 +1,17 @@
+"""测试公共夹具"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.connection import registry
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """临时数据库路径（测试结束后关闭本线程的连接并重置初始化状态，文件由pytest清理）"""
+    path = str(tmp_path / 'test.db')
+    yield path
+    registry.reset(path)
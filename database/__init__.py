@@ -1,3 +1,4 @@
 """数据库模块"""
 from .db_manager import DatabaseManager
+from .connection import ConnectionRegistry, registry
 from .models import *
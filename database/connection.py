@@ -0,0 +1,181 @@
+"""数据库连接注册表
+
+进程内共享的SQLite连接管理：每个线程每个数据库路径一个连接，
+表结构初始化在每个进程中对每个数据库路径只执行一次。
+存储方案的 journal_mode 对整个数据库生效，同一进程内一个数据库只使用一种存储方案。
+注册表的连接提交写入时计数，缓存据此区分本进程和其他进程的写入。
+"""
+import sqlite3
+import threading
+from typing import Callable, Dict
+from config.settings import DATABASE_STORAGE_PROFILE, DATABASE_STORAGE_PROFILES
+from .instrumentation import ProfilingConnection, is_profiling_enabled
+
+
+def apply_storage_profile(conn: sqlite3.Connection, profile: str = DATABASE_STORAGE_PROFILE):
+    """
+    应用存储方案（journal_mode、synchronous、mmap_size、cache_size、temp_store）
+
+    Args:
+        conn: 数据库连接
+        profile: 存储方案名称，见 DATABASE_STORAGE_PROFILES
+    """
+    if profile not in DATABASE_STORAGE_PROFILES:
+        raise ValueError(f"未知的存储方案: {profile}")
+
+    options = DATABASE_STORAGE_PROFILES[profile]
+    conn.execute(f"PRAGMA journal_mode = {options['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {options['synchronous']}")
+    conn.execute(f"PRAGMA mmap_size = {int(options['mmap_size'])}")
+    conn.execute(f"PRAGMA cache_size = {int(options['cache_size'])}")
+    conn.execute(f"PRAGMA temp_store = {options['temp_store']}")
+
+
+class RegistryConnection(sqlite3.Connection):
+    """注册表创建的连接（提交写入事务时计入本进程的提交次数）"""
+
+    db_path: str = None
+    profile: str = None
+
+    def commit(self):
+        writing = self.in_transaction
+        super().commit()
+        if writing:
+            registry.note_commit(self.db_path)
+
+
+class _ProfilingRegistryConnection(RegistryConnection, ProfilingConnection):
+    """带统计的注册表连接"""
+
+
+class ConnectionRegistry:
+    """连接注册表（按线程、按数据库路径复用连接）"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._initialized = set()
+        self._schema_init_counts: Dict[str, int] = {}
+        self._commit_counts: Dict[str, int] = {}
+        self._commit_lock = threading.Lock()
+        self._profiles: Dict[str, str] = {}
+        self._profile_lock = threading.Lock()
+
+    def _connections(self) -> Dict[str, sqlite3.Connection]:
+        """当前线程的连接字典"""
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = {}
+            self._local.connections = connections
+        return connections
+
+    def get_connection(self, db_path: str,
+                       profile: str = DATABASE_STORAGE_PROFILE) -> sqlite3.Connection:
+        """
+        获取当前线程的连接（不存在则创建）
+
+        Args:
+            db_path: 数据库路径
+            profile: 存储方案，同一数据库必须与第一次打开时相同
+
+        Raises:
+            ValueError: 存储方案未知，或该数据库已以其他存储方案打开
+        """
+        connections = self._connections()
+        conn = connections.get(db_path)
+        if conn is not None and conn.profile == profile:
+            return conn
+
+        self._claim_profile(db_path, profile)
+        if conn is None:
+            if is_profiling_enabled():
+                conn = sqlite3.connect(db_path, factory=_ProfilingRegistryConnection)
+            else:
+                conn = sqlite3.connect(db_path, factory=RegistryConnection)
+            conn.db_path = db_path
+            conn.profile = profile
+            conn.row_factory = sqlite3.Row  # 返回字典格式
+            apply_storage_profile(conn, profile)
+            connections[db_path] = conn
+        return conn
+
+    def _claim_profile(self, db_path: str, profile: str):
+        """记录数据库使用的存储方案（已使用其他方案时报错，避免设置被静默忽略）"""
+        if profile not in DATABASE_STORAGE_PROFILES:
+            raise ValueError(f"未知的存储方案: {profile}")
+        with self._profile_lock:
+            current = self._profiles.setdefault(db_path, profile)
+        if current != profile:
+            raise ValueError(f"数据库已使用存储方案 {current}，不能再以 {profile} 打开: {db_path}")
+
+    def close_connection(self, db_path: str):
+        """关闭当前线程的连接"""
+        conn = self._connections().pop(db_path, None)
+        if conn is not None:
+            conn.close()
+
+    def note_commit(self, db_path: str):
+        """记录一次本进程连接提交的写入"""
+        with self._commit_lock:
+            self._commit_counts[db_path] = self._commit_counts.get(db_path, 0) + 1
+
+    def local_commits(self, db_path: str) -> int:
+        """
+        本进程的连接对指定数据库提交写入的次数
+
+        PRAGMA data_version 变化而本计数不变时，写入来自其他进程（或注册表以外的连接）。
+        """
+        return self._commit_counts.get(db_path, 0)
+
+    def ensure_schema(self, db_path: str, initializer: Callable[[], None]):
+        """
+        确保数据库表结构已初始化（每个进程每个路径只执行一次）
+
+        Args:
+            db_path: 数据库路径
+            initializer: 实际执行初始化的函数
+        """
+        if db_path in self._initialized:
+            return
+
+        with self._lock:
+            if db_path in self._initialized:
+                return
+            initializer()
+            self._schema_init_counts[db_path] = self._schema_init_counts.get(db_path, 0) + 1
+            self._initialized.add(db_path)
+
+    def schema_init_count(self, db_path: str) -> int:
+        """获取指定数据库在本进程中执行表结构初始化的次数"""
+        return self._schema_init_counts.get(db_path, 0)
+
+    def reset(self, db_path: str = None):
+        """
+        重置初始化状态（用于测试或数据库文件被替换后）
+
+        Args:
+            db_path: 数据库路径，默认重置全部
+        """
+        with self._lock:
+            if db_path is None:
+                self._initialized.clear()
+                self._schema_init_counts.clear()
+            else:
+                self._initialized.discard(db_path)
+                self._schema_init_counts.pop(db_path, None)
+
+        with self._profile_lock:
+            if db_path is None:
+                self._profiles.clear()
+            else:
+                self._profiles.pop(db_path, None)
+
+        if db_path is None:
+            for path in list(self._connections()):
+                self.close_connection(path)
+        else:
+            self.close_connection(db_path)
+
+
+# 全局连接注册表
+registry = ConnectionRegistry()
@@ -0,0 +1,51 @@
+"""日期编号
+
+学习记录除了日期字符串外还保存整数天编号（1970-01-01 为第0天），
+区间查询直接比较整数列，可以使用 (day, subject_id, count) 覆盖索引。
+"""
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy是可选依赖，没有时使用标准库array
+    np = None
+
+EPOCH = date(1970, 1, 1)
+
+# SQL中由日期计算天编号的表达式（julianday('1970-01-01') = 2440587.5）
+DAY_NUMBER_SQL = "CAST(julianday({column}) - 2440587.5 AS INTEGER)"
+
+DateLike = Union[date, datetime, str]
+
+
+def day_number(value: DateLike) -> int:
+    """日期（date/datetime/'YYYY-MM-DD'）转为天编号"""
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = datetime.strptime(value[:10], '%Y-%m-%d').date()
+    return (value - EPOCH).days
+
+
+def day_to_date(day: int) -> date:
+    """天编号转为日期"""
+    return EPOCH + timedelta(days=day)
+
+
+def day_to_str(day: int) -> str:
+    """天编号转为 'YYYY-MM-DD'"""
+    return day_to_date(day).strftime('%Y-%m-%d')
+
+
+def day_range(start: DateLike, end: DateLike) -> Tuple[int, int]:
+    """日期区间（含首尾）转为天编号区间"""
+    return day_number(start), day_number(end)
+
+
+def zero_series(length: int):
+    """长度为length的全0整数序列（有NumPy时为ndarray，否则为array('l')）"""
+    if np is not None:
+        return np.zeros(length, dtype=np.int64)
+    return array('l', [0]) * length
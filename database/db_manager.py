@@ -2,254 +2,451 @@
 import sqlite3
 import json
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Any, Optional
-from config.settings import DATABASE_PATH
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from config.settings import DATABASE_PATH, DATABASE_STORAGE_PROFILE
 from config.constants import PRESET_ACHIEVEMENTS, PRESET_AI_IDENTITIES
-from .models import ALL_TABLES, CREATE_INDEXES
+from .models import (ALL_TABLES, CREATE_INDEXES, CREATE_TRIGGERS,
+                     REBUILD_DAILY_TOTALS, REBUILD_STREAK_RUNS)
+from .connection import registry
+from .day_numbers import DAY_NUMBER_SQL, day_number, day_range, day_to_str, zero_series
+from .instrumentation import query_stats
+from .events import (events, COUNT_ADDED, DAY_ROLLED, RECORDS_DELETED, SUBJECT_ADDED,
+                     SUBJECTS_CHANGED, GOALS_CHANGED, ACHIEVEMENTS_RESET,
+                     ACHIEVEMENTS_CHANGED)
+from .migrations import SCHEMA_VERSION, apply_migrations, get_schema_version
+
+# RETURNING 需要 SQLite 3.35+，UPDATE ... FROM 需要 3.33+（打包的SQLite更旧时改为先写入再查询）
+SQLITE_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+SQLITE_UPDATE_FROM = sqlite3.sqlite_version_info >= (3, 33, 0)
 
 
 class DatabaseManager:
     """数据库管理类"""
     
-    def __init__(self, db_path: str = DATABASE_PATH):
+    def __init__(self, db_path: str = DATABASE_PATH,
+                 storage_profile: str = DATABASE_STORAGE_PROFILE):
         self.db_path = db_path
-        self.connection = None
-        self.initialize_database()
+        self.storage_profile = storage_profile
+        # 表结构每个进程只初始化一次，连接由注册表按线程复用
+        registry.ensure_schema(db_path, self.initialize_database)
     
     def get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        if self.connection is None:
-            self.connection = sqlite3.connect(self.db_path)
-            self.connection.row_factory = sqlite3.Row  # 返回字典格式
-        return self.connection
+        """获取数据库连接（当前线程共享）"""
+        return registry.get_connection(self.db_path, self.storage_profile)
     
     def close(self):
-        """关闭数据库连接"""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        """关闭当前线程的数据库连接"""
+        registry.close_connection(self.db_path)
     
     def initialize_database(self):
-        """初始化数据库"""
+        """初始化数据库（已是最新版本时直接返回）"""
         conn = self.get_connection()
+        
+        current_version = get_schema_version(conn)
+        if current_version >= SCHEMA_VERSION:
+            return
+        
         cursor = conn.cursor()
         
         try:
+            # 建表、迁移和默认数据在同一个事务中完成
+            cursor.execute("BEGIN")
+            
+            cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'")
+            is_new_database = cursor.fetchone()[0] == 0
+            
             # 创建所有表
             for table_sql in ALL_TABLES:
                 cursor.execute(table_sql)
             
-            # 创建索引
+            # 执行缺失的迁移步骤
+            apply_migrations(cursor, current_version, verbose=not is_new_database)
+            
+            # 创建索引（迁移可能需要先清理数据才能建唯一索引）
             for index_sql in CREATE_INDEXES:
                 cursor.execute(index_sql)
             
-            conn.commit()
-            
-            # 数据库迁移：添加科目的daily_target字段
-            self.migrate_add_subject_daily_target()
-            
-            # 数据库迁移：添加科目的total_target字段
-            self.migrate_add_subject_total_target()
-            
-            # 数据库迁移：升级成就系统支持计数
-            self.migrate_achievement_count()
-            
-            # 数据库迁移：添加成就可重复标记
-            self.migrate_achievement_repeatable()
+            # 创建触发器
+            for trigger_sql in CREATE_TRIGGERS:
+                cursor.execute(trigger_sql)
             
             # 初始化默认数据
-            self._initialize_default_data()
+            self._initialize_default_data(cursor)
+            
+            conn.commit()
             
         except Exception as e:
             conn.rollback()
             raise Exception(f"数据库初始化失败: {e}")
     
-    def migrate_add_subject_daily_target(self):
-        """迁移：给subjects表添加daily_target字段"""
+    def _initialize_default_data(self, cursor: sqlite3.Cursor):
+        """初始化默认数据（由initialize_database在事务中调用）"""
+        # 检查是否已初始化
+        cursor.execute("SELECT COUNT(*) FROM users")
+        if cursor.fetchone()[0] == 0:
+            # 创建默认用户
+            cursor.execute("INSERT INTO users (daily_target, total_target) VALUES (20, 10000)")
+        
+        # 初始化预设成就
+        cursor.execute("SELECT COUNT(*) FROM achievements")
+        if cursor.fetchone()[0] == 0:
+            for achievement in PRESET_ACHIEVEMENTS:
+                cursor.execute("""
+                    INSERT INTO achievements (name, description, type, rarity, icon, condition, repeatable)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    achievement['name'],
+                    achievement['description'],
+                    achievement['type'],
+                    achievement['rarity'],
+                    achievement['icon'],
+                    json.dumps(achievement['condition']),
+                    1 if achievement.get('repeatable', False) else 0
+                ))
+        
+        # 初始化预设AI身份
+        cursor.execute("SELECT COUNT(*) FROM ai_identities")
+        if cursor.fetchone()[0] == 0:
+            for identity in PRESET_AI_IDENTITIES:
+                cursor.execute("""
+                    INSERT INTO ai_identities 
+                    (name, type, description, system_prompt, color_primary, color_accent, tone_style)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    identity['name'],
+                    identity['type'],
+                    identity['description'],
+                    identity['system_prompt'],
+                    identity['color_primary'],
+                    identity['color_accent'],
+                    identity['tone_style']
+                ))
+        
+        # 初始化默认科目
+        cursor.execute("SELECT COUNT(*) FROM subjects")
+        if cursor.fetchone()[0] == 0:
+            default_subjects = [
+                ('算法训练', '#4A7FFF', '💻'),
+                ('数学专题', '#27AE60', '📐'),
+                ('英语阅读', '#E67E22', '📖')
+            ]
+            for name, color, icon in default_subjects:
+                cursor.execute("""
+                    INSERT INTO subjects (name, color, icon)
+                    VALUES (?, ?, ?)
+                """, (name, color, icon))
+    
+    # ==================== 学习记录相关 ====================
+    
+    def add_study_record(self, subject_id: int, count: int, record_date: date = None) -> int:
+        """添加学习记录"""
+        return self.record_study(subject_id, count, record_date)['record_id']
+    
+    def record_study(self, subject_id: int, count: int, record_date: date = None) -> Dict[str, Any]:
+        """
+        添加学习记录（单条UPSERT，一次提交）
+        
+        Args:
+            subject_id: 科目ID
+            count: 题目数量
+            record_date: 记录日期，默认今天
+            
+        Returns:
+            {'record_id': 记录ID, 'day_count': 该科目当天题数, 'subject_total': 该科目总题数}
+        """
+        if record_date is None:
+            record_date = date.today()
+        day = day_number(record_date)
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # 检查字段是否存在
-            cursor.execute("PRAGMA table_info(subjects)")
-            columns = [col[1] for col in cursor.fetchall()]
+            # 当天已有记录则累加，否则插入
+            upsert = """
+                INSERT INTO study_records (subject_id, count, record_date, day)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(subject_id, record_date) DO UPDATE SET count = count + excluded.count
+            """
+            if SQLITE_RETURNING:
+                cursor.execute(upsert + "RETURNING id, count", (subject_id, count, record_date, day))
+                record = cursor.fetchall()[0]
+                
+                # 更新科目总数（同时取回当天总数：等于本次题数说明是当天第一条记录）
+                cursor.execute("""
+                    UPDATE subjects SET total_count = total_count + ? WHERE id = ?
+                    RETURNING total_count,
+                              (SELECT total FROM daily_totals WHERE record_date = ?) AS day_total
+                """, (count, subject_id, record_date))
+                subject = cursor.fetchall()
+            else:
+                cursor.execute(upsert, (subject_id, count, record_date, day))
+                cursor.execute("""
+                    SELECT id, count FROM study_records WHERE subject_id = ? AND record_date = ?
+                """, (subject_id, record_date))
+                record = cursor.fetchone()
+                
+                cursor.execute("UPDATE subjects SET total_count = total_count + ? WHERE id = ?",
+                               (count, subject_id))
+                cursor.execute("""
+                    SELECT total_count,
+                           (SELECT total FROM daily_totals WHERE record_date = ?) AS day_total
+                    FROM subjects WHERE id = ?
+                """, (record_date, subject_id))
+                subject = cursor.fetchall()
+            new_days = [day] if subject and subject[0]['day_total'] == count else []
+            
+            conn.commit()
+            self._publish_added([(subject_id, day, count)], new_days, single_submit=count)
+            return {
+                'record_id': record['id'],
+                'day_count': record['count'],
+                'subject_total': subject[0]['total_count'] if subject else 0
+            }
             
-            if 'daily_target' not in columns:
-                print("[INFO] 迁移：添加subjects.daily_target字段")
-                cursor.execute("ALTER TABLE subjects ADD COLUMN daily_target INTEGER DEFAULT 20")
-                conn.commit()
-                print("[OK] 迁移成功")
         except Exception as e:
-            print(f"[WARN] 迁移失败（可能字段已存在）: {e}")
+            conn.rollback()
+            print(f"[ERROR] 添加学习记录失败: {e}")
+            raise Exception(f"添加学习记录失败: {e}")
     
-    def migrate_add_subject_total_target(self):
-        """迁移：给subjects表添加total_target字段"""
+    def add_study_records_bulk(self, records: Iterable[Tuple[int, int, Any]]) -> Dict[str, int]:
+        """
+        批量写入学习记录（一个事务，executemany UPSERT）
+        
+        各科目总数在写入过程中累计增量，最后每个科目只更新一次。
+        
+        Args:
+            records: 可迭代的 (科目ID, 题目数量, 记录日期) 元组，日期为None时取今天
+            
+        Returns:
+            {'rows': 写入的记录数, 'subjects': 涉及的科目数}
+        """
+        deltas: Dict[int, int] = {}
+        added: Dict[Tuple[int, int], int] = {}
+        
+        def _rows():
+            for subject_id, count, record_date in records:
+                deltas[subject_id] = deltas.get(subject_id, 0) + count
+                record_date = record_date or date.today()
+                day = day_number(record_date)
+                added[(subject_id, day)] = added.get((subject_id, day), 0) + count
+                yield (subject_id, count, record_date, day)
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # 检查字段是否存在
-            cursor.execute("PRAGMA table_info(subjects)")
-            columns = [col[1] for col in cursor.fetchall()]
+            cursor.executemany("""
+                INSERT INTO study_records (subject_id, count, record_date, day)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(subject_id, record_date) DO UPDATE SET count = count + excluded.count
+            """, _rows())
+            rows = cursor.rowcount
+            
+            cursor.executemany("""
+                UPDATE subjects SET total_count = total_count + ? WHERE id = ?
+            """, [(delta, subject_id) for subject_id, delta in deltas.items()])
+            
+            day_counts: Dict[int, int] = {}
+            for (_, day), count in added.items():
+                day_counts[day] = day_counts.get(day, 0) + count
+            new_days = self._newly_active_days(cursor, day_counts)
+            
+            conn.commit()
+            self._publish_added([(subject_id, day, count) for (subject_id, day), count in added.items()],
+                                new_days)
+            return {'rows': rows, 'subjects': len(deltas)}
             
-            if 'total_target' not in columns:
-                print("[INFO] 迁移：添加subjects.total_target字段")
-                cursor.execute("ALTER TABLE subjects ADD COLUMN total_target INTEGER DEFAULT 0")
-                conn.commit()
-                print("[OK] 迁移成功：subjects.total_target")
         except Exception as e:
-            print(f"[WARN] 迁移失败（可能字段已存在）: {e}")
+            conn.rollback()
+            print(f"[ERROR] 批量写入学习记录失败: {e}")
+            raise Exception(f"批量写入学习记录失败: {e}")
+    
+    def _newly_active_days(self, cursor: sqlite3.Cursor, day_counts: Dict[int, int]) -> List[int]:
+        """
+        本次写入前没有记录的日期（写入后当天总数等于本次新增数）
+        
+        Args:
+            cursor: 写入事务中的游标
+            day_counts: {天编号: 本次新增题数}
+        """
+        if not day_counts:
+            return []
+        cursor.execute("""
+            SELECT record_date, total FROM daily_totals
+            WHERE record_date BETWEEN ? AND ?
+        """, (day_to_str(min(day_counts)), day_to_str(max(day_counts))))
+        totals = {day_number(row['record_date']): row['total'] for row in cursor.fetchall()}
+        return sorted(day for day, count in day_counts.items() if count > 0 and totals.get(day) == count)
     
-    def migrate_achievement_count(self):
-        """迁移：升级成就系统支持计数"""
+    def _publish_added(self, records: List[Tuple[int, int, int]], new_days: List[int],
+                       single_submit: int = None):
+        """发布新增题数事件（有新打卡日期时同时发布 DAY_ROLLED）"""
+        events.publish(COUNT_ADDED, self.db_path, records=records, single_submit=single_submit)
+        if new_days:
+            events.publish(DAY_ROLLED, self.db_path, days=new_days)
+    
+    def get_total_between(self, start_date, end_date) -> int:
+        """
+        获取日期区间内的总题数（含首尾，走天编号覆盖索引）
+        
+        Args:
+            start_date: 开始日期（date或'YYYY-MM-DD'）
+            end_date: 结束日期
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        try:
-            # 检查字段是否存在
-            cursor.execute("PRAGMA table_info(user_achievements)")
-            columns = [col[1] for col in cursor.fetchall()]
-            
-            if 'count' not in columns:
-                print("[INFO] 迁移：升级成就系统支持计数")
-                cursor.execute("ALTER TABLE user_achievements ADD COLUMN count INTEGER DEFAULT 1")
-                cursor.execute("ALTER TABLE user_achievements ADD COLUMN last_achieved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
-                conn.commit()
-                print("[OK] 成就系统升级成功")
-        except Exception as e:
-            print(f"[WARN] 迁移失败（可能字段已存在）: {e}")
+        cursor.execute("""
+            SELECT COALESCE(SUM(count), 0) as total
+            FROM study_records
+            WHERE day BETWEEN ? AND ?
+        """, day_range(start_date, end_date))
+        
+        return cursor.fetchone()['total']
+    
+    def get_daily_counts_between(self, start_date, end_date) -> List[Dict]:
+        """
+        获取日期区间内每天的题数（只包含有记录的日期）
+        
+        Returns:
+            [{'date': 'YYYY-MM-DD', 'count': 题数}]，按日期排序
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT day, SUM(count) as count
+            FROM study_records
+            WHERE day BETWEEN ? AND ?
+            GROUP BY day
+            ORDER BY day
+        """, day_range(start_date, end_date))
+        
+        return [{'date': day_to_str(row['day']), 'count': row['count']} for row in cursor.fetchall()]
+    
+    def get_subject_counts_between(self, start_date, end_date) -> List[Dict]:
+        """
+        获取日期区间内每个科目的题数
+        
+        Returns:
+            [{'name': 科目名, 'count': 题数}]，按题数从多到少排序
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT s.name, t.count
+            FROM (
+                SELECT subject_id, SUM(count) as count
+                FROM study_records
+                WHERE day BETWEEN ? AND ?
+                GROUP BY subject_id
+            ) t
+            JOIN subjects s ON t.subject_id = s.id
+            ORDER BY t.count DESC
+        """, day_range(start_date, end_date))
+        
+        return [dict(row) for row in cursor.fetchall()]
     
-    def migrate_achievement_repeatable(self):
-        """迁移：添加成就可重复标记"""
+    def clear_records_for_date(self, target_date) -> int:
+        """
+        删除某一天的全部学习记录，并从各科目总数中减去（一个事务）
+        
+        Args:
+            target_date: 日期（date或'YYYY-MM-DD'）
+            
+        Returns:
+            删除的题数
+        """
+        day = day_number(target_date)
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # 检查字段是否存在
-            cursor.execute("PRAGMA table_info(achievements)")
-            columns = [col[1] for col in cursor.fetchall()]
+            # 从subjects表中减去当天各科目的题数
+            if SQLITE_UPDATE_FROM:
+                cursor.execute("""
+                    UPDATE subjects
+                    SET total_count = MAX(0, total_count - t.day_count)
+                    FROM (
+                        SELECT subject_id, SUM(count) as day_count
+                        FROM study_records
+                        WHERE day = ?
+                        GROUP BY subject_id
+                    ) t
+                    WHERE subjects.id = t.subject_id
+                """, (day,))
+            else:
+                cursor.execute("""
+                    SELECT subject_id, SUM(count) as day_count
+                    FROM study_records
+                    WHERE day = ?
+                    GROUP BY subject_id
+                """, (day,))
+                cursor.executemany("""
+                    UPDATE subjects SET total_count = MAX(0, total_count - ?) WHERE id = ?
+                """, [(row['day_count'], row['subject_id']) for row in cursor.fetchall()])
+            
+            # 删除当天记录（每日汇总和连续打卡段由触发器同步）
+            if SQLITE_RETURNING:
+                cursor.execute("""
+                    DELETE FROM study_records WHERE day = ?
+                    RETURNING count
+                """, (day,))
+                removed = sum(row['count'] for row in cursor.fetchall())
+            else:
+                cursor.execute("SELECT COALESCE(SUM(count), 0) FROM study_records WHERE day = ?", (day,))
+                removed = cursor.fetchone()[0]
+                cursor.execute("DELETE FROM study_records WHERE day = ?", (day,))
+            
+            conn.commit()
+            events.publish(RECORDS_DELETED, self.db_path, day=day, subject_id=None)
+            return removed
             
-            if 'repeatable' not in columns:
-                print("[INFO] 迁移：添加成就可重复标记")
-                cursor.execute("ALTER TABLE achievements ADD COLUMN repeatable INTEGER DEFAULT 0")
-                conn.commit()
-                print("[OK] 成就可重复标记添加成功")
         except Exception as e:
-            print(f"[WARN] 迁移失败（可能字段已存在）: {e}")
+            conn.rollback()
+            raise Exception(f"清除记录失败: {e}")
     
-    def _initialize_default_data(self):
-        """初始化默认数据"""
+    def clear_subject_records(self, subject_id: int):
+        """删除某个科目的全部学习记录，并把科目总数归零"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # 检查是否已初始化
-            cursor.execute("SELECT COUNT(*) FROM users")
-            if cursor.fetchone()[0] == 0:
-                # 创建默认用户
-                cursor.execute("INSERT INTO users (daily_target, total_target) VALUES (20, 10000)")
-            
-            # 初始化预设成就
-            cursor.execute("SELECT COUNT(*) FROM achievements")
-            if cursor.fetchone()[0] == 0:
-                for achievement in PRESET_ACHIEVEMENTS:
-                    cursor.execute("""
-                        INSERT INTO achievements (name, description, type, rarity, icon, condition, repeatable)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        achievement['name'],
-                        achievement['description'],
-                        achievement['type'],
-                        achievement['rarity'],
-                        achievement['icon'],
-                        json.dumps(achievement['condition']),
-                        1 if achievement.get('repeatable', False) else 0
-                    ))
-            
-            # 初始化预设AI身份
-            cursor.execute("SELECT COUNT(*) FROM ai_identities")
-            if cursor.fetchone()[0] == 0:
-                for identity in PRESET_AI_IDENTITIES:
-                    cursor.execute("""
-                        INSERT INTO ai_identities 
-                        (name, type, description, system_prompt, color_primary, color_accent, tone_style)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        identity['name'],
-                        identity['type'],
-                        identity['description'],
-                        identity['system_prompt'],
-                        identity['color_primary'],
-                        identity['color_accent'],
-                        identity['tone_style']
-                    ))
-            
-            # 初始化默认科目
-            cursor.execute("SELECT COUNT(*) FROM subjects")
-            if cursor.fetchone()[0] == 0:
-                default_subjects = [
-                    ('算法训练', '#4A7FFF', '💻'),
-                    ('数学专题', '#27AE60', '📐'),
-                    ('英语阅读', '#E67E22', '📖')
-                ]
-                for name, color, icon in default_subjects:
-                    cursor.execute("""
-                        INSERT INTO subjects (name, color, icon)
-                        VALUES (?, ?, ?)
-                    """, (name, color, icon))
-            
+            cursor.execute("DELETE FROM study_records WHERE subject_id = ?", (subject_id,))
+            cursor.execute("UPDATE subjects SET total_count = 0 WHERE id = ?", (subject_id,))
             conn.commit()
+            events.publish(RECORDS_DELETED, self.db_path, day=None, subject_id=subject_id)
             
         except Exception as e:
             conn.rollback()
-            raise Exception(f"默认数据初始化失败: {e}")
+            raise Exception(f"清除科目记录失败: {e}")
     
-    # ==================== 学习记录相关 ====================
-    
-    def add_study_record(self, subject_id: int, count: int, record_date: date = None) -> int:
-        """添加学习记录"""
-        if record_date is None:
-            record_date = date.today()
+    def clear_all_records(self, reset_achievements: bool = True):
+        """
+        删除全部学习记录，所有科目总数归零
         
+        Args:
+            reset_achievements: 是否同时清除已获得的成就
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # 检查当天是否已有记录
-            cursor.execute("""
-                SELECT id, count FROM study_records 
-                WHERE subject_id = ? AND record_date = ?
-            """, (subject_id, record_date))
-            
-            existing = cursor.fetchone()
-            
-            if existing:
-                # 更新现有记录
-                new_count = existing['count'] + count
-                cursor.execute("""
-                    UPDATE study_records SET count = ? WHERE id = ?
-                """, (new_count, existing['id']))
-                record_id = existing['id']
-            else:
-                # 创建新记录
-                cursor.execute("""
-                    INSERT INTO study_records (subject_id, count, record_date)
-                    VALUES (?, ?, ?)
-                """, (subject_id, count, record_date))
-                record_id = cursor.lastrowid
-            
-            # 更新科目总数
-            cursor.execute("""
-                UPDATE subjects SET total_count = total_count + ? WHERE id = ?
-            """, (count, subject_id))
-            
+            cursor.execute("DELETE FROM study_records")
+            cursor.execute("UPDATE subjects SET total_count = 0")
+            if reset_achievements:
+                cursor.execute("DELETE FROM user_achievements")
             conn.commit()
-            return record_id
             
         except Exception as e:
             conn.rollback()
-            print(f"[ERROR] 添加学习记录失败: {e}")
-            raise Exception(f"添加学习记录失败: {e}")
+            raise Exception(f"清除全部记录失败: {e}")
+        
+        events.publish(RECORDS_DELETED, self.db_path, day=None, subject_id=None)
+        if reset_achievements:
+            events.publish(ACHIEVEMENTS_RESET, self.db_path)
     
     def get_today_progress(self) -> Dict[str, Any]:
         """获取今日进度"""
@@ -258,14 +455,13 @@ class DatabaseManager:
         
         today = date.today()
         
-        # 获取今日完成数
+        # 获取今日完成数（每日汇总表主键查询）
         cursor.execute("""
-            SELECT COALESCE(SUM(count), 0) as today_count
-            FROM study_records
-            WHERE record_date = ?
+            SELECT total FROM daily_totals WHERE record_date = ?
         """, (today,))
         
-        today_count = cursor.fetchone()['today_count']
+        row = cursor.fetchone()
+        today_count = row['total'] if row else 0
         
         # 获取每日目标
         cursor.execute("SELECT daily_target FROM users LIMIT 1")
@@ -286,49 +482,129 @@ class DatabaseManager:
         return cursor.fetchone()['total']
     
     def get_streak_days(self) -> int:
-        """获取连续打卡天数"""
+        """获取连续打卡天数（今天或昨天有记录时当前连续段才有效）"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # 最近的一段连续打卡
         cursor.execute("""
-            SELECT DISTINCT record_date 
-            FROM study_records 
-            ORDER BY record_date DESC
+            SELECT start_date, end_date, length FROM streak_runs
+            ORDER BY end_date DESC LIMIT 1
         """)
+        run = cursor.fetchone()
         
-        dates = [row['record_date'] for row in cursor.fetchall()]
-        
-        if not dates:
+        if not run:
             return 0
         
         today = date.today()
         yesterday = today - timedelta(days=1)
         
-        # 转换日期字符串为date对象
-        date_objs = [datetime.strptime(d, '%Y-%m-%d').date() for d in dates]
-        
-        # 判断起始日期：如果今天有记录，从今天开始；否则从昨天开始
-        if date_objs[0] == today:
-            start_date = today
-            streak = 1
-            check_from_index = 1
-        elif date_objs[0] == yesterday:
-            start_date = yesterday
-            streak = 1
-            check_from_index = 1
-        else:
+        run_end = datetime.strptime(run['end_date'], '%Y-%m-%d').date()
+        if run_end != today and run_end != yesterday:
             # 最近的记录既不是今天也不是昨天，连续打卡已断
             return 0
         
-        # 从第二个日期开始往前检查连续性
-        for i in range(check_from_index, len(date_objs)):
-            expected_date = start_date - timedelta(days=i)
-            if date_objs[i] == expected_date:
-                streak += 1
-            else:
-                break
+        return run['length']
+    
+    def get_best_streak(self) -> int:
+        """获取历史最佳连续天数"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT COALESCE(MAX(length), 0) as best FROM streak_runs")
+        return cursor.fetchone()['best']
+    
+    def get_best_streak_run(self) -> Optional[Dict]:
+        """获取最佳连续打卡段（长度相同时取最近的一段）"""
+        runs = self.get_top_streak_runs(1)
+        return runs[0] if runs else None
+    
+    def get_top_streak_runs(self, limit: int = 10) -> List[Dict]:
+        """获取最长的若干段连续打卡"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT start_date, end_date, length FROM streak_runs
+            ORDER BY length DESC, end_date DESC
+            LIMIT ?
+        """, (limit,))
+        
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_streak_run_containing(self, target_date) -> Optional[Dict]:
+        """获取包含指定日期的连续打卡段，该日未打卡时返回None"""
+        if isinstance(target_date, date):
+            target_date = target_date.strftime('%Y-%m-%d')
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT start_date, end_date, length FROM streak_runs
+            WHERE start_date <= ?
+            ORDER BY start_date DESC
+            LIMIT 1
+        """, (target_date,))
+        
+        row = cursor.fetchone()
+        if row and row['end_date'] >= target_date:
+            return dict(row)
+        return None
+    
+    def get_streak_runs(self, min_length: int = 1) -> List[Dict]:
+        """获取所有连续打卡段（按开始日期排序）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT start_date, end_date, length FROM streak_runs
+            WHERE length >= ?
+            ORDER BY start_date
+        """, (min_length,))
+        
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_daily_series(self, start_date, end_date, subject_id: int = None):
+        """
+        获取日期区间内每天题数的连续序列（一次分组查询，没有记录的日期为0）
+        
+        Args:
+            start_date: 开始日期（date或'YYYY-MM-DD'）
+            end_date: 结束日期（含）
+            subject_id: 科目ID，默认统计所有科目
+            
+        Returns:
+            按天偏移索引的序列，series[i] 为 start_date + i 天的题数
+            （安装了NumPy时为ndarray，否则为array('l')）
+        """
+        start_day, end_day = day_range(start_date, end_date)
+        series = zero_series(max(0, end_day - start_day + 1))
+        if not len(series):
+            return series
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        return streak
+        if subject_id is None:
+            # 每日汇总表按主键区间读取
+            cursor.execute(f"""
+                SELECT {DAY_NUMBER_SQL.format(column='record_date')} - ? as offset, total
+                FROM daily_totals
+                WHERE record_date BETWEEN ? AND ?
+            """, (start_day, day_to_str(start_day), day_to_str(end_day)))
+        else:
+            cursor.execute("""
+                SELECT day - ? as offset, SUM(count) as total
+                FROM study_records
+                WHERE day BETWEEN ? AND ? AND subject_id = ?
+                GROUP BY day
+            """, (start_day, start_day, end_day, subject_id))
+        
+        for offset, total in cursor.fetchall():
+            series[offset] = total
+        
+        return series
     
     def get_heatmap_data(self, year: int = None) -> List[Dict]:
         """获取热力图数据（最近365天）"""
@@ -343,10 +619,9 @@ class DatabaseManager:
         print(f"[DEBUG] 查询热力图数据：从{start_date}到{today}")
         
         cursor.execute("""
-            SELECT record_date, SUM(count) as count
-            FROM study_records
+            SELECT record_date, total as count
+            FROM daily_totals
             WHERE record_date >= ? AND record_date <= ?
-            GROUP BY record_date
         """, (start_date, today))
         
         results = [dict(row) for row in cursor.fetchall()]
@@ -355,6 +630,28 @@ class DatabaseManager:
             print(f"[DEBUG] 最早记录：{results[0]}, 最晚记录：{results[-1]}")
         return results
     
+    def rebuild_daily_totals(self) -> int:
+        """
+        根据原始学习记录重建每日汇总表和连续打卡段
+        
+        Returns:
+            重建后的天数
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            for sql in REBUILD_DAILY_TOTALS + REBUILD_STREAK_RUNS:
+                cursor.execute(sql)
+            conn.commit()
+            
+            cursor.execute("SELECT COUNT(*) FROM daily_totals")
+            return cursor.fetchone()[0]
+            
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"重建每日汇总失败: {e}")
+    
     # ==================== 科目管理 ====================
     
     def get_all_subjects(self) -> List[Dict]:
@@ -419,6 +716,8 @@ class DatabaseManager:
         except Exception as e:
             conn.rollback()
             raise Exception(f"更新科目目标失败: {e}")
+        
+        events.publish(GOALS_CHANGED, self.db_path)
     
     def add_subject(self, name: str, color: str = '#4A7FFF', icon: str = '📚') -> int:
         """添加科目"""
@@ -432,6 +731,7 @@ class DatabaseManager:
             """, (name, color, icon))
             
             conn.commit()
+            events.publish(SUBJECT_ADDED, self.db_path, subject_id=cursor.lastrowid)
             return cursor.lastrowid
             
         except sqlite3.IntegrityError:
@@ -458,6 +758,7 @@ class DatabaseManager:
                 raise Exception("科目不存在")
             
             print(f"[INFO] 已更新科目: ID={subject_id}, 新名称={name}")
+            events.publish(SUBJECTS_CHANGED, self.db_path)
             
         except Exception as e:
             conn.rollback()
@@ -481,20 +782,80 @@ class DatabaseManager:
                 raise Exception("科目不存在")
             
             print(f"[INFO] 已删除科目: ID={subject_id}")
+            events.publish(RECORDS_DELETED, self.db_path, day=None, subject_id=subject_id)
+            events.publish(SUBJECTS_CHANGED, self.db_path)
             
         except Exception as e:
             conn.rollback()
             raise Exception(f"删除科目失败: {e}")
     
+    # ==================== 学习会话 ====================
+    
+    def save_study_session(self, subject_id: int, start_time: datetime, end_time: datetime,
+                           questions: int, taps: bytes, session_id: int = None) -> int:
+        """
+        保存学习会话（session_id为None时新增，否则更新同一会话）
+        
+        Args:
+            subject_id: 科目ID
+            start_time: 开始时间（本地时间）
+            end_time: 最后一次刷题时间（本地时间）
+            questions: 会话内完成的题数
+            taps: 压缩的点击序列（见 services.tap_rate）
+            session_id: 已保存过的会话ID
+            
+        Returns:
+            会话ID
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        duration = int((end_time - start_time).total_seconds() // 60)
+        start, end = start_time.strftime('%Y-%m-%d %H:%M:%S'), end_time.strftime('%Y-%m-%d %H:%M:%S')
+        
+        try:
+            if session_id is None:
+                cursor.execute("""
+                    INSERT INTO study_sessions
+                    (subject_id, start_time, end_time, duration_minutes, questions_completed, taps)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (subject_id, start, end, duration, questions, taps))
+                session_id = cursor.lastrowid
+            else:
+                cursor.execute("""
+                    UPDATE study_sessions
+                    SET end_time = ?, duration_minutes = ?, questions_completed = ?, taps = ?
+                    WHERE id = ?
+                """, (end, duration, questions, taps, session_id))
+            
+            conn.commit()
+            return session_id
+            
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"保存学习会话失败: {e}")
+    
+    def get_study_sessions(self, subject_id: int, since: datetime) -> List[Dict]:
+        """获取科目在某时间之后结束的学习会话（按结束时间排序）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT * FROM study_sessions
+            WHERE subject_id = ? AND end_time >= ?
+            ORDER BY end_time
+        """, (subject_id, since.strftime('%Y-%m-%d %H:%M:%S')))
+        
+        return [dict(row) for row in cursor.fetchall()]
+    
     # ==================== 成就系统 ====================
     
     def get_all_achievements(self) -> List[Dict]:
-        """获取所有成就"""
+        """获取所有成就（含解锁时间和解锁次数count）"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT a.*, ua.unlocked_at,
+            SELECT a.*, ua.unlocked_at, COALESCE(ua.count, 0) as count,
                    CASE WHEN ua.id IS NOT NULL THEN 1 ELSE 0 END as is_unlocked
             FROM achievements a
             LEFT JOIN user_achievements ua ON a.id = ua.achievement_id
@@ -509,6 +870,29 @@ class DatabaseManager:
         
         return achievements
     
+    def add_achievement(self, name: str, description: str, achievement_type: str, rarity: str,
+                        condition: Dict[str, Any], icon: str = '🏆', repeatable: bool = False) -> int:
+        """添加成就（条件以JSON保存）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                INSERT INTO achievements (name, description, type, rarity, condition, icon, repeatable)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (name, description, achievement_type, rarity,
+                  json.dumps(condition, ensure_ascii=False), icon, int(repeatable)))
+            
+            conn.commit()
+            events.publish(ACHIEVEMENTS_CHANGED, self.db_path)
+            return cursor.lastrowid
+            
+        except sqlite3.IntegrityError:
+            raise Exception(f"成就 '{name}' 已存在")
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"添加成就失败: {e}")
+    
     def unlock_achievement(self, achievement_id: int, repeatable: bool = False) -> Dict[str, Any]:
         """
         解锁成就（支持可重复成就）
@@ -520,39 +904,62 @@ class DatabaseManager:
         Returns:
             包含解锁信息的字典：{'unlocked': bool, 'count': int, 'is_first': bool}
         """
+        return self.unlock_achievements_batch([(achievement_id, repeatable)])[achievement_id]
+    
+    def unlock_achievements_batch(self, achievements: Iterable[Tuple[int, bool]]) -> Dict[int, Dict[str, Any]]:
+        """
+        批量解锁成就（一次查询已有记录，一次executemany写入，一次提交）
+        
+        Args:
+            achievements: 可迭代的 (成就ID, 是否可重复) 元组
+            
+        Returns:
+            {成就ID: {'unlocked': bool, 'count': int, 'is_first': bool}}，
+            同一可重复成就出现多次时按顺序累加，返回最后一次的结果；
+            不可重复成就出现多次时只处理第一次
+        """
+        achievements = list(achievements)
+        if not achievements:
+            return {}
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # 检查是否已解锁
+            # 一次读取候选成就的已有解锁记录
             cursor.execute("""
-                SELECT id, count FROM user_achievements WHERE achievement_id = ?
-            """, (achievement_id,))
+                SELECT achievement_id, count FROM user_achievements
+                WHERE achievement_id IN (SELECT value FROM json_each(?))
+            """, (json.dumps([achievement_id for achievement_id, _ in achievements]),))
+            counts = {row['achievement_id']: row['count'] for row in cursor.fetchall()}
             
-            existing = cursor.fetchone()
-            
-            if existing and not repeatable:
-                # 不可重复成就已解锁
-                return {'unlocked': False, 'count': existing['count'], 'is_first': False}
+            results = {}
+            unlocked = []
+            for achievement_id, repeatable in achievements:
+                if achievement_id in results and not repeatable:
+                    # 同一批中重复出现的不可重复成就，保留第一次的结果
+                    continue
+                if achievement_id in counts and not repeatable:
+                    # 不可重复成就已解锁
+                    results[achievement_id] = {'unlocked': False, 'count': counts[achievement_id],
+                                               'is_first': False}
+                    continue
+                
+                # 首次解锁，或可重复成就增加计数
+                is_first = achievement_id not in counts
+                counts[achievement_id] = counts.get(achievement_id, 0) + 1
+                results[achievement_id] = {'unlocked': True, 'count': counts[achievement_id],
+                                           'is_first': is_first}
+                unlocked.append((achievement_id,))
             
-            if existing and repeatable:
-                # 可重复成就，增加计数
-                new_count = existing['count'] + 1
-                cursor.execute("""
-                    UPDATE user_achievements 
-                    SET count = ?, last_achieved_at = CURRENT_TIMESTAMP
-                    WHERE achievement_id = ?
-                """, (new_count, achievement_id))
+            if unlocked:
+                cursor.executemany("""
+                    INSERT INTO user_achievements (achievement_id, count) VALUES (?, 1)
+                    ON CONFLICT(achievement_id) DO UPDATE
+                    SET count = count + 1, last_achieved_at = CURRENT_TIMESTAMP
+                """, unlocked)
                 conn.commit()
-                return {'unlocked': True, 'count': new_count, 'is_first': False}
-            
-            # 首次解锁成就
-            cursor.execute("""
-                INSERT INTO user_achievements (achievement_id, count) VALUES (?, 1)
-            """, (achievement_id,))
-            
-            conn.commit()
-            return {'unlocked': True, 'count': 1, 'is_first': True}
+            return results
             
         except Exception as e:
             conn.rollback()
@@ -602,10 +1009,14 @@ class DatabaseManager:
                 SET system_prompt = ?
                 WHERE id = ?
             """, (system_prompt, identity_id))
+            updated = cursor.rowcount
+            
+            # 提示词变了，缓存的回复不再适用
+            cursor.execute("DELETE FROM ai_response_cache WHERE identity_id = ?", (identity_id,))
             
             conn.commit()
             
-            if cursor.rowcount == 0:
+            if updated == 0:
                 raise Exception("AI身份不存在")
             
             print(f"[INFO] 已更新AI身份: ID={identity_id}")
@@ -625,10 +1036,13 @@ class DatabaseManager:
                 DELETE FROM ai_identities 
                 WHERE id = ?
             """, (identity_id,))
+            deleted = cursor.rowcount
+            
+            cursor.execute("DELETE FROM ai_response_cache WHERE identity_id = ?", (identity_id,))
             
             conn.commit()
             
-            if cursor.rowcount == 0:
+            if deleted == 0:
                 raise Exception("AI身份不存在")
             
             print(f"[INFO] 已删除AI身份: ID={identity_id}")
@@ -687,6 +1101,126 @@ class DatabaseManager:
         
         return [dict(row) for row in cursor.fetchall()]
     
+    # ==================== AI回复缓存 ====================
+    
+    def get_cached_responses(self, cache_key: str) -> List[Dict]:
+        """获取缓存键下的所有回复"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, content, created_at, last_used_at, hits, pregenerated
+            FROM ai_response_cache
+            WHERE cache_key = ?
+        """, (cache_key,))
+        
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_fallback_response(self, cache_key: str, identity_id: int,
+                              trigger_scene: str) -> Optional[Dict]:
+        """
+        获取离线时使用的回复（不论是否过期）
+        
+        优先同一缓存键，其次同一身份和场景的其他档位，同等条件下取最久未用的。
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, content, created_at, last_used_at, hits, pregenerated
+            FROM ai_response_cache
+            WHERE identity_id = ? AND trigger_scene = ?
+            ORDER BY cache_key = ? DESC, last_used_at
+            LIMIT 1
+        """, (identity_id, trigger_scene, cache_key))
+        
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    
+    def touch_cached_response(self, response_id: int, used_at: float):
+        """记录一次缓存回复的使用（预生成的回复用过一次后成为普通缓存）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                UPDATE ai_response_cache
+                SET last_used_at = ?, hits = hits + 1, pregenerated = 0
+                WHERE id = ?
+            """, (used_at, response_id))
+            
+            conn.commit()
+            
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"更新AI回复缓存失败: {e}")
+    
+    def save_cached_response(self, cache_key: str, identity_id: int, trigger_scene: str,
+                             content: str, now: float, max_variants: int, max_entries: int,
+                             pregenerated: bool = False) -> int:
+        """
+        保存一条回复到缓存
+        
+        同一缓存键超过 max_variants 条时删除最旧的，总数超过 max_entries 条时
+        删除最久未用的。相同回复只刷新保存时间（和预生成标记）。
+        
+        Returns:
+            缓存条数
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                INSERT INTO ai_response_cache
+                (cache_key, identity_id, trigger_scene, content, created_at, last_used_at, pregenerated)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (cache_key, content) DO UPDATE SET
+                    created_at = excluded.created_at,
+                    pregenerated = MAX(pregenerated, excluded.pregenerated)
+            """, (cache_key, identity_id, trigger_scene, content, now, now, int(pregenerated)))
+            
+            cursor.execute("""
+                DELETE FROM ai_response_cache
+                WHERE cache_key = ? AND id NOT IN (
+                    SELECT id FROM ai_response_cache
+                    WHERE cache_key = ?
+                    ORDER BY created_at DESC
+                    LIMIT ?
+                )
+            """, (cache_key, cache_key, max_variants))
+            
+            cursor.execute("""
+                DELETE FROM ai_response_cache
+                WHERE id NOT IN (
+                    SELECT id FROM ai_response_cache
+                    ORDER BY last_used_at DESC
+                    LIMIT ?
+                )
+            """, (max_entries,))
+            
+            cursor.execute("SELECT COUNT(*) FROM ai_response_cache")
+            total = cursor.fetchone()[0]
+            
+            conn.commit()
+            return total
+            
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"保存AI回复缓存失败: {e}")
+    
+    def get_pregenerated_keys(self, identity_id: int, since: float) -> List[str]:
+        """获取身份在 since（Unix时间戳）之后预生成、尚未使用的回复的缓存键"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT cache_key FROM ai_response_cache
+            WHERE identity_id = ? AND pregenerated = 1 AND created_at > ?
+        """, (identity_id, since))
+        
+        return [row['cache_key'] for row in cursor.fetchall()]
+    
     # ==================== API配置 ====================
     
     def save_api_config(self, platform_type: str, api_key: str, 
@@ -779,3 +1313,52 @@ class DatabaseManager:
                 UPDATE users SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP
             """, params)
             conn.commit()
+            events.publish(GOALS_CHANGED, self.db_path)
+    
+    def save_subject_goals(self, targets: Dict[int, int], goal_type: str = 'daily') -> int:
+        """
+        批量保存各科目目标，用户目标同步为各科目之和（一个事务）
+        
+        Args:
+            targets: {科目ID: 目标题数}
+            goal_type: 'daily' 每日目标 / 'total' 终极目标
+            
+        Returns:
+            各科目目标之和
+        """
+        if goal_type not in ('daily', 'total'):
+            raise ValueError(f"未知的目标类型: {goal_type}")
+        column = f"{goal_type}_target"
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany(
+                f"UPDATE subjects SET {column} = ? WHERE id = ?",
+                [(target, subject_id) for subject_id, target in targets.items()]
+            )
+            total = sum(targets.values())
+            cursor.execute(f"""
+                UPDATE users SET {column} = ?, updated_at = CURRENT_TIMESTAMP WHERE id = 1
+            """, (total,))
+            conn.commit()
+            
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"保存科目目标失败: {e}")
+        
+        events.publish(GOALS_CHANGED, self.db_path)
+        return total
+    
+    # ==================== 查询统计 ====================
+    
+    def query_stats(self, limit: int = 20, order_by: str = 'total_ms') -> List[Dict[str, Any]]:
+        """
+        获取SQL查询统计（需开启 DB_PROFILING_ENABLED）
+        
+        Args:
+            limit: 返回条数
+            order_by: 排序字段（total_ms / max_ms / calls / rows）
+        """
+        return query_stats(limit, order_by)
@@ -0,0 +1,95 @@
+"""数据写入事件
+
+DatabaseManager 在写入提交后发布事件，内存中的缓存（历史数据、统计快照等）
+订阅事件做增量更新或失效处理。每次发布都会增加对应数据库的写入代数。
+"""
+import threading
+import weakref
+from typing import Any, Callable, Dict, List
+
+# 新增题数，payload: records=[(科目ID, 天编号, 题数)]，
+# single_submit=单次提交的题数（批量写入、合并的点击为None）
+COUNT_ADDED = 'count_added'
+# 某一天有了第一条记录（连续打卡天数可能变化），payload: days=[天编号]
+DAY_ROLLED = 'day_rolled'
+# 删除学习记录，payload: day=天编号 / subject_id=科目ID，都为None表示全部删除
+RECORDS_DELETED = 'records_deleted'
+# 新增科目，payload: subject_id=科目ID
+SUBJECT_ADDED = 'subject_added'
+# 科目改名或删除
+SUBJECTS_CHANGED = 'subjects_changed'
+# 每日目标或终极目标修改
+GOALS_CHANGED = 'goals_changed'
+# 已获得的成就被清空
+ACHIEVEMENTS_RESET = 'achievements_reset'
+# 成就目录变化（新增成就）
+ACHIEVEMENTS_CHANGED = 'achievements_changed'
+
+# 订阅所有事件
+ALL_EVENTS = '*'
+
+
+class DataEvents:
+    """写入事件总线（回调以弱引用保存，订阅者被回收后自动移除）"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Any]] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, event: str, callback: Callable[[str, str, Dict], None]):
+        """
+        订阅事件
+
+        Args:
+            event: 事件名，ALL_EVENTS 表示全部事件
+            callback: callback(事件名, 数据库路径, payload)
+        """
+        if hasattr(callback, '__self__'):
+            ref = weakref.WeakMethod(callback)
+        else:
+            ref = weakref.ref(callback)
+
+        with self._lock:
+            self._subscribers.setdefault(event, []).append(ref)
+
+    def unsubscribe(self, event: str, callback: Callable):
+        """取消订阅"""
+        with self._lock:
+            refs = self._subscribers.get(event, [])
+            self._subscribers[event] = [ref for ref in refs if ref() not in (None, callback)]
+
+    def publish(self, event: str, db_path: str, **payload):
+        """
+        发布事件（在写入提交之后调用）
+
+        Args:
+            event: 事件名
+            db_path: 发生写入的数据库路径
+            **payload: 事件数据
+        """
+        with self._lock:
+            self._generations[db_path] = self._generations.get(db_path, 0) + 1
+            callbacks = []
+            for name in (event, ALL_EVENTS):
+                refs = self._subscribers.get(name, [])
+                alive = [ref for ref in refs if ref() is not None]
+                if len(alive) != len(refs):
+                    self._subscribers[name] = alive
+                callbacks.extend(ref() for ref in alive)
+
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(event, db_path, payload)
+            except Exception as e:
+                print(f"[WARN] 处理写入事件 {event} 失败: {e}")
+
+    def generation(self, db_path: str) -> int:
+        """获取数据库的写入代数（本进程内每次写入事件加1）"""
+        return self._generations.get(db_path, 0)
+
+
+# 全局写入事件总线
+events = DataEvents()
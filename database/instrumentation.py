@@ -0,0 +1,265 @@
+"""数据库查询性能统计
+
+可选的连接层统计：开启后每条语句记录规范化SQL、调用位置、耗时和返回行数，
+按一定比例采样 EXPLAIN QUERY PLAN，超过阈值的慢查询写入滚动日志。
+"""
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import (BASE_DIR, DB_PROFILING_ENABLED, DB_SLOW_QUERY_MS,
+                             DB_EXPLAIN_SAMPLE_RATE, DB_SLOW_QUERY_LOG)
+
+_enabled = DB_PROFILING_ENABLED
+
+# 规范化SQL：字符串和数字常量替换为?，空白合并
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+# 可以执行 EXPLAIN QUERY PLAN 的语句
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_THIS_FILE = os.path.normcase(os.path.abspath(__file__))
+
+
+def set_profiling(enabled: bool):
+    """开启或关闭统计（只影响之后新建的连接）"""
+    global _enabled
+    _enabled = enabled
+
+
+def is_profiling_enabled() -> bool:
+    """新建连接时是否启用统计"""
+    return _enabled
+
+
+def normalize_sql(sql: str) -> str:
+    """规范化SQL（同一语句不同参数归为一类）"""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _call_site() -> str:
+    """找到发起查询的项目代码位置"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.normcase(os.path.abspath(frame.f_code.co_filename))
+        if filename != _THIS_FILE:
+            return f"{os.path.relpath(frame.f_code.co_filename, BASE_DIR)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return '?'
+
+
+class QueryProfiler:
+    """查询统计汇总（按规范化SQL和调用位置分组）"""
+
+    def __init__(self, slow_query_ms: float = DB_SLOW_QUERY_MS,
+                 explain_sample_rate: float = DB_EXPLAIN_SAMPLE_RATE,
+                 slow_log_path: str = DB_SLOW_QUERY_LOG):
+        self.slow_query_ms = slow_query_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.slow_log_path = slow_log_path
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._slow_logger = None
+
+    def record(self, sql: str, site: str, duration_ms: float, rows: int,
+               plan: Optional[List[str]] = None):
+        """记录一次语句执行"""
+        key = (sql, site)
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = {'sql': sql, 'site': site, 'calls': 0, 'total_ms': 0.0,
+                        'max_ms': 0.0, 'rows': 0, 'slow_calls': 0, 'plan': None}
+                self._stats[key] = stat
+            stat['calls'] += 1
+            stat['total_ms'] += duration_ms
+            stat['max_ms'] = max(stat['max_ms'], duration_ms)
+            stat['rows'] += rows
+            if plan is not None:
+                stat['plan'] = plan
+            is_slow = duration_ms >= self.slow_query_ms
+            if is_slow:
+                stat['slow_calls'] += 1
+            plan = stat['plan']
+
+        if is_slow:
+            self._log_slow(sql, site, duration_ms, rows, plan)
+
+    def should_explain(self) -> bool:
+        """本次执行是否采样查询计划"""
+        return self.explain_sample_rate > 0 and random.random() < self.explain_sample_rate
+
+    def summary(self, limit: int = 20, order_by: str = 'total_ms') -> List[Dict[str, Any]]:
+        """
+        获取统计汇总
+
+        Args:
+            limit: 返回条数
+            order_by: 排序字段（total_ms / max_ms / calls / rows）
+
+        Returns:
+            统计列表，每项含 sql、site、calls、total_ms、avg_ms、max_ms、rows、slow_calls、plan
+        """
+        with self._lock:
+            stats = [dict(stat) for stat in self._stats.values()]
+        for stat in stats:
+            stat['avg_ms'] = stat['total_ms'] / stat['calls']
+        stats.sort(key=lambda s: s[order_by], reverse=True)
+        return stats[:limit]
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._stats.clear()
+
+    def _log_slow(self, sql: str, site: str, duration_ms: float, rows: int,
+                  plan: Optional[List[str]]):
+        """写入慢查询日志"""
+        if self._slow_logger is None:
+            logger = logging.getLogger('achievement.slow_query')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            os.makedirs(os.path.dirname(self.slow_log_path), exist_ok=True)
+            handler = RotatingFileHandler(self.slow_log_path, maxBytes=1024 * 1024,
+                                          backupCount=3, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            logger.addHandler(handler)
+            self._slow_logger = logger
+
+        message = f"{duration_ms:.1f}ms rows={rows} [{site}] {sql}"
+        if plan:
+            message += " | PLAN: " + "; ".join(plan)
+        self._slow_logger.info(message)
+
+
+# 全局查询统计
+profiler = QueryProfiler()
+
+
+def query_stats(limit: int = 20, order_by: str = 'total_ms') -> List[Dict[str, Any]]:
+    """获取查询统计汇总（见 QueryProfiler.summary）"""
+    return profiler.summary(limit, order_by)
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """带统计的游标：耗时包含执行和读取结果的时间"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._begin(sql, parameters, time.perf_counter() - start)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._begin(sql, None, time.perf_counter() - start)
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._track(time.perf_counter() - start, 0 if row is None else 1)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._track(time.perf_counter() - start, len(rows))
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._track(time.perf_counter() - start, len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._finish()
+            raise
+        self._track(time.perf_counter() - start, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _begin(self, sql: str, parameters, elapsed: float):
+        """记录刚执行的语句，等结果读取完再汇总"""
+        site = _call_site()
+        plan = None
+        keyword = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+        if keyword in _EXPLAINABLE and profiler.should_explain():
+            plan = self._explain(sql, parameters)
+        # 写操作的影响行数，查询的返回行数在读取时累计
+        rows = self.rowcount if keyword != 'SELECT' and self.rowcount > 0 else 0
+        self._pending = [normalize_sql(sql), site, elapsed, rows, plan]
+
+    def _track(self, elapsed: float, rows: int):
+        """累计读取结果的耗时和行数"""
+        if self._pending is not None:
+            self._pending[2] += elapsed
+            self._pending[3] += rows
+
+    def _finish(self):
+        """汇总上一条语句"""
+        pending = getattr(self, '_pending', None)
+        if pending is not None:
+            self._pending = None
+            sql, site, elapsed, rows, plan = pending
+            profiler.record(sql, site, elapsed * 1000, rows, plan)
+
+    def _explain(self, sql: str, parameters) -> Optional[List[str]]:
+        """采样查询计划（失败时忽略）"""
+        if parameters is None:
+            return None
+        try:
+            cursor = sqlite3.Cursor(self.connection)
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+            return [row[3] for row in cursor.fetchall()]
+        except sqlite3.Error:
+            return None
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """带统计的连接（所有游标都是 ProfilingCursor）"""
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,221 @@
+"""数据库迁移
+
+基于 PRAGMA user_version 的版本化迁移：每个迁移步骤对应一个版本号，
+只执行数据库当前版本之后的步骤，已是最新版本时不做任何操作。
+"""
+import sqlite3
+from typing import Callable, List, Tuple
+from .models import (REBUILD_DAILY_TOTALS, REBUILD_STREAK_RUNS, CREATE_AI_RESPONSE_CACHE_TABLE,
+                     AI_RESPONSE_CACHE_INDEXES)
+from .day_numbers import DAY_NUMBER_SQL
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """读取数据库的结构版本号"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _column_names(cursor: sqlite3.Cursor, table: str) -> List[str]:
+    """获取表的字段名列表"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [col[1] for col in cursor.fetchall()]
+
+
+def _add_column(cursor: sqlite3.Cursor, table: str, column: str, definition: str):
+    """字段不存在时添加字段"""
+    if column not in _column_names(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# ==================== 迁移步骤 ====================
+
+def _migrate_subject_daily_target(cursor: sqlite3.Cursor):
+    """给subjects表添加daily_target字段"""
+    _add_column(cursor, 'subjects', 'daily_target', 'INTEGER DEFAULT 20')
+
+
+def _migrate_subject_total_target(cursor: sqlite3.Cursor):
+    """给subjects表添加total_target字段"""
+    _add_column(cursor, 'subjects', 'total_target', 'INTEGER DEFAULT 0')
+
+
+def _migrate_achievement_count(cursor: sqlite3.Cursor):
+    """升级成就系统支持计数"""
+    _add_column(cursor, 'user_achievements', 'count', 'INTEGER DEFAULT 1')
+    # SQLite不允许ALTER TABLE添加非常量默认值，旧库中该字段默认为空
+    _add_column(cursor, 'user_achievements', 'last_achieved_at', 'TIMESTAMP')
+
+
+def _migrate_achievement_repeatable(cursor: sqlite3.Cursor):
+    """添加成就可重复标记"""
+    _add_column(cursor, 'achievements', 'repeatable', 'INTEGER DEFAULT 0')
+
+
+def _migrate_achievement_fixups(cursor: sqlite3.Cursor):
+    """成就数据修正（原 quick_update.py / update_365.py 中的手动脚本）"""
+    # 365天成就更名
+    cursor.execute("""
+        UPDATE achievements
+        SET name = '年度传奇'
+        WHERE type = 'STREAK' AND json_extract(condition, '$.streak_days') = 365
+          AND NOT EXISTS (SELECT 1 FROM achievements WHERE name = '年度传奇')
+    """)
+
+    # 速度型成就改为可重复
+    cursor.execute("UPDATE achievements SET repeatable = 1 WHERE type = 'SPEED'")
+
+    # 已有成就目录时补充30题速度成就（新库由预设数据初始化）
+    cursor.execute("SELECT COUNT(*) FROM achievements")
+    if cursor.fetchone()[0] > 0:
+        cursor.execute("""
+            INSERT OR IGNORE INTO achievements (name, description, type, rarity, icon, condition, repeatable)
+            VALUES ('御风而行', '单次提交超过30题', 'SPEED', 'BRONZE', '🌪️', '{"single_submit": 30}', 1)
+        """)
+
+    # 删除全能型成就
+    cursor.execute("DELETE FROM achievements WHERE type = 'VERSATILE'")
+
+
+def _migrate_merge_daily_records(cursor: sqlite3.Cursor):
+    """合并同一科目同一天的重复学习记录（唯一索引由CREATE_INDEXES创建）"""
+    cursor.execute("""
+        UPDATE study_records
+        SET count = (
+            SELECT SUM(s2.count) FROM study_records s2
+            WHERE s2.subject_id = study_records.subject_id
+              AND s2.record_date = study_records.record_date
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM study_records
+            GROUP BY subject_id, record_date
+            HAVING COUNT(*) > 1
+        )
+    """)
+    cursor.execute("""
+        DELETE FROM study_records
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM study_records GROUP BY subject_id, record_date
+        )
+    """)
+
+
+def _migrate_build_daily_totals(cursor: sqlite3.Cursor):
+    """根据已有学习记录生成每日汇总（表和触发器由建表语句创建）"""
+    for sql in REBUILD_DAILY_TOTALS:
+        cursor.execute(sql)
+
+
+def _migrate_build_streak_runs(cursor: sqlite3.Cursor):
+    """根据每日汇总生成连续打卡段（表和触发器由建表语句创建）"""
+    for sql in REBUILD_STREAK_RUNS:
+        cursor.execute(sql)
+
+
+def _migrate_study_record_day(cursor: sqlite3.Cursor):
+    """学习记录保存整数天编号（覆盖索引由CREATE_INDEXES创建）"""
+    _add_column(cursor, 'study_records', 'day', 'INTEGER')
+    cursor.execute(f"UPDATE study_records SET day = {DAY_NUMBER_SQL.format(column='record_date')}")
+    # 日期字符串索引由天编号覆盖索引取代
+    cursor.execute("DROP INDEX IF EXISTS idx_study_records_date")
+
+
+def _migrate_unique_user_achievements(cursor: sqlite3.Cursor):
+    """合并同一成就的重复解锁记录（唯一索引由CREATE_INDEXES创建）"""
+    cursor.execute("""
+        UPDATE user_achievements
+        SET count = (
+                SELECT SUM(COALESCE(u2.count, 1)) FROM user_achievements u2
+                WHERE u2.achievement_id = user_achievements.achievement_id
+            ),
+            last_achieved_at = (
+                SELECT MAX(COALESCE(u2.last_achieved_at, u2.unlocked_at)) FROM user_achievements u2
+                WHERE u2.achievement_id = user_achievements.achievement_id
+            )
+        WHERE id IN (
+            SELECT MIN(id) FROM user_achievements
+            GROUP BY achievement_id
+            HAVING COUNT(*) > 1
+        )
+    """)
+    cursor.execute("""
+        DELETE FROM user_achievements
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM user_achievements GROUP BY achievement_id
+        )
+    """)
+    # 普通索引由唯一索引取代
+    cursor.execute("DROP INDEX IF EXISTS idx_user_achievements_achievement")
+
+
+def _migrate_tap_rate_sessions(cursor: sqlite3.Cursor):
+    """学习会话保存点击时间序列，补充点击速率成就"""
+    _add_column(cursor, 'study_sessions', 'taps', 'BLOB')
+
+    # 已有成就目录时补充（新库由预设数据初始化）
+    cursor.execute("SELECT COUNT(*) FROM achievements")
+    if cursor.fetchone()[0] > 0:
+        cursor.execute("""
+            INSERT OR IGNORE INTO achievements (name, description, type, rarity, icon, condition, repeatable)
+            VALUES ('一气呵成', '10分钟内完成30题', 'SPEED', 'BRONZE', '🔥',
+                    '{"tap_rate": 30, "window_minutes": 10}', 1),
+                   ('势如破竹', '30分钟内完成100题', 'SPEED', 'SILVER', '🎯',
+                    '{"tap_rate": 100, "window_minutes": 30}', 1)
+        """)
+
+
+def _migrate_ai_response_cache(cursor: sqlite3.Cursor):
+    """创建AI回复缓存表及其索引"""
+    cursor.execute(CREATE_AI_RESPONSE_CACHE_TABLE)
+    for sql in AI_RESPONSE_CACHE_INDEXES:
+        cursor.execute(sql)
+
+
+def _migrate_ai_pregenerated(cursor: sqlite3.Cursor):
+    """AI回复缓存标记预生成的回复"""
+    _add_column(cursor, 'ai_response_cache', 'pregenerated', 'INTEGER NOT NULL DEFAULT 0')
+
+
+# (版本号, 说明, 迁移函数)
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, '添加subjects.daily_target字段', _migrate_subject_daily_target),
+    (2, '添加subjects.total_target字段', _migrate_subject_total_target),
+    (3, '成就系统支持计数', _migrate_achievement_count),
+    (4, '添加成就可重复标记', _migrate_achievement_repeatable),
+    (5, '成就数据修正', _migrate_achievement_fixups),
+    (6, '合并重复学习记录（科目+日期唯一）', _migrate_merge_daily_records),
+    (7, '生成每日汇总表daily_totals', _migrate_build_daily_totals),
+    (8, '生成连续打卡段表streak_runs', _migrate_build_streak_runs),
+    (9, '学习记录保存整数天编号study_records.day', _migrate_study_record_day),
+    (10, '成就解锁记录唯一（每个成就一行）', _migrate_unique_user_achievements),
+    (11, '学习会话保存点击序列，新增点击速率成就', _migrate_tap_rate_sessions),
+    (12, '新增AI回复缓存表ai_response_cache', _migrate_ai_response_cache),
+    (13, 'AI回复缓存标记预生成的回复', _migrate_ai_pregenerated),
+]
+
+# 当前最新的结构版本
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def apply_migrations(cursor: sqlite3.Cursor, current_version: int, verbose: bool = True) -> int:
+    """
+    执行当前版本之后的迁移步骤（不负责事务提交）
+
+    Args:
+        cursor: 数据库游标（调用方已开启事务）
+        current_version: 数据库当前版本
+        verbose: 是否打印每个迁移步骤
+
+    Returns:
+        执行的迁移步骤数
+    """
+    applied = 0
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version:
+            continue
+        if verbose:
+            print(f"[INFO] 迁移 v{version}：{description}")
+        migrate(cursor)
+        applied += 1
+
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return applied
@@ -1,5 +1,7 @@
 """数据模型定义"""
 
+from .day_numbers import DAY_NUMBER_SQL
+
 # 数据库表结构SQL
 
 # 用户配置表
@@ -34,11 +36,30 @@ CREATE TABLE IF NOT EXISTS study_records (
     subject_id INTEGER NOT NULL,
     count INTEGER NOT NULL,
     record_date DATE NOT NULL,
+    day INTEGER,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (subject_id) REFERENCES subjects(id)
 )
 """
 
+# 每日汇总表（由study_records上的触发器维护）
+CREATE_DAILY_TOTALS_TABLE = """
+CREATE TABLE IF NOT EXISTS daily_totals (
+    record_date DATE PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    subjects_touched INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID
+"""
+
+# 连续打卡段表（每段连续打卡一行，由daily_totals上的触发器增量维护）
+CREATE_STREAK_RUNS_TABLE = """
+CREATE TABLE IF NOT EXISTS streak_runs (
+    start_date DATE PRIMARY KEY,
+    end_date DATE NOT NULL,
+    length INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
 # 成就定义表
 CREATE_ACHIEVEMENTS_TABLE = """
 CREATE TABLE IF NOT EXISTS achievements (
@@ -97,6 +118,22 @@ CREATE TABLE IF NOT EXISTS ai_encouragements (
 )
 """
 
+# AI回复缓存表（每个缓存键保存若干条不同回复，时间为Unix时间戳；
+# pregenerated 为空闲时预先生成、尚未使用的回复）
+CREATE_AI_RESPONSE_CACHE_TABLE = """
+CREATE TABLE IF NOT EXISTS ai_response_cache (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cache_key TEXT NOT NULL,
+    identity_id INTEGER,
+    trigger_scene TEXT,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    pregenerated INTEGER NOT NULL DEFAULT 0
+)
+"""
+
 # API配置表
 CREATE_API_CONFIGS_TABLE = """
 CREATE TABLE IF NOT EXISTS api_configs (
@@ -129,6 +166,7 @@ CREATE TABLE IF NOT EXISTS study_sessions (
     duration_minutes INTEGER,
     questions_completed INTEGER,
     subject_id INTEGER,
+    taps BLOB,
     FOREIGN KEY (subject_id) REFERENCES subjects(id)
 )
 """
@@ -138,20 +176,162 @@ ALL_TABLES = [
     CREATE_USERS_TABLE,
     CREATE_SUBJECTS_TABLE,
     CREATE_STUDY_RECORDS_TABLE,
+    CREATE_DAILY_TOTALS_TABLE,
+    CREATE_STREAK_RUNS_TABLE,
     CREATE_ACHIEVEMENTS_TABLE,
     CREATE_USER_ACHIEVEMENTS_TABLE,
     CREATE_AI_IDENTITIES_TABLE,
     CREATE_AI_ENCOURAGEMENTS_TABLE,
+    CREATE_AI_RESPONSE_CACHE_TABLE,
     CREATE_API_CONFIGS_TABLE,
     CREATE_SETTINGS_TABLE,
     CREATE_STUDY_SESSIONS_TABLE
 ]
 
-# 索引创建
+# AI回复缓存索引（v12迁移中与表一起创建）
+AI_RESPONSE_CACHE_INDEXES = [
+    # 同一缓存键不重复保存相同回复
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_ai_response_cache_key ON ai_response_cache(cache_key, content)",
+    "CREATE INDEX IF NOT EXISTS idx_ai_response_cache_scene ON ai_response_cache(identity_id, trigger_scene)",
+    "CREATE INDEX IF NOT EXISTS idx_ai_response_cache_used ON ai_response_cache(last_used_at)"
+]
+
+# 索引创建（在迁移之后执行）
 CREATE_INDEXES = [
-    "CREATE INDEX IF NOT EXISTS idx_study_records_date ON study_records(record_date)",
+    # 按天区间查询的覆盖索引（day为整数天编号）
+    "CREATE INDEX IF NOT EXISTS idx_study_records_day ON study_records(day, subject_id, count)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_study_records_subject_date ON study_records(subject_id, record_date)",
     "CREATE INDEX IF NOT EXISTS idx_study_records_subject ON study_records(subject_id)",
-    "CREATE INDEX IF NOT EXISTS idx_user_achievements_achievement ON user_achievements(achievement_id)",
+    "CREATE INDEX IF NOT EXISTS idx_streak_runs_end ON streak_runs(end_date)",
+    "CREATE INDEX IF NOT EXISTS idx_streak_runs_length ON streak_runs(length, end_date)",
+    "CREATE INDEX IF NOT EXISTS idx_study_sessions_subject_end ON study_sessions(subject_id, end_time)",
+    # 每个成就只有一行解锁记录（可重复成就累加count）
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_achievements_unique ON user_achievements(achievement_id)",
     "CREATE INDEX IF NOT EXISTS idx_ai_encouragements_identity ON ai_encouragements(identity_id)",
     "CREATE INDEX IF NOT EXISTS idx_ai_encouragements_created ON ai_encouragements(created_at)"
+] + AI_RESPONSE_CACHE_INDEXES
+
+# 触发器创建（在索引之后执行）
+CREATE_TRIGGERS = [
+    # 写入时未提供天编号则根据日期补上
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_study_records_insert_day
+    AFTER INSERT ON study_records
+    WHEN NEW.day IS NULL
+    BEGIN
+        UPDATE study_records SET day = {DAY_NUMBER_SQL.format(column='NEW.record_date')}
+        WHERE id = NEW.id;
+    END
+    """,
+    # 修改日期时同步天编号
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_study_records_update_day
+    AFTER UPDATE OF record_date ON study_records
+    BEGIN
+        UPDATE study_records SET day = {DAY_NUMBER_SQL.format(column='NEW.record_date')}
+        WHERE id = NEW.id;
+    END
+    """,
+    # 新增记录：累加当天汇总
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_study_records_insert_daily
+    AFTER INSERT ON study_records
+    BEGIN
+        INSERT INTO daily_totals (record_date, total, subjects_touched)
+        VALUES (NEW.record_date, NEW.count, 1)
+        ON CONFLICT(record_date) DO UPDATE SET
+            total = total + NEW.count,
+            subjects_touched = subjects_touched + 1;
+    END
+    """,
+    # 修改记录：从旧日期减去，再加到新日期
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_study_records_update_daily
+    AFTER UPDATE OF count, record_date ON study_records
+    BEGIN
+        UPDATE daily_totals
+        SET total = total - OLD.count, subjects_touched = subjects_touched - 1
+        WHERE record_date = OLD.record_date;
+        INSERT INTO daily_totals (record_date, total, subjects_touched)
+        VALUES (NEW.record_date, NEW.count, 1)
+        ON CONFLICT(record_date) DO UPDATE SET
+            total = total + NEW.count,
+            subjects_touched = subjects_touched + 1;
+        DELETE FROM daily_totals
+        WHERE record_date = OLD.record_date AND subjects_touched <= 0;
+    END
+    """,
+    # 删除记录：减去当天汇总，当天没有记录时删除汇总行
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_study_records_delete_daily
+    AFTER DELETE ON study_records
+    BEGIN
+        UPDATE daily_totals
+        SET total = total - OLD.count, subjects_touched = subjects_touched - 1
+        WHERE record_date = OLD.record_date;
+        DELETE FROM daily_totals
+        WHERE record_date = OLD.record_date AND subjects_touched <= 0;
+    END
+    """,
+    # 新的打卡日：与前后相邻的连续段合并成一段
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_insert_runs
+    AFTER INSERT ON daily_totals
+    BEGIN
+        INSERT OR REPLACE INTO streak_runs (start_date, end_date, length)
+        SELECT run_start, run_end, CAST(julianday(run_end) - julianday(run_start) AS INTEGER) + 1
+        FROM (
+            SELECT
+                COALESCE((SELECT start_date FROM streak_runs
+                          WHERE end_date = date(NEW.record_date, '-1 day')), NEW.record_date) AS run_start,
+                COALESCE((SELECT end_date FROM streak_runs
+                          WHERE start_date = date(NEW.record_date, '+1 day')), NEW.record_date) AS run_end
+        );
+        DELETE FROM streak_runs WHERE start_date = date(NEW.record_date, '+1 day');
+    END
+    """,
+    # 打卡日被删除：所在连续段拆成前后两段
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_delete_runs
+    AFTER DELETE ON daily_totals
+    BEGIN
+        INSERT INTO streak_runs (start_date, end_date, length)
+        SELECT date(OLD.record_date, '+1 day'), end_date,
+               CAST(julianday(end_date) - julianday(OLD.record_date) AS INTEGER)
+        FROM streak_runs
+        WHERE start_date <= OLD.record_date AND end_date > OLD.record_date;
+        UPDATE streak_runs
+        SET end_date = date(OLD.record_date, '-1 day'),
+            length = CAST(julianday(OLD.record_date) - julianday(start_date) AS INTEGER)
+        WHERE start_date < OLD.record_date AND end_date >= OLD.record_date;
+        DELETE FROM streak_runs WHERE start_date = OLD.record_date;
+    END
+    """
+]
+
+# 根据原始记录重建每日汇总
+REBUILD_DAILY_TOTALS = [
+    "DELETE FROM daily_totals",
+    """
+    INSERT INTO daily_totals (record_date, total, subjects_touched)
+    SELECT record_date, SUM(count), COUNT(*)
+    FROM study_records
+    GROUP BY record_date
+    """
+]
+
+# 根据每日汇总重建连续打卡段（gaps-and-islands：日期减去序号相同的属于同一段）
+REBUILD_STREAK_RUNS = [
+    "DELETE FROM streak_runs",
+    """
+    INSERT INTO streak_runs (start_date, end_date, length)
+    SELECT MIN(record_date), MAX(record_date), COUNT(*)
+    FROM (
+        SELECT record_date,
+               CAST(julianday(record_date) AS INTEGER)
+                   - ROW_NUMBER() OVER (ORDER BY record_date) AS island
+        FROM daily_totals
+    )
+    GROUP BY island
+    """
 ]
@@ -0,0 +1,58 @@
+"""查询性能统计
+
+开启SQL统计后执行一遍各页面常用的读取操作，按总耗时输出最慢的语句。
+慢查询同时写入 data/slow_queries.log。
+
+用法: python dump_query_stats.py [输出条数] [重复次数]
+"""
+import sys
+from database.instrumentation import set_profiling, query_stats
+
+# 必须在创建任何数据库连接之前开启
+set_profiling(True)
+
+from database.db_manager import DatabaseManager
+from services.study_service import StudyService
+from services.stats_service import StatsService
+from services.achievement_service import AchievementService
+
+
+def run_workload(rounds: int):
+    """模拟首页、统计页、成就页的读取"""
+    db = DatabaseManager()
+    study_service = StudyService()
+    stats_service = StatsService()
+    achievement_service = AchievementService()
+
+    for _ in range(rounds):
+        study_service.get_today_progress()
+        study_service.get_level_info()
+        study_service.get_streak_days()
+        study_service.get_subject_distribution()
+        stats_service.get_overview_stats()
+        stats_service.get_weekly_trend()
+        stats_service.get_monthly_trend()
+        stats_service.get_heatmap_data()
+        stats_service.get_subject_stats()
+        achievement_service.get_all_achievements()
+        db.get_all_subjects()
+        db.get_user_config()
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    run_workload(rounds)
+
+    print(f"{'总耗时ms':>10}{'次数':>6}{'平均ms':>9}{'最长ms':>9}{'行数':>8}  位置 / SQL")
+    for stat in query_stats(limit):
+        print(f"{stat['total_ms']:>10.2f}{stat['calls']:>6}{stat['avg_ms']:>9.3f}"
+              f"{stat['max_ms']:>9.3f}{stat['rows']:>8}  {stat['site']}")
+        print(f"{'':>42}{stat['sql'][:100]}")
+        if stat['plan']:
+            print(f"{'':>42}PLAN: {'; '.join(stat['plan'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""从CSV/JSONL文件批量导入学习记录
+
+文件每行包含日期（date）、科目名（subject）或科目ID（subject_id）和题数（count）。
+
+用法: python import_records.py <文件路径> [csv|jsonl]
+"""
+import sys
+from services.import_service import ImportService
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    path = sys.argv[1]
+    file_format = sys.argv[2] if len(sys.argv) > 2 else None
+
+    print(f"📥 开始导入: {path}")
+    stats = ImportService().import_file(
+        path, file_format,
+        progress_callback=lambda s: print(f"  已写入 {s['rows']} 行（{s['rows_per_second']:.0f} 行/秒）")
+    )
+
+    print(f"✅ 导入完成: {stats['rows']} 行，耗时 {stats['seconds']:.2f} 秒，"
+          f"{stats['rows_per_second']:.0f} 行/秒")
+    if stats['skipped']:
+        print(f"⚠️ 跳过 {stats['skipped']} 行:")
+        for error in stats['errors']:
+            print(f"  {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -18,9 +18,11 @@ from kivy.core.window import Window
 from kivy.core.text import LabelBase
 from kivy.metrics import dp
 from kivy.lang import Builder
+from kivy.clock import Clock
 
-from config.settings import APP_NAME, APP_VERSION
+from config.settings import APP_NAME, APP_VERSION, AI_PREGEN_CHECK_INTERVAL
 from database.db_manager import DatabaseManager
+from services.ai_pregenerator import get_pregenerator
 
 # 注册中文字体
 try:
@@ -269,9 +271,26 @@ class AchievementApp(MDApp):
             print(f"📚 当前总题数: {total_count}")
         except Exception as e:
             print(f"❌ 数据库错误: {e}")
+        
+        # 空闲时预生成可能触发的AI鼓励
+        Clock.schedule_interval(get_pregenerator(self.db).tick, AI_PREGEN_CHECK_INTERVAL)
+    
+    def on_pause(self):
+        """应用切到后台时调用（Android上之后可能直接被系统结束，不再调用on_stop）"""
+        # 写入刷题页面缓冲中的点击，保存学习会话
+        record_screen = getattr(self, 'page_widgets', {}).get('record')
+        if record_screen:
+            record_screen.tap_buffer.flush(notify=False)
+            record_screen.achievement_service.tap_rate.save_sessions()
+        return True
     
     def on_stop(self):
         """应用关闭时调用"""
+        # 写入刷题页面缓冲中的点击
+        record_screen = getattr(self, 'page_widgets', {}).get('record')
+        if record_screen:
+            record_screen.tap_buffer.close()
+        
         if self.db:
             self.db.close()
         print(f"👋 {APP_NAME} 已关闭")
@@ -0,0 +1,8 @@
+"""根据原始学习记录重建每日汇总表和连续打卡段"""
+from database.db_manager import DatabaseManager
+
+db = DatabaseManager()
+
+print("🔄 重建每日汇总表和连续打卡段...")
+days = db.rebuild_daily_totals()
+print(f"✅ 重建完成，共 {days} 天有记录")
@@ -3,3 +3,7 @@ from .study_service import StudyService
 from .achievement_service import AchievementService
 from .ai_service import AIService
 from .stats_service import StatsService
+from .import_service import ImportService
+from .tap_buffer import TapBuffer
+from .history_store import HistoryStore, get_history_store
+from .stats_snapshot import StatsSnapshot, get_stats_snapshot
@@ -0,0 +1,273 @@
+"""成就条件语言
+
+成就条件是一个只有一个键的JSON对象，编译为带参数的SQL判断表达式，
+所有待检查的成就拼成一条 UNION ALL 查询一次求值。
+
+    {"total_count": 1000}                                   总题数
+    {"streak_days": 7}                                      当前连续打卡天数
+    {"subject_total": {"subject": "数学", "at_least": 500}}  某科目总题数（科目ID或名称）
+    {"subjects_over": {"at_least": 100, "count": 3,
+                       "subjects": ["数学", "英语", 5]}}     N个科目（默认所有科目中）达到题数
+    {"window_count": {"days": 7, "at_least": 300,
+                      "subject": "数学"}}                    最近N天（含今天）题数，科目可选
+    {"time_of_day": {"days": 30, "before": "07:00",
+                     "at_least": 5}}                         最近N天中在某时段开始学习的天数
+                                                            （before / after，可同时给出，跨午夜也可）
+    {"all": [条件, ...]} / {"any": [条件, ...]}               组合
+
+学习记录上的条件必须限定最近天数（走天编号索引），校验时还会检查
+查询计划，拒绝需要全表扫描学习记录的条件。
+"""
+import json
+import re
+import sqlite3
+from datetime import date
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from database.day_numbers import day_number, day_to_str
+
+# 最近天数条件的上限
+MAX_WINDOW_DAYS = 366
+# 组合条件的最大嵌套层数
+MAX_DEPTH = 4
+# 一条 UNION ALL 查询最多包含的成就数（SQLite复合查询上限为500）
+EVALUATE_CHUNK = 200
+
+# 不允许全表扫描的表（随使用时间增长）
+_GROWING_TABLES = ('study_records', 'daily_totals', 'streak_runs')
+
+# 查询计划中的全表扫描（SQLite 3.36起为 "SCAN 表名"，之前为 "SCAN TABLE 表名"）
+_SCAN_PATTERN = re.compile(r'SCAN (?:TABLE )?(\w+)\b')
+
+_TIME_PATTERN = re.compile(r'^([01]\d|2[0-3]):[0-5]\d$')
+
+
+class ConditionError(ValueError):
+    """成就条件无效或无法走索引"""
+
+
+class _Today:
+    """绑定时替换为今天（加偏移）的参数占位"""
+
+    def __init__(self, offset: int = 0, as_date: bool = False):
+        self.offset = offset
+        self.as_date = as_date
+
+    def resolve(self, today: int):
+        day = today + self.offset
+        return day_to_str(day) if self.as_date else day
+
+
+class CompiledCondition:
+    """编译后的条件（SQL判断表达式 + 参数）"""
+
+    def __init__(self, sql: str, params: List[Any]):
+        self.sql = sql
+        self.params = params
+
+    def bind(self, today: int) -> List[Any]:
+        """得到实际参数（替换今天相关的占位）"""
+        return [p.resolve(today) if isinstance(p, _Today) else p for p in self.params]
+
+
+# ==================== 编译 ====================
+
+def compile_condition(condition: Dict[str, Any]) -> CompiledCondition:
+    """
+    编译成就条件
+
+    Args:
+        condition: 条件对象（见模块说明）
+
+    Returns:
+        编译后的条件
+
+    Raises:
+        ConditionError: 条件格式错误
+    """
+    params: List[Any] = []
+    sql = _compile(condition, params, 0)
+    return CompiledCondition(sql, params)
+
+
+def _compile(condition: Any, params: List[Any], depth: int) -> str:
+    """递归编译，参数按顺序追加到params"""
+    if not isinstance(condition, dict) or len(condition) != 1:
+        raise ConditionError(f"条件必须是只有一个键的对象: {condition!r}")
+    if depth > MAX_DEPTH:
+        raise ConditionError(f"条件嵌套超过 {MAX_DEPTH} 层")
+
+    (kind, spec), = condition.items()
+
+    if kind in ('all', 'any'):
+        if not isinstance(spec, list) or not spec:
+            raise ConditionError(f"{kind} 需要非空的条件列表")
+        joiner = ' AND ' if kind == 'all' else ' OR '
+        return '(' + joiner.join(_compile(item, params, depth + 1) for item in spec) + ')'
+
+    if kind == 'total_count':
+        params.append(_positive(spec, kind))
+        return "((SELECT COALESCE(SUM(total_count), 0) FROM subjects) >= ?)"
+
+    if kind == 'streak_days':
+        # 最近一段连续打卡在今天或昨天结束时才有效（同 get_streak_days）
+        params.extend([_Today(-1, as_date=True), _positive(spec, kind)])
+        return """(COALESCE((SELECT length FROM streak_runs WHERE end_date >= ?
+                             ORDER BY end_date DESC LIMIT 1), 0) >= ?)"""
+
+    if kind == 'single_submit':
+        raise ConditionError("single_submit 按每次提交判断，只能作为速度型成就的单独条件")
+
+    if kind == 'subject_total':
+        spec = _spec(spec, kind, required=('subject', 'at_least'))
+        column, value = _subject_ref(spec['subject'])
+        params.extend([value, _positive(spec['at_least'], 'at_least')])
+        return f"(COALESCE((SELECT total_count FROM subjects WHERE {column} = ?), 0) >= ?)"
+
+    if kind == 'subjects_over':
+        spec = _spec(spec, kind, required=('at_least', 'count'), optional=('subjects',))
+        params.append(_positive(spec['at_least'], 'at_least'))
+        where = "total_count >= ?"
+        if 'subjects' in spec:
+            subjects = spec['subjects']
+            if not isinstance(subjects, list) or not subjects:
+                raise ConditionError("subjects 需要非空的科目列表")
+            refs = [_subject_ref(s) for s in subjects]
+            where += " AND (id IN (SELECT value FROM json_each(?)) OR name IN (SELECT value FROM json_each(?)))"
+            params.append(json.dumps([v for c, v in refs if c == 'id']))
+            params.append(json.dumps([v for c, v in refs if c == 'name'], ensure_ascii=False))
+        params.append(_positive(spec['count'], 'count'))
+        return f"((SELECT COUNT(*) FROM subjects WHERE {where}) >= ?)"
+
+    if kind == 'window_count':
+        spec = _spec(spec, kind, required=('days', 'at_least'), optional=('subject',))
+        params.append(_Today(1 - _window_days(spec['days'])))
+        where = "day >= ?"
+        if 'subject' in spec:
+            column, value = _subject_ref(spec['subject'])
+            where += f" AND subject_id = (SELECT id FROM subjects WHERE {column} = ?)"
+            params.append(value)
+        params.append(_positive(spec['at_least'], 'at_least'))
+        return f"((SELECT COALESCE(SUM(count), 0) FROM study_records WHERE {where}) >= ?)"
+
+    if kind == 'time_of_day':
+        spec = _spec(spec, kind, required=('days', 'at_least'), optional=('before', 'after'))
+        before, after = spec.get('before'), spec.get('after')
+        if before is None and after is None:
+            raise ConditionError("time_of_day 需要 before 或 after")
+        for value in (before, after):
+            if value is not None and not (isinstance(value, str) and _TIME_PATTERN.match(value)):
+                raise ConditionError(f"时间格式应为 HH:MM: {value!r}")
+
+        params.append(_Today(1 - _window_days(spec['days'])))
+        local_time = "time(created_at, 'localtime')"
+        if before is not None and after is not None:
+            # after > before 表示跨午夜（如 22:00 之后或 02:00 之前）
+            joiner = ' OR ' if after > before else ' AND '
+            time_sql = f"({local_time} >= ?{joiner}{local_time} < ?)"
+            params.extend([after + ':00', before + ':00'])
+        elif before is not None:
+            time_sql = f"{local_time} < ?"
+            params.append(before + ':00')
+        else:
+            time_sql = f"{local_time} >= ?"
+            params.append(after + ':00')
+        params.append(_positive(spec['at_least'], 'at_least'))
+        return f"((SELECT COUNT(DISTINCT day) FROM study_records WHERE day >= ? AND {time_sql}) >= ?)"
+
+    raise ConditionError(f"未知的条件类型: {kind}")
+
+
+def _spec(spec: Any, kind: str, required: Tuple[str, ...], optional: Tuple[str, ...] = ()) -> Dict:
+    """检查参数对象的字段"""
+    if not isinstance(spec, dict):
+        raise ConditionError(f"{kind} 的参数必须是对象")
+    missing = [key for key in required if key not in spec]
+    if missing:
+        raise ConditionError(f"{kind} 缺少参数: {', '.join(missing)}")
+    unknown = [key for key in spec if key not in required + optional]
+    if unknown:
+        raise ConditionError(f"{kind} 不支持的参数: {', '.join(unknown)}")
+    return spec
+
+
+def _positive(value: Any, name: str) -> int:
+    """正整数参数"""
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ConditionError(f"{name} 必须是正整数: {value!r}")
+    return value
+
+
+def _window_days(value: Any) -> int:
+    """最近天数（必须有上限才能走天编号索引）"""
+    days = _positive(value, 'days')
+    if days > MAX_WINDOW_DAYS:
+        raise ConditionError(f"days 不能超过 {MAX_WINDOW_DAYS}（更长的范围请用 total_count 或 subject_total）")
+    return days
+
+
+def _subject_ref(subject: Any) -> Tuple[str, Any]:
+    """科目引用：整数为科目ID，字符串为科目名（都有索引）"""
+    if isinstance(subject, bool):
+        raise ConditionError(f"无效的科目: {subject!r}")
+    if isinstance(subject, int):
+        return 'id', subject
+    if isinstance(subject, str) and subject.strip():
+        return 'name', subject.strip()
+    raise ConditionError(f"无效的科目: {subject!r}")
+
+
+# ==================== 校验和求值 ====================
+
+def validate_condition(conn: sqlite3.Connection, condition: Dict[str, Any]) -> CompiledCondition:
+    """
+    校验条件：格式正确，且查询计划中没有全表扫描随时间增长的表
+
+    Args:
+        conn: 数据库连接（用于 EXPLAIN QUERY PLAN）
+        condition: 条件对象
+
+    Returns:
+        编译后的条件
+
+    Raises:
+        ConditionError: 条件无效或无法走索引
+    """
+    compiled = compile_condition(condition)
+    rows = conn.execute(f"EXPLAIN QUERY PLAN SELECT 1 WHERE {compiled.sql}",
+                        compiled.bind(day_number(date.today()))).fetchall()
+    for row in rows:
+        detail = row[3]
+        scan = _SCAN_PATTERN.match(detail)
+        if scan and scan.group(1) in _GROWING_TABLES:
+            raise ConditionError(f"条件需要全表扫描 {scan.group(1)}，无法走索引: {detail}")
+    return compiled
+
+
+def evaluate_conditions(conn: sqlite3.Connection,
+                        conditions: Iterable[Tuple[int, CompiledCondition]],
+                        today: int = None) -> Set[int]:
+    """
+    一次查询求值多个条件（每块最多 EVALUATE_CHUNK 个成就）
+
+    Args:
+        conn: 数据库连接
+        conditions: (成就ID, 编译后的条件)
+        today: 今天的天编号，默认当天
+
+    Returns:
+        满足条件的成就ID集合
+    """
+    if today is None:
+        today = day_number(date.today())
+
+    conditions = list(conditions)
+    satisfied: Set[int] = set()
+    for start in range(0, len(conditions), EVALUATE_CHUNK):
+        parts, params = [], []
+        for achievement_id, compiled in conditions[start:start + EVALUATE_CHUNK]:
+            parts.append(f"SELECT ? WHERE {compiled.sql}")
+            params.append(achievement_id)
+            params.extend(compiled.bind(today))
+        rows = conn.execute(' UNION ALL '.join(parts), params).fetchall()
+        satisfied.update(row[0] for row in rows)
+    return satisfied
@@ -0,0 +1,184 @@
+"""成就规则编译
+
+把成就目录编译为按指标分组的有序阈值数组：检查时用二分查找只取出
+当前数值已经达到的阈值，不再逐条解析和判断全部成就。
+
+- 不可重复成就：未解锁的按阈值排序，解锁后从数组中移除
+- 可重复成就：始终保留，每次达到都会再次解锁
+- 速率型速度成就（{"tap_rate": 题数, "window_minutes": 分钟}）：按时间窗口分组，
+  每次刷题后用窗口内题数的变化判断（可重复的只在越过阈值时解锁）
+- 自定义成就（CUSTOM）：条件编译为SQL判断表达式（见 achievement_conditions），
+  检查时所有待解锁的自定义成就一条查询求值
+"""
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Tuple
+from database.events import COUNT_ADDED, DAY_ROLLED, SUBJECT_ADDED, SUBJECTS_CHANGED
+from .achievement_conditions import CompiledCondition, ConditionError, compile_condition
+
+# 成就类型 -> 条件字段（同时作为检查时的指标名）
+TYPE_METRICS = {
+    'QUANTITY': 'total_count',      # 总题数
+    'STREAK': 'streak_days',        # 连续打卡天数
+    'SPEED': 'single_submit',       # 单次提交题数
+    'VERSATILE': 'all_subjects',    # 题数最少的科目的题数
+}
+
+# 速率型速度成就的条件字段（指标名为 (RATE_METRIC, 窗口秒数)）
+RATE_METRIC = 'tap_rate'
+
+# 自定义成就的类型和指标名
+CUSTOM_TYPE = 'CUSTOM'
+CUSTOM_METRIC = 'custom'
+
+# 指标 -> 可能改变其结果的写入事件
+METRIC_EVENTS = {
+    'total_count': (COUNT_ADDED,),
+    'streak_days': (DAY_ROLLED,),
+    'single_submit': (COUNT_ADDED,),
+    'all_subjects': (COUNT_ADDED, SUBJECT_ADDED, SUBJECTS_CHANGED),
+    CUSTOM_METRIC: (COUNT_ADDED, DAY_ROLLED, SUBJECT_ADDED, SUBJECTS_CHANGED),
+}
+
+
+class _ThresholdIndex:
+    """单个指标的有序阈值数组（阈值和成就一一对应）"""
+
+    def __init__(self):
+        self.thresholds: List[int] = []
+        self.achievements: List[Dict] = []
+
+    def add(self, threshold: int, achievement: Dict):
+        """按阈值有序插入"""
+        index = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(index, threshold)
+        self.achievements.insert(index, achievement)
+
+    def reached(self, value) -> List[Dict]:
+        """阈值不超过当前数值的成就"""
+        return self.achievements[:bisect_right(self.thresholds, value)]
+
+    def crossed(self, before, after) -> List[Dict]:
+        """数值从before增加到after时越过的阈值（before < 阈值 <= after）"""
+        return self.achievements[bisect_right(self.thresholds, before):bisect_right(self.thresholds, after)]
+
+    def remove(self, threshold: int, achievement_id: int):
+        """移除成就（阈值相同的成就中按ID查找）"""
+        index = bisect_left(self.thresholds, threshold)
+        while index < len(self.thresholds) and self.thresholds[index] == threshold:
+            if self.achievements[index]['id'] == achievement_id:
+                del self.thresholds[index]
+                del self.achievements[index]
+                return
+            index += 1
+
+
+class AchievementRules:
+    """编译后的成就规则类"""
+
+    def __init__(self, achievements: List[Dict]):
+        """
+        编译成就目录
+
+        Args:
+            achievements: DatabaseManager.get_all_achievements() 的结果（条件已解析）
+        """
+        self._locked: Dict[Any, _ThresholdIndex] = {metric: _ThresholdIndex() for metric in TYPE_METRICS.values()}
+        self._repeatable: Dict[Any, _ThresholdIndex] = {metric: _ThresholdIndex() for metric in TYPE_METRICS.values()}
+        # 成就ID -> (指标, 阈值)
+        self._rules: Dict[int, Tuple[Any, int]] = {}
+        # 自定义成就ID -> (成就, 编译后的条件)
+        self._custom_locked: Dict[int, Tuple[Dict, CompiledCondition]] = {}
+        self._custom_repeatable: Dict[int, Tuple[Dict, CompiledCondition]] = {}
+
+        for achievement in achievements:
+            if achievement['type'] == CUSTOM_TYPE:
+                self._add_custom(achievement)
+                continue
+
+            metric = TYPE_METRICS.get(achievement['type'])
+            condition = achievement['condition']
+            if metric == 'single_submit' and RATE_METRIC in condition:
+                metric = (RATE_METRIC, int(condition.get('window_minutes', 1) * 60))
+                self._locked.setdefault(metric, _ThresholdIndex())
+                self._repeatable.setdefault(metric, _ThresholdIndex())
+                threshold = condition[RATE_METRIC]
+            elif metric is None or metric not in condition:
+                continue
+            else:
+                threshold = condition[metric]
+            self._rules[achievement['id']] = (metric, threshold)
+
+            if achievement.get('repeatable'):
+                self._repeatable[metric].add(threshold, achievement)
+            elif not achievement['is_unlocked']:
+                self._locked[metric].add(threshold, achievement)
+
+    def _add_custom(self, achievement: Dict):
+        """编译自定义成就的条件（无效的条件跳过）"""
+        try:
+            compiled = compile_condition(achievement['condition'])
+        except ConditionError as e:
+            print(f"[WARN] 成就 '{achievement['name']}' 的条件无效，已跳过: {e}")
+            return
+
+        if achievement.get('repeatable'):
+            self._custom_repeatable[achievement['id']] = (achievement, compiled)
+        elif not achievement['is_unlocked']:
+            self._custom_locked[achievement['id']] = (achievement, compiled)
+
+    def __len__(self) -> int:
+        """规则条数"""
+        return len(self._rules) + len(self._custom_locked) + len(self._custom_repeatable)
+
+    def has_rules(self, metric: str) -> bool:
+        """指标是否还有需要检查的成就"""
+        if metric == CUSTOM_METRIC:
+            return bool(self._custom_locked or self._custom_repeatable)
+        return bool(self._locked[metric].thresholds or self._repeatable[metric].thresholds)
+
+    def reached(self, metric: str, value) -> List[Dict]:
+        """
+        当前数值已达到的待解锁成就
+
+        Args:
+            metric: 指标名（见 TYPE_METRICS）
+            value: 指标当前数值
+
+        Returns:
+            未解锁的不可重复成就和所有可重复成就中阈值不超过数值的成就
+        """
+        return self._locked[metric].reached(value) + self._repeatable[metric].reached(value)
+
+    def rate_windows(self) -> List[int]:
+        """速率型成就的时间窗口（秒）"""
+        return sorted(metric[1] for metric in self._locked if isinstance(metric, tuple))
+
+    def crossed_rate(self, window_seconds: int, before: int, after: int) -> List[Dict]:
+        """
+        窗口内题数从before增加到after时达到的速率型成就
+
+        Returns:
+            未解锁的不可重复成就中阈值不超过after的成就，以及这次越过阈值的可重复成就
+        """
+        metric = (RATE_METRIC, window_seconds)
+        if metric not in self._locked:
+            return []
+        return self._locked[metric].reached(after) + self._repeatable[metric].crossed(before, after)
+
+    def custom_pending(self) -> List[Tuple[int, CompiledCondition]]:
+        """待检查的自定义成就：(成就ID, 编译后的条件)"""
+        return [(achievement_id, compiled)
+                for rules in (self._custom_locked, self._custom_repeatable)
+                for achievement_id, (_, compiled) in rules.items()]
+
+    def custom_achievement(self, achievement_id: int) -> Dict:
+        """自定义成就ID对应的成就"""
+        entry = self._custom_locked.get(achievement_id) or self._custom_repeatable[achievement_id]
+        return entry[0]
+
+    def mark_unlocked(self, achievement_id: int):
+        """成就已解锁：不可重复成就从待检查数组中移除"""
+        self._custom_locked.pop(achievement_id, None)
+        rule = self._rules.get(achievement_id)
+        if rule is not None:
+            self._locked[rule[0]].remove(rule[1], achievement_id)
@@ -1,130 +1,220 @@
 """成就系统服务"""
 import json
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Set, Tuple
 from database.db_manager import DatabaseManager
+from database.events import events, ALL_EVENTS, ACHIEVEMENTS_RESET, ACHIEVEMENTS_CHANGED, COUNT_ADDED
 from .study_service import StudyService
+from .achievement_rules import AchievementRules, METRIC_EVENTS, CUSTOM_METRIC, CUSTOM_TYPE
+from .achievement_conditions import evaluate_conditions, validate_condition
+from .tap_rate import get_tap_rate_tracker
+
+
+class AchievementTracker:
+    """
+    成就检查状态（同一数据库共用一个）
+    
+    订阅写入事件，只记录哪些指标可能发生了变化（见 METRIC_EVENTS）；
+    检查成就时只判断这些指标对应的成就类型。
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.rules = None
+        self._lock = threading.Lock()
+        # 刚创建或成就清空后检查全部指标
+        self._dirty = set(METRIC_EVENTS)
+        self._submits: List[int] = []
+        
+        events.subscribe(ALL_EVENTS, self._on_event)
+    
+    def reset(self):
+        """丢弃编译的规则，下次检查全部指标"""
+        with self._lock:
+            self.rules = None
+            self._dirty = set(METRIC_EVENTS)
+    
+    def take(self) -> Tuple[Set[str], List[int]]:
+        """取出待检查的指标和单次提交题数（并清空）"""
+        with self._lock:
+            dirty, submits = self._dirty, self._submits
+            self._dirty, self._submits = set(), []
+        return dirty, submits
+    
+    def _on_event(self, event: str, db_path: str, payload: Dict):
+        """写入事件：标记可能变化的指标"""
+        if db_path != self.db_path:
+            return
+        if event in (ACHIEVEMENTS_RESET, ACHIEVEMENTS_CHANGED):
+            self.reset()
+            return
+        
+        with self._lock:
+            for metric, metric_events in METRIC_EVENTS.items():
+                if event in metric_events and metric != 'single_submit':
+                    self._dirty.add(metric)
+            
+            if event == COUNT_ADDED and payload.get('single_submit'):
+                self._dirty.add('single_submit')
+                self._submits.append(payload['single_submit'])
+
+
+_trackers: Dict[str, AchievementTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_achievement_tracker(db) -> AchievementTracker:
+    """获取数据库对应的成就检查状态"""
+    with _trackers_lock:
+        tracker = _trackers.get(db.db_path)
+        if tracker is None:
+            tracker = _trackers[db.db_path] = AchievementTracker(db.db_path)
+        return tracker
 
 
 class AchievementService:
     """成就系统服务类"""
     
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.study_service = StudyService()
+    def __init__(self, db=None):
+        """
+        初始化成就服务
+        
+        Args:
+            db: 数据库管理器实例（可选）
+        """
+        self.db = db if db else DatabaseManager()
+        self.study_service = StudyService(db=self.db)
+        self.tracker = get_achievement_tracker(self.db)
+        self.tap_rate = get_tap_rate_tracker(self.db)
+    
+    @property
+    def rules(self) -> AchievementRules:
+        """编译后的成就规则（第一次使用时编译，成就清空后重新编译）"""
+        if self.tracker.rules is None:
+            self.tracker.rules = AchievementRules(self.db.get_all_achievements())
+        return self.tracker.rules
+    
+    def invalidate_rules(self):
+        """成就目录变化后重新编译规则（并检查全部指标）"""
+        self.tracker.reset()
     
     def check_achievements(self) -> List[Dict[str, Any]]:
         """
         检查并解锁成就（支持可重复成就）
         
+        只判断上次检查后写入事件可能改变的成就类型：新增题数检查数量型和速度型，
+        某天第一次打卡才检查连续型，科目变化检查全能型；
+        待解锁的自定义成就合并为一条查询求值。
+        
         Returns:
             新解锁的成就列表
         """
-        newly_unlocked = []
+        rules = self.rules
+        dirty, submits = self.tracker.take()
+        candidates = []
         
-        # 获取所有成就
-        achievements = self.db.get_all_achievements()
+        if 'total_count' in dirty or 'streak_days' in dirty:
+            snapshot = self.study_service.get_snapshot()
+            if 'total_count' in dirty:
+                candidates += rules.reached('total_count', snapshot.total_count)
+            if 'streak_days' in dirty:
+                candidates += rules.reached('streak_days', snapshot.streak_days)
         
-        # 获取当前统计数据
-        total_count = self.study_service.get_total_count()
-        streak_days = self.study_service.get_streak_days()
-        today_progress = self.study_service.get_today_progress()
+        # 速度型成就：每次单次提交分别判断
+        for count in submits:
+            candidates += rules.reached('single_submit', count)
         
-        for achievement in achievements:
-            # 检查是否可重复
-            repeatable = achievement.get('repeatable', False)
-            
-            # 如果不可重复且已解锁，跳过
-            if not repeatable and achievement['is_unlocked']:
-                continue
-            
-            # 检查是否满足条件
-            if self._check_condition(achievement, total_count, streak_days, today_progress):
-                # 尝试解锁成就
-                result = self.db.unlock_achievement(achievement['id'], repeatable)
-                
-                if result['unlocked']:
-                    # 添加解锁信息
-                    achievement['count'] = result['count']
-                    achievement['is_first'] = result['is_first']
-                    newly_unlocked.append(achievement)
+        # 全能型成就：所有科目都达到阈值，即题数最少的科目达到阈值
+        if 'all_subjects' in dirty and rules.has_rules('all_subjects'):
+            subjects = self.db.get_all_subjects()
+            lowest = min((s['total_count'] for s in subjects), default=float('inf'))
+            candidates += rules.reached('all_subjects', lowest)
         
-        return newly_unlocked
+        # 自定义成就：一条查询求值全部待检查的条件
+        if CUSTOM_METRIC in dirty and rules.has_rules(CUSTOM_METRIC):
+            satisfied = evaluate_conditions(self.db.get_connection(), rules.custom_pending())
+            candidates += [rules.custom_achievement(achievement_id) for achievement_id in sorted(satisfied)]
+        
+        return self._unlock(candidates)
     
-    def _check_condition(self, achievement: Dict, total_count: int, 
-                        streak_days: int, today_progress: Dict) -> bool:
+    def check_speed_achievement(self, count: int) -> List[Dict[str, Any]]:
         """
-        检查成就条件是否满足
+        检查速度型成就（单次提交）
+        
+        通过 DatabaseManager.record_study 写入的记录已自动加入 check_achievements 的检查，
+        不需要再调用此方法。
         
         Args:
-            achievement: 成就信息
-            total_count: 总题数
-            streak_days: 连续天数
-            today_progress: 今日进度
+            count: 单次提交的题目数
             
         Returns:
-            是否满足条件
+            新解锁的速度型成就列表
         """
-        condition = achievement['condition']
-        achievement_type = achievement['type']
+        return self._unlock(self.rules.reached('single_submit', count))
+    
+    def record_tap(self, subject_id: int, count: int = 1) -> List[Dict[str, Any]]:
+        """
+        记录一次刷题并检查速率型速度成就（每次点击调用，只判断窗口内题数的变化）
         
-        if achievement_type == 'QUANTITY':
-            # 数量型成就
-            if 'total_count' in condition:
-                return total_count >= condition['total_count']
+        Args:
+            subject_id: 科目ID
+            count: 题目数量
+            
+        Returns:
+            新解锁的速率型成就列表
+        """
+        rules = self.rules
+        self.tap_rate.set_windows(rules.rate_windows())
         
-        elif achievement_type == 'STREAK':
-            # 连续型成就
-            if 'streak_days' in condition:
-                return streak_days >= condition['streak_days']
-        
-        elif achievement_type == 'SPEED':
-            # 速度型成就
-            if 'single_submit' in condition:
-                # 这个需要在添加记录时检查
-                # 这里简化处理，返回False
-                return False
-        
-        elif achievement_type == 'VERSATILE':
-            # 全能型成就
-            if 'all_subjects' in condition:
-                subjects = self.db.get_all_subjects()
-                threshold = condition['all_subjects']
-                return all(s['total_count'] >= threshold for s in subjects)
-        
-        return False
+        candidates = []
+        for window_seconds, (before, after) in self.tap_rate.add(subject_id, count).items():
+            candidates += rules.crossed_rate(window_seconds, before, after)
+        return self._unlock(candidates)
     
-    def check_speed_achievement(self, count: int) -> List[Dict[str, Any]]:
+    def add_custom_achievement(self, name: str, description: str, condition: Dict[str, Any],
+                               rarity: str = 'BRONZE', icon: str = '🏆', repeatable: bool = False) -> int:
         """
-        检查速度型成就（单次提交）
+        添加自定义成就（条件见 achievement_conditions）
         
         Args:
-            count: 单次提交的题目数
+            name: 成就名称
+            description: 成就描述
+            condition: 条件对象
+            rarity: 稀有度
+            icon: 图标
+            repeatable: 是否可重复解锁
             
         Returns:
-            新解锁的速度型成就列表
+            新成就ID
+            
+        Raises:
+            ConditionError: 条件无效或无法走索引
         """
+        validate_condition(self.db.get_connection(), condition)
+        return self.db.add_achievement(name, description, CUSTOM_TYPE, rarity, condition,
+                                       icon=icon, repeatable=repeatable)
+    
+    def _unlock(self, candidates: List[Dict]) -> List[Dict[str, Any]]:
+        """解锁达到条件的成就"""
         newly_unlocked = []
-        achievements = self.db.get_all_achievements()
+        if not candidates:
+            return newly_unlocked
         
-        for achievement in achievements:
-            if achievement['type'] != 'SPEED':
-                continue
-            
-            # 检查是否可重复
-            repeatable = achievement.get('repeatable', False)
-            
-            # 如果不可重复且已解锁，跳过
-            if not repeatable and achievement['is_unlocked']:
-                continue
+        # 一个事务写入全部解锁
+        results = self.db.unlock_achievements_batch(
+            (achievement['id'], bool(achievement.get('repeatable', False))) for achievement in candidates
+        )
+        
+        for achievement in candidates:
+            result = results[achievement['id']]
+            self.rules.mark_unlocked(achievement['id'])
             
-            condition = achievement['condition']
-            if 'single_submit' in condition:
-                if count >= condition['single_submit']:
-                    result = self.db.unlock_achievement(achievement['id'], repeatable)
-                    if result['unlocked']:
-                        achievement['count'] = result['count']
-                        achievement['is_first'] = result['is_first']
-                        newly_unlocked.append(achievement)
+            if result['unlocked']:
+                # 添加解锁信息
+                achievement = dict(achievement)
+                achievement['count'] = result['count']
+                achievement['is_first'] = result['is_first']
+                newly_unlocked.append(achievement)
         
         return newly_unlocked
     
@@ -163,6 +253,34 @@ class AchievementService:
         if not achievement:
             return None
         
+        return self._progress(achievement, self.study_service.get_snapshot())
+    
+    def get_all_achievement_progress(self) -> Dict[str, Any]:
+        """
+        获取所有成就及其进度（一次读取成就目录，共用一个统计快照）
+        
+        Returns:
+            与 get_all_achievements 相同的分类字典，每个成就另含
+            'progress'（同 get_achievement_progress）和解锁次数 'count'
+        """
+        achievements = self.db.get_all_achievements()
+        snapshot = self.study_service.get_snapshot()
+        
+        for achievement in achievements:
+            achievement['progress'] = self._progress(achievement, snapshot)
+        
+        unlocked = [a for a in achievements if a['is_unlocked']]
+        locked = [a for a in achievements if not a['is_unlocked']]
+        
+        return {
+            'unlocked': unlocked,
+            'locked': locked,
+            'total': len(achievements),
+            'unlocked_count': len(unlocked)
+        }
+    
+    def _progress(self, achievement: Dict, snapshot) -> Dict[str, Any]:
+        """根据统计快照计算单个成就的进度"""
         if achievement['is_unlocked']:
             return {
                 'progress': 100,
@@ -175,39 +293,28 @@ class AchievementService:
         condition = achievement['condition']
         achievement_type = achievement['type']
         
-        total_count = self.study_service.get_total_count()
-        streak_days = self.study_service.get_streak_days()
-        
         if achievement_type == 'QUANTITY':
             target = condition.get('total_count', 0)
-            current = min(total_count, target)
-            progress = int(current / target * 100) if target > 0 else 0
-            
-            return {
-                'progress': progress,
-                'current': current,
-                'target': target,
-                'remaining': max(0, target - current),
-                'unlocked': False
-            }
+            current = min(snapshot.total_count, target)
         
         elif achievement_type == 'STREAK':
             target = condition.get('streak_days', 0)
-            current = min(streak_days, target)
-            progress = int(current / target * 100) if target > 0 else 0
-            
+            current = min(snapshot.streak_days, target)
+        
+        else:
             return {
-                'progress': progress,
-                'current': current,
-                'target': target,
-                'remaining': max(0, target - current),
+                'progress': 0,
+                'current': 0,
+                'target': 0,
                 'unlocked': False
             }
         
+        progress = int(current / target * 100) if target > 0 else 0
         return {
-            'progress': 0,
-            'current': 0,
-            'target': 0,
+            'progress': progress,
+            'current': current,
+            'target': target,
+            'remaining': max(0, target - current),
             'unlocked': False
         }
     
@@ -0,0 +1,198 @@
+"""AI回复缓存
+
+同一身份、同一场景、学习数据处于同一档位时，鼓励的提示词几乎相同，
+不必每次都请求API。回复按缓存键保存在 ai_response_cache 表中：
+
+- 缓存键：身份 + 场景 + 分档后的学习数据（今日进度四分位、连续打卡档位、等级）+ 上下文
+- 每个键保留 AI_CACHE_VARIANTS 条不同回复：集满之前照常请求API并加入缓存，
+  集满后轮换使用最久未用的一条，避免原样重复
+- 保存超过 AI_CACHE_TTL_SECONDS 的回复不再直接使用（新回复替换最旧的一条），
+  总条数超过 AI_CACHE_MAX_ENTRIES 时淘汰最久未用的回复
+- 连不上API时使用缓存（可以是过期的，或同身份同场景其他档位的回复），
+  之后 AI_CACHE_OFFLINE_RETRY_SECONDS 秒内不再等待网络，直接返回缓存
+- 空闲时预生成的回复（见 services.ai_pregenerator）不必等集满，首次查询即命中
+"""
+import json
+import threading
+import time
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Optional, Set
+from config.settings import (AI_CACHE_TTL_SECONDS, AI_CACHE_VARIANTS, AI_CACHE_MAX_ENTRIES,
+                             AI_CACHE_OFFLINE_RETRY_SECONDS)
+
+# 连续打卡天数的档位边界（与里程碑对应）
+STREAK_BANDS = (1, 3, 7, 14, 30, 100, 365)
+
+# 不按今日进度分档的场景（里程碑在当天第一次刷题时触发，题数不定）
+PROGRESS_FREE_SCENES = ('streak_milestone',)
+
+
+def _quantize(value: Any) -> Any:
+    """上下文中的数量按2的幂分档，其他值原样保留"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"~{max(value, 0).bit_length()}"
+    return value
+
+
+def stats_bucket(snapshot, with_progress: bool = True) -> str:
+    """
+    学习数据分档
+
+    今日进度按每日目标的四分之一分档（完成目标为第4档；with_progress为False时不分），
+    连续打卡按 STREAK_BANDS 分档，总进度取等级。
+    """
+    today = snapshot.today_progress
+    target = max(today.get('target') or 0, 1)
+    progress = min(today.get('current', 0) * 4 // target, 4) if with_progress else '-'
+    streak = bisect_right(STREAK_BANDS, snapshot.streak_days)
+    return f"p{progress}s{streak}l{snapshot.level_info.get('level', 0)}"
+
+
+def cache_key(identity_id: int, trigger_scene: str, snapshot,
+              context: Dict[str, Any] = None) -> str:
+    """
+    缓存键
+
+    Args:
+        identity_id: AI身份ID
+        trigger_scene: 触发场景
+        snapshot: 学习统计快照
+        context: 场景上下文（数量分档）
+    """
+    parts = [str(identity_id), trigger_scene,
+             stats_bucket(snapshot, with_progress=trigger_scene not in PROGRESS_FREE_SCENES)]
+    if context:
+        quantized = {name: _quantize(value) for name, value in context.items()}
+        parts.append(json.dumps(quantized, sort_keys=True, ensure_ascii=False, default=str))
+    return '|'.join(parts)
+
+
+class ResponseCache:
+    """AI回复缓存（数据库连接按线程复用，可在AI执行器的线程中使用）"""
+
+    def __init__(self, db, ttl: float = AI_CACHE_TTL_SECONDS, variants: int = AI_CACHE_VARIANTS,
+                 max_entries: int = AI_CACHE_MAX_ENTRIES,
+                 offline_retry: float = AI_CACHE_OFFLINE_RETRY_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            db: 数据库管理器
+            ttl: 回复直接复用的有效期（秒）
+            variants: 每个缓存键保留的回复数
+            max_entries: 缓存总条数上限
+            offline_retry: 连不上API后直接使用缓存的时长（秒）
+            clock: 当前时间函数（Unix时间戳）
+        """
+        self.db = db
+        self.ttl = ttl
+        self.variants = variants
+        self.max_entries = max_entries
+        self.offline_retry = offline_retry
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._offline_until = 0.0
+        self._requests = 0
+        self._hits = 0
+        self._offline_hits = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查询缓存（有未用过的预生成回复，或集满 variants 条未过期的回复才命中）
+
+        Returns:
+            预生成的回复或最久未用的一条回复，未命中时为None
+        """
+        now = self.clock()
+        fresh, ready = self._fresh(key, now)
+        hit = bool(ready) or len(fresh) >= self.variants
+        with self._lock:
+            self._requests += 1
+            if hit:
+                self._hits += 1
+        if not hit:
+            return None
+
+        row = min(ready or fresh, key=lambda r: (r['last_used_at'], r['id']))
+        self.db.touch_cached_response(row['id'], now)
+        return row['content']
+
+    def has(self, key: str) -> bool:
+        """查询时是否会命中（不计入统计）"""
+        fresh, ready = self._fresh(key, self.clock())
+        return bool(ready) or len(fresh) >= self.variants
+
+    def _fresh(self, key: str, now: float):
+        """缓存键下未过期的回复和其中预生成的回复"""
+        fresh = [row for row in self.db.get_cached_responses(key) if row['created_at'] > now - self.ttl]
+        return fresh, [row for row in fresh if row['pregenerated']]
+
+    def put(self, key: str, identity_id: int, trigger_scene: str, content: str,
+            pregenerated: bool = False):
+        """保存API返回的回复（pregenerated：预生成、等待使用的回复）"""
+        self.db.save_cached_response(key, identity_id, trigger_scene, content, self.clock(),
+                                     self.variants, self.max_entries, pregenerated)
+
+    def ready_keys(self, identity_id: int) -> Set[str]:
+        """身份已有未过期的预生成回复的缓存键"""
+        return set(self.db.get_pregenerated_keys(identity_id, self.clock() - self.ttl))
+
+    def fallback(self, key: str, identity_id: int, trigger_scene: str) -> Optional[str]:
+        """
+        连不上API时的回复（不论是否过期，同键优先，其次同身份同场景）
+
+        Returns:
+            回复内容，没有可用缓存时为None
+        """
+        row = self.db.get_fallback_response(key, identity_id, trigger_scene)
+        if row is None:
+            return None
+        self.db.touch_cached_response(row['id'], self.clock())
+        with self._lock:
+            self._offline_hits += 1
+        return row['content']
+
+    @property
+    def offline(self) -> bool:
+        """最近是否连不上API（此期间直接使用缓存）"""
+        return self.clock() < self._offline_until
+
+    def mark_offline(self):
+        """记录API不可达"""
+        self._offline_until = self.clock() + self.offline_retry
+
+    def mark_online(self):
+        """记录API恢复"""
+        self._offline_until = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        命中统计（进程启动以来）
+
+        Returns:
+            requests: 查询次数
+            hits: 直接命中次数
+            offline_hits: 连不上API时使用缓存的次数
+            hit_rate: 使用缓存的比例（直接命中 + 离线使用）
+        """
+        with self._lock:
+            served = self._hits + self._offline_hits
+            return {
+                'requests': self._requests,
+                'hits': self._hits,
+                'offline_hits': self._offline_hits,
+                'hit_rate': served / self._requests if self._requests else 0.0,
+            }
+
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(db) -> ResponseCache:
+    """获取数据库对应的AI回复缓存"""
+    with _caches_lock:
+        cache = _caches.get(db.db_path)
+        if cache is None:
+            cache = _caches[db.db_path] = ResponseCache(db)
+        return cache
@@ -0,0 +1,176 @@
+"""AI请求执行器
+
+AI鼓励和报告请求在固定大小的后台线程池中执行，结果经Kivy Clock回到主线程：
+
+- 去重：相同键（身份、场景、统计快照）的请求正在排队或执行时，
+  新请求不再调用API，而是等待同一个结果
+- 取消：按发起方（通常是页面）取消，排队中的请求不再执行，
+  执行中的请求结束后不再回调（流式请求会提前停止读取）
+- 指标：排队数、执行数、历史最大排队数以及去重、取消、完成、失败次数
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from config.settings import AI_EXECUTOR_WORKERS
+
+
+def _kivy_scheduler(callback: Callable, delay: float):
+    """默认调度器：Kivy主线程定时回调（可在子线程调用）"""
+    from kivy.clock import Clock
+    return Clock.schedule_once(callback, delay)
+
+
+class AITask:
+    """一个（可能被多个发起方共享的）AI请求"""
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.future = None
+        # (发起方, 回调)
+        self._callbacks: List[Tuple[Any, Callable[[Any, Optional[str]], None]]] = []
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        """请求是否已取消（任务函数应在耗时步骤之间检查）"""
+        return self._cancelled.is_set()
+
+    def _deliver(self, result: Any, error: Optional[str]):
+        """主线程：回调所有未取消的发起方"""
+        if self.cancelled:
+            return
+        for _, callback in list(self._callbacks):
+            callback(result, error)
+
+
+class AIExecutor:
+    """固定线程池的AI请求执行器"""
+
+    def __init__(self, max_workers: int = AI_EXECUTOR_WORKERS, scheduler: Callable = None):
+        """
+        初始化执行器
+
+        Args:
+            max_workers: 后台线程数
+            scheduler: 调度函数 scheduler(callback, delay)，默认使用Kivy Clock
+        """
+        self.max_workers = max_workers
+        self.scheduler = scheduler or _kivy_scheduler
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-worker')
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, AITask] = {}
+        self._stats = {
+            'queued': 0, 'running': 0, 'max_queue_depth': 0,
+            'submitted': 0, 'deduplicated': 0, 'cancelled': 0, 'completed': 0, 'failed': 0,
+        }
+
+    def submit(self, key: Hashable, func: Callable[[AITask], Any],
+               callback: Callable[[Any, Optional[str]], None], owner: Any = None) -> AITask:
+        """
+        提交请求（相同键的请求正在进行时合并）
+
+        Args:
+            key: 去重键
+            func: 在后台线程执行的任务函数 func(task)，返回结果或抛出异常
+            callback: 主线程回调 callback(result, error)
+            owner: 发起方（用于 cancel_owner）
+
+        Returns:
+            请求任务（合并时为已有的任务）
+        """
+        with self._lock:
+            task = self._inflight.get(key)
+            if task is not None and not task.cancelled:
+                task._callbacks.append((owner, callback))
+                self._stats['deduplicated'] += 1
+                return task
+
+            task = self._inflight[key] = AITask(key)
+            task._callbacks.append((owner, callback))
+            self._stats['submitted'] += 1
+            self._stats['queued'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._stats['queued'])
+            task.future = self._pool.submit(self._run, task, func)
+        return task
+
+    def cancel(self, task: AITask, owner: Any = None):
+        """
+        取消发起方对请求的等待（owner为None时取消所有发起方）
+
+        没有发起方在等待时取消请求本身。
+        """
+        with self._lock:
+            task._callbacks = [(o, cb) for o, cb in task._callbacks if owner is not None and o is not owner]
+            if not task._callbacks:
+                self._cancel_task(task)
+
+    def cancel_owner(self, owner: Any) -> int:
+        """
+        取消发起方的所有请求（离开页面时调用）
+
+        Returns:
+            因此被取消的请求数
+        """
+        cancelled = 0
+        with self._lock:
+            for task in list(self._inflight.values()):
+                if not any(o is owner for o, _ in task._callbacks):
+                    continue
+                task._callbacks = [(o, cb) for o, cb in task._callbacks if o is not owner]
+                if not task._callbacks:
+                    self._cancel_task(task)
+                    cancelled += 1
+        return cancelled
+
+    def stats(self) -> Dict[str, int]:
+        """队列深度和计数指标"""
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self, wait: bool = False):
+        """取消所有请求并停止线程池"""
+        with self._lock:
+            for task in list(self._inflight.values()):
+                task._callbacks = []
+                self._cancel_task(task)
+        self._pool.shutdown(wait=wait)
+
+    def _cancel_task(self, task: AITask):
+        """取消请求（调用方持有锁）"""
+        if task.cancelled:
+            return
+        task._cancelled.set()
+        self._stats['cancelled'] += 1
+        if self._inflight.get(task.key) is task:
+            del self._inflight[task.key]
+        # 还在排队的请求不再执行
+        if task.future is not None and task.future.cancel():
+            self._stats['queued'] -= 1
+
+    def _run(self, task: AITask, func: Callable[[AITask], Any]):
+        """后台线程：执行任务并把结果送回主线程"""
+        with self._lock:
+            self._stats['queued'] -= 1
+            if task.cancelled:
+                return
+            self._stats['running'] += 1
+
+        result, error = None, None
+        try:
+            result = func(task)
+        except Exception as e:
+            error = str(e)
+        finally:
+            with self._lock:
+                self._stats['running'] -= 1
+                self._stats['failed' if error is not None else 'completed'] += 1
+                if self._inflight.get(task.key) is task:
+                    del self._inflight[task.key]
+
+        if not task.cancelled:
+            self.scheduler(lambda dt: task._deliver(result, error), 0)
+
+
+# 进程内共用的AI请求执行器
+ai_executor = AIExecutor()
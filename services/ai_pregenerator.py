@@ -0,0 +1,231 @@
+"""AI鼓励预生成
+
+鼓励的触发场景可以提前预测（触发条件见 AIService.check_trigger_conditions），
+只预测实际会请求鼓励的场景（刷题页的 check_ai_trigger 和AI页的主动请求）：
+
+- 今日进度接近目标 → 即将"完成每日目标"
+- 连续打卡再过一天到 7/30/100 天 → 即将"连续打卡里程碑"
+- 当前学习数据下"主动请求鼓励"
+
+应用空闲（一段时间没有刷题操作）时，在AI执行器的线程中按预测的学习数据为当前身份
+生成一条鼓励，作为预生成回复存入回复缓存（见 services.ai_cache）。场景触发时
+缓存键相同，直接命中，不必等待API。
+
+- 预算：每天最多 AI_PREGEN_DAILY_CALLS 次API调用（计数保存在settings表），
+  每个身份最多 AI_PREGEN_QUEUE_SIZE 条等待使用的回复
+- 网络：最近连不上API，或连不上API主机时不预生成
+- 失效：修改或删除身份时其缓存（包括预生成回复）一并删除，
+  生成期间提示词被修改的回复直接丢弃
+"""
+import socket
+import threading
+import time
+from datetime import date
+from types import MappingProxyType
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from config.settings import (AI_PREGEN_DAILY_CALLS, AI_PREGEN_QUEUE_SIZE, AI_PREGEN_IDLE_SECONDS,
+                             AI_PREGEN_GOAL_RATIO, AI_PREGEN_NETWORK_TIMEOUT)
+from .ai_cache import cache_key, get_response_cache
+from .ai_executor import AITask
+from .ai_service import AIService, AIUnavailableError, STREAK_MILESTONES, UNUSABLE_REPLIES
+from .stats_snapshot import StatsSnapshot, get_stats_snapshot
+
+# settings表中记录当天预生成调用次数的键（值为 "日期:次数"）
+CALLS_SETTING_KEY = 'ai_pregen_calls'
+
+
+def network_available(base_url: str, timeout: float = AI_PREGEN_NETWORK_TIMEOUT) -> bool:
+    """能否连上API主机（只建立TCP连接，不发送请求）"""
+    parsed = urlparse(base_url)
+    if not parsed.hostname:
+        return False
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    try:
+        socket.create_connection((parsed.hostname, port), timeout=timeout).close()
+        return True
+    except OSError:
+        return False
+
+
+class AIPregenerator:
+    """空闲时预生成AI鼓励（同一数据库共用一个）"""
+
+    def __init__(self, service: AIService, daily_calls: int = AI_PREGEN_DAILY_CALLS,
+                 queue_size: int = AI_PREGEN_QUEUE_SIZE, idle_seconds: float = AI_PREGEN_IDLE_SECONDS,
+                 goal_ratio: float = AI_PREGEN_GOAL_RATIO,
+                 network_check: Callable[[str], bool] = network_available,
+                 clock: Callable[[], float] = time.monotonic,
+                 today: Callable[[], date] = date.today):
+        """
+        Args:
+            service: AI服务（提示词、API调用和执行器）
+            daily_calls: 每天最多预生成的API调用次数
+            queue_size: 每个身份最多等待使用的预生成回复数
+            idle_seconds: 多久没有操作算空闲（秒）
+            goal_ratio: 今日完成目标的多少比例后预生成"完成每日目标"
+            network_check: 检查能否连上API主机 network_check(base_url)
+            clock: 单调时间函数
+            today: 当天日期函数
+        """
+        self.service = service
+        self.db = service.db
+        self.daily_calls = daily_calls
+        self.queue_size = queue_size
+        self.idle_seconds = idle_seconds
+        self.goal_ratio = goal_ratio
+        self.network_check = network_check
+        self.clock = clock
+        self.today = today
+
+        # 当前身份（None时为默认身份）
+        self.identity_id: Optional[int] = None
+        self.generated = 0
+
+        self._lock = threading.Lock()
+        self._last_activity = clock()
+        self._task: Optional[AITask] = None
+
+    def note_activity(self):
+        """记录一次用户操作（刷题时调用），空闲计时重新开始"""
+        self._last_activity = self.clock()
+
+    def tick(self, *args) -> Optional[AITask]:
+        """
+        主线程定时调用：空闲且没有进行中的预生成时，提交一次预生成
+
+        Returns:
+            提交的请求任务，未提交时为None
+        """
+        if self.clock() - self._last_activity < self.idle_seconds:
+            return None
+        if self._task is not None and not self._task.future.done():
+            return None
+
+        identity_id = self.identity_id
+        self._task = self.service.executor.submit(
+            ('pregenerate', self.db.db_path), lambda task: self.run_once(identity_id), self._on_done
+        )
+        return self._task
+
+    def _on_done(self, scene: Optional[str], error: Optional[str]):
+        """主线程：记录预生成结果"""
+        if error:
+            print(f"[WARN] 预生成AI鼓励失败: {error}")
+        elif scene:
+            print(f"[INFO] 已预生成AI鼓励: {scene}")
+
+    def predict(self) -> List[Tuple[str, StatsSnapshot]]:
+        """
+        预测即将触发的场景（按优先级排列）
+
+        Returns:
+            [(场景, 触发时预计的学习数据)]
+        """
+        snapshot = get_stats_snapshot(self.db)
+        today = snapshot.today_progress
+        current, target = today['current'], today['target']
+        predictions = []
+
+        # 今日进度接近目标
+        if target > 0 and target * self.goal_ratio <= current < target:
+            predictions.append(('daily_goal_complete',
+                                self._predict(snapshot, today_count=target, added=target - current)))
+
+        # 下一个打卡日（今天还没刷题就是今天）到达里程碑
+        if snapshot.streak_days + 1 in STREAK_MILESTONES:
+            predictions.append(('streak_milestone',
+                                self._predict(snapshot, today_count=1, added=1, streak=snapshot.streak_days + 1)))
+
+        predictions.append(('manual_request', snapshot))
+        return predictions
+
+    def _predict(self, snapshot: StatsSnapshot, today_count: int, added: int,
+                 streak: int = None) -> StatsSnapshot:
+        """触发时的学习数据：今日题数为 today_count，总题数增加 added"""
+        total_count = snapshot.total_count + added
+        return snapshot._replace(
+            total_count=total_count,
+            today_progress=MappingProxyType(dict(snapshot.today_progress, current=today_count)),
+            streak_days=snapshot.streak_days if streak is None else streak,
+            level_info=MappingProxyType(self.service.study_service.get_level_info(total_count)),
+        )
+
+    def run_once(self, identity_id: int = None) -> Optional[str]:
+        """
+        生成一条预测场景的鼓励（执行器线程中调用）
+
+        Args:
+            identity_id: AI身份ID（None时为默认身份）
+
+        Returns:
+            生成的场景，无需或无法预生成时为None
+        """
+        identity = self._identity(identity_id)
+        cache = get_response_cache(self.db)
+        if identity is None or cache.offline or not self.db.get_default_api_config():
+            return None
+
+        if len(cache.ready_keys(identity['id'])) >= self.queue_size:
+            return None
+        # 已有预生成回复或缓存已集满的场景不再生成
+        pending = [(scene, snapshot, cache_key(identity['id'], scene, snapshot))
+                   for scene, snapshot in self.predict()]
+        pending = [item for item in pending if not cache.has(item[2])]
+        if not pending or self.calls_today() >= self.daily_calls:
+            return None
+
+        config = self.service._get_api_config(self.db)
+        if not self.network_check(config['base_url']):
+            return None
+
+        scene, snapshot, key = pending[0]
+        self._count_call()
+        prompt = self.service.generate_prompt(identity['id'], scene, db=self.db, snapshot=snapshot)
+        try:
+            content = self.service._call_openai_compatible(config, prompt)
+        except AIUnavailableError:
+            cache.mark_offline()
+            raise
+
+        # 生成期间身份被修改或删除
+        current = self._identity(identity['id'])
+        if current is None or current['system_prompt'] != identity['system_prompt']:
+            return None
+        if not content or content in UNUSABLE_REPLIES:
+            return None
+
+        cache.put(key, identity['id'], scene, content, pregenerated=True)
+        with self._lock:
+            self.generated += 1
+        return scene
+
+    def _identity(self, identity_id: Optional[int]) -> Optional[Dict]:
+        """AI身份（None时为默认身份）"""
+        identities = self.db.get_all_ai_identities()
+        if identity_id is None:
+            return identities[0] if identities else None
+        return next((i for i in identities if i['id'] == identity_id), None)
+
+    def calls_today(self) -> int:
+        """今天已经预生成的API调用次数"""
+        day, _, count = (self.db.get_setting(CALLS_SETTING_KEY) or '').partition(':')
+        return int(count) if day == self.today().isoformat() else 0
+
+    def _count_call(self):
+        """记录一次预生成的API调用"""
+        with self._lock:
+            self.db.set_setting(CALLS_SETTING_KEY, f"{self.today().isoformat()}:{self.calls_today() + 1}")
+
+
+_pregenerators: Dict[str, AIPregenerator] = {}
+_pregenerators_lock = threading.Lock()
+
+
+def get_pregenerator(db) -> AIPregenerator:
+    """获取数据库对应的AI鼓励预生成器"""
+    with _pregenerators_lock:
+        pregenerator = _pregenerators.get(db.db_path)
+        if pregenerator is None:
+            pregenerator = _pregenerators[db.db_path] = AIPregenerator(AIService(db=db))
+        return pregenerator
@@ -1,24 +1,54 @@
 """AI鼓励服务"""
+import json
 import time
 import requests
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, Tuple
 from datetime import datetime
 from database.db_manager import DatabaseManager
 from .study_service import StudyService
-from config.settings import AI_REQUEST_TIMEOUT, AI_MAX_TOKENS, AI_TEMPERATURE
+from .stats_snapshot import StatsSnapshot, get_stats_snapshot
+from .http_pool import http_pool
+from .ai_stream import StreamAccumulator, ThrottledCallback, iter_sse_data
+from .ai_executor import AITask, ai_executor
+from .ai_cache import cache_key, get_response_cache
+from config.settings import AI_REQUEST_TIMEOUT, AI_MAX_TOKENS, AI_TEMPERATURE, AI_STREAM_RENDER_INTERVAL
 from config.constants import API_PLATFORMS, AI_TRIGGER_SCENARIOS
 
+# 取不到有效回复时的提示（不写入回复缓存）
+PARSE_FAILED_REPLY = "内容解析失败，请联系开发者。"
+REASONING_FORMAT_REPLY = "⚠️ 抱歉，当前使用的推理模型返回格式异常。建议切换到普通对话模型（如deepseek-chat）以获得更好体验。"
+EMPTY_REPLY = "AI返回了空内容，请检查API配置或更换模型。"
+UNUSABLE_REPLIES = (PARSE_FAILED_REPLY, REASONING_FORMAT_REPLY, EMPTY_REPLY)
+
+# 连续打卡里程碑天数
+STREAK_MILESTONES = (7, 30, 100)
+# 多少天未学习后重新开始算"回归"
+COMEBACK_IDLE_DAYS = 3
+
+
+class AIUnavailableError(Exception):
+    """连不上AI平台（超时或网络错误）"""
+
 
 class AIService:
     """AI鼓励服务类"""
     
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.study_service = StudyService()
+    def __init__(self, db=None, executor=None):
+        """
+        初始化AI服务
+        
+        Args:
+            db: 数据库管理器实例（可选）
+            executor: AI请求执行器（可选，默认进程内共用的执行器）
+        """
+        self.db = db if db else DatabaseManager()
+        self.executor = executor if executor else ai_executor
+        self.study_service = StudyService(db=self.db)
         self.last_request_time = None
     
     def generate_prompt(self, identity_id: int, trigger_scene: str, 
-                       context: Dict[str, Any] = None, db: DatabaseManager = None) -> str:
+                       context: Dict[str, Any] = None, db: DatabaseManager = None,
+                       snapshot: StatsSnapshot = None) -> str:
         """
         生成AI提示词
         
@@ -27,6 +57,7 @@ class AIService:
             trigger_scene: 触发场景
             context: 上下文信息
             db: 数据库连接（可选，用于多线程）
+            snapshot: 学习统计快照（可选，预生成时传入预测的学习数据）
             
         Returns:
             完整的提示词
@@ -49,20 +80,13 @@ class AIService:
         if context is None:
             context = {}
         
-        # 如果传入了db，说明在子线程中，需要创建临时的StudyService
-        if db:
-            from .study_service import StudyService
-            temp_study_service = StudyService(db=db)
-            today_progress = temp_study_service.get_today_progress()
-            total_count = temp_study_service.get_total_count()
-            streak_days = temp_study_service.get_streak_days()
-            level_info = temp_study_service.get_level_info()
-        else:
-            # 主线程直接使用
-            today_progress = self.study_service.get_today_progress()
-            total_count = self.study_service.get_total_count()
-            streak_days = self.study_service.get_streak_days()
-            level_info = self.study_service.get_level_info()
+        # 学习统计快照（子线程用传入的db查询）
+        if snapshot is None:
+            snapshot = get_stats_snapshot(db_conn)
+        today_progress = snapshot.today_progress
+        total_count = snapshot.total_count
+        streak_days = snapshot.streak_days
+        level_info = snapshot.level_info
         
         # 构建完整提示词
         prompt = f"""
@@ -156,8 +180,9 @@ class AIService:
         }
         
         try:
-            response = requests.post(
-                f"{config['base_url']}/chat/completions",
+            # 复用平台的keep-alive连接
+            response = http_pool.post(
+                config['base_url'], 'chat/completions',
                 headers=headers,
                 json=data,
                 timeout=AI_REQUEST_TIMEOUT
@@ -172,117 +197,231 @@ class AIService:
                 # 尝试获取content
                 try:
                     message = result['choices'][0]['message']
-                    content = ""
-                    
-                    # 优先获取普通content（绝大多数模型）
-                    if 'content' in message and message['content']:
-                        content = message['content']
-                        print(f"[DEBUG] 从content提取到完整内容")
+                    content = self._extract_content(message)
                     
-                    # 如果没有content，检查是否是推理模型
-                    if not content:
-                        print(f"[DEBUG] content为空，检查其他字段")
-                        print(f"[DEBUG] message keys: {list(message.keys())}")
-                        
-                        # DeepSeek推理模型特殊处理
-                        # 推理模型会有reasoning_content（思考过程）和content（最终回复）
-                        # 但有时content在tool_calls或其他字段
-                        
-                        # 尝试从reasoning_content中智能提取
-                        if 'reasoning_content' in message and message['reasoning_content']:
-                            reasoning = message['reasoning_content']
-                            print(f"[DEBUG] 检测到推理内容（前200字）: {reasoning[:200]}")
-                            
-                            import re
-                            
-                            # 策略1：查找引号内的完整鼓励语（最准确）
-                            # 匹配形如 "你好，..." 或 「你好，...」的内容
-                            quote_patterns = [
-                                r'["""]([^"""]{20,})["""]',  # 双引号，至少20字
-                                r'「([^」]{20,})」',  # 日式引号
-                                r'"([^"]{20,})"'  # 英文引号
-                            ]
-                            
-                            for pattern in quote_patterns:
-                                quotes = re.findall(pattern, reasoning, re.DOTALL)
-                                if quotes:
-                                    # 找最长的引号内容
-                                    content = max(quotes, key=len).strip()
-                                    # 验证：必须是完整句子（有结尾标点）
-                                    if any(content.endswith(p) for p in ['。', '！', '？', '~', '啊', '呢', '吧', '哦']):
-                                        print(f"[DEBUG] 从引号提取完整鼓励: {content[:50]}...")
-                                        break
-                                    else:
-                                        content = ""  # 重置，继续尝试
-                            
-                            # 策略2：查找"最终回复："、"鼓励："等明确标记后的内容
-                            if not content:
-                                keywords = ['最终回复[：:]', '鼓励[：:]', '回复[：:]', '对.*?说[：:]']
-                                for kw in keywords:
-                                    match = re.search(kw + r'\s*["""]?([^"""]+?)["""]?\s*(?:\n|$)', reasoning, re.DOTALL)
-                                    if match:
-                                        candidate = match.group(1).strip()
-                                        # 验证：不包含推理词汇
-                                        if not any(word in candidate[:50] for word in ['比如', '思考', '调整', '不对', '策略', '应该']):
-                                            content = candidate
-                                            print(f"[DEBUG] 从标记词提取: {content[:50]}...")
-                                            break
-                            
-                            # 策略3：专门提取报告格式（📊 数据回顾 + 💬 小伙伴想对你说）
-                            if not content:
-                                # 查找报告的两个部分
-                                data_section = re.search(r'📊\s*数据回顾\s*\n+(.*?)(?=💬|$)', reasoning, re.DOTALL)
-                                chat_section = re.search(r'💬\s*小伙伴想对你说\s*\n+(.*?)$', reasoning, re.DOTALL)
-                                
-                                if data_section and chat_section:
-                                    data_text = data_section.group(1).strip()
-                                    chat_text = chat_section.group(1).strip()
-                                    content = f"📊 数据回顾\n\n{data_text}\n\n💬 小伙伴想对你说\n\n{chat_text}"
-                                    print(f"[DEBUG] 提取报告格式: 成功")
-                                elif data_section or chat_section:
-                                    # 至少有一部分
-                                    content = (data_section.group(0) if data_section else "") + "\n\n" + (chat_section.group(0) if chat_section else "")
-                                    content = content.strip()
-                                    print(f"[DEBUG] 提取报告格式: 部分成功")
-                            
-                            # 策略4：提取最后一个完整段落（不含推理词汇）
-                            if not content:
-                                paragraphs = [p.strip() for p in reasoning.split('\n\n') if p.strip()]
-                                # 从后往前找，找第一个不含推理词汇的完整段落
-                                for para in reversed(paragraphs):
-                                    if (len(para) > 20 and 
-                                        any(para.endswith(p) for p in ['。', '！', '？', '~']) and
-                                        not any(word in para[:50] for word in ['比如', '思考', '调整', '不对', '策略', '应该', '分析'])):
-                                        content = para
-                                        print(f"[DEBUG] 提取纯净段落: {content[:50]}...")
-                                        break
-                            
-                            # 如果以上都失败，说明这个模型不适合
-                            if not content:
-                                content = "⚠️ 抱歉，当前使用的推理模型返回格式异常。建议切换到普通对话模型（如deepseek-chat）以获得更好体验。"
-                                print(f"[ERROR] 无法从推理内容中提取有效回复")
-                                print(f"[DEBUG] reasoning全文: {reasoning}")
-                        
-                        # 如果连reasoning_content都没有
-                        if not content:
-                            content = "AI返回了空内容，请检查API配置或更换模型。"
-                            print(f"[ERROR] message中完全没有有效内容")
-                        
                 except (KeyError, IndexError) as e:
                     print(f"[ERROR] 提取content失败: {e}")
                     print(f"[DEBUG] result结构: {result}")
-                    content = "内容解析失败，请联系开发者。"
+                    content = PARSE_FAILED_REPLY
                 
                 return content.strip()
             else:
                 raise Exception(f"API调用失败: {response.status_code} - {response.text}")
                 
         except requests.Timeout:
-            raise Exception("API请求超时，请检查网络连接")
+            raise AIUnavailableError("API请求超时，请检查网络连接")
+        except requests.RequestException as e:
+            raise AIUnavailableError(f"网络请求失败: {str(e)}")
+        except Exception as e:
+            raise Exception(f"AI调用失败: {str(e)}")
+    
+    def stream_ai_api(self, prompt: str, on_partial: Callable[[str, str], None],
+                      db: DatabaseManager = None, scheduler: Callable = None,
+                      interval: float = AI_STREAM_RENDER_INTERVAL,
+                      cancelled: Callable[[], bool] = None) -> str:
+        """
+        流式调用AI API（在子线程中调用，阻塞到响应结束）
+        
+        Args:
+            prompt: 提示词
+            on_partial: 主线程回调 on_partial(累计content, 累计reasoning_content)，
+                        经Clock节流，每 interval 秒最多一次
+            db: 数据库连接（可选，用于多线程）
+            scheduler: 调度函数（默认Kivy Clock）
+            interval: 界面刷新的最小间隔（秒）
+            cancelled: 返回True时停止读取（请求被取消）
+            
+        Returns:
+            完整的回复内容（同 call_ai_api），取消时为已收到的部分
+        """
+        config = self._get_api_config(db or self.db)
+        throttle = ThrottledCallback(on_partial, interval, scheduler=scheduler)
+        try:
+            content = self._stream_openai_compatible(config, prompt, throttle.push, cancelled)
+        finally:
+            throttle.finish()
+        
+        self.last_request_time = datetime.now()
+        return content
+    
+    def _get_api_config(self, db: DatabaseManager) -> Dict:
+        """获取默认API配置（补充平台默认的base_url和model_id）"""
+        config = db.get_default_api_config()
+        if not config:
+            raise Exception("未配置API，请先在设置中配置API")
+        
+        platform_defaults = API_PLATFORMS.get(config['platform_type'], {})
+        if not config.get('base_url'):
+            config['base_url'] = platform_defaults.get('base_url', '')
+        if not config.get('model_id'):
+            default_models = platform_defaults.get('models', [])
+            config['model_id'] = default_models[0] if default_models else 'gpt-3.5-turbo'
+        return config
+    
+    def _stream_openai_compatible(self, config: Dict, prompt: str,
+                                  on_delta: Callable[[str, str], None],
+                                  cancelled: Callable[[], bool] = None) -> str:
+        """
+        以SSE流式调用OpenAI兼容格式的API
+        
+        Args:
+            config: API配置
+            prompt: 提示词
+            on_delta: 收到新文本时调用 on_delta(累计content, 累计reasoning_content)（子线程）
+            cancelled: 返回True时停止读取
+            
+        Returns:
+            完整的回复内容
+        """
+        headers = {
+            'Authorization': f"Bearer {config['api_key']}",
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        }
+        
+        data = {
+            'model': config['model_id'],
+            'messages': [
+                {'role': 'user', 'content': prompt}
+            ],
+            'max_tokens': AI_MAX_TOKENS,
+            'temperature': AI_TEMPERATURE,
+            'stream': True
+        }
+        
+        accumulator = StreamAccumulator()
+        try:
+            with http_pool.session(config['base_url']) as session:
+                url = f"{config['base_url'].rstrip('/')}/chat/completions"
+                with session.post(url, headers=headers, json=data, stream=True,
+                                  timeout=AI_REQUEST_TIMEOUT) as response:
+                    if response.status_code != 200:
+                        raise Exception(f"API调用失败: {response.status_code} - {response.text}")
+                    
+                    # SSE固定为UTF-8
+                    response.encoding = 'utf-8'
+                    for event_data in iter_sse_data(response.iter_lines(decode_unicode=True)):
+                        if accumulator.feed(event_data):
+                            on_delta(accumulator.content, accumulator.reasoning)
+                        if accumulator.done or (cancelled and cancelled()):
+                            break
+        
+        except requests.Timeout:
+            raise AIUnavailableError("API请求超时，请检查网络连接")
         except requests.RequestException as e:
-            raise Exception(f"网络请求失败: {str(e)}")
+            raise AIUnavailableError(f"网络请求失败: {str(e)}")
         except Exception as e:
             raise Exception(f"AI调用失败: {str(e)}")
+        
+        return self._extract_content(accumulator.message()).strip()
+    
+    def _extract_content(self, message: Dict) -> str:
+        """
+        从响应消息中取出回复内容（推理模型没有content时从reasoning_content中提取）
+        
+        Args:
+            message: choices[0].message（流式响应为累计后的消息）
+        
+        Returns:
+            回复内容
+        """
+        content = ""
+        
+        # 优先获取普通content（绝大多数模型）
+        if 'content' in message and message['content']:
+            content = message['content']
+            print(f"[DEBUG] 从content提取到完整内容")
+        
+        # 如果没有content，检查是否是推理模型
+        if not content:
+            print(f"[DEBUG] content为空，检查其他字段")
+            print(f"[DEBUG] message keys: {list(message.keys())}")
+            
+            # DeepSeek推理模型特殊处理
+            # 推理模型会有reasoning_content（思考过程）和content（最终回复）
+            # 但有时content在tool_calls或其他字段
+            
+            # 尝试从reasoning_content中智能提取
+            if 'reasoning_content' in message and message['reasoning_content']:
+                reasoning = message['reasoning_content']
+                print(f"[DEBUG] 检测到推理内容（前200字）: {reasoning[:200]}")
+                
+                import re
+                
+                # 策略1：查找引号内的完整鼓励语（最准确）
+                # 匹配形如 "你好，..." 或 「你好，...」的内容
+                quote_patterns = [
+                    r'["""]([^"""]{20,})["""]',  # 双引号，至少20字
+                    r'「([^」]{20,})」',  # 日式引号
+                    r'"([^"]{20,})"'  # 英文引号
+                ]
+                
+                for pattern in quote_patterns:
+                    quotes = re.findall(pattern, reasoning, re.DOTALL)
+                    if quotes:
+                        # 找最长的引号内容
+                        content = max(quotes, key=len).strip()
+                        # 验证：必须是完整句子（有结尾标点）
+                        if any(content.endswith(p) for p in ['。', '！', '？', '~', '啊', '呢', '吧', '哦']):
+                            print(f"[DEBUG] 从引号提取完整鼓励: {content[:50]}...")
+                            break
+                        else:
+                            content = ""  # 重置，继续尝试
+                
+                # 策略2：查找"最终回复："、"鼓励："等明确标记后的内容
+                if not content:
+                    keywords = ['最终回复[：:]', '鼓励[：:]', '回复[：:]', '对.*?说[：:]']
+                    for kw in keywords:
+                        match = re.search(kw + r'\s*["""]?([^"""]+?)["""]?\s*(?:\n|$)', reasoning, re.DOTALL)
+                        if match:
+                            candidate = match.group(1).strip()
+                            # 验证：不包含推理词汇
+                            if not any(word in candidate[:50] for word in ['比如', '思考', '调整', '不对', '策略', '应该']):
+                                content = candidate
+                                print(f"[DEBUG] 从标记词提取: {content[:50]}...")
+                                break
+                
+                # 策略3：专门提取报告格式（📊 数据回顾 + 💬 小伙伴想对你说）
+                if not content:
+                    # 查找报告的两个部分
+                    data_section = re.search(r'📊\s*数据回顾\s*\n+(.*?)(?=💬|$)', reasoning, re.DOTALL)
+                    chat_section = re.search(r'💬\s*小伙伴想对你说\s*\n+(.*?)$', reasoning, re.DOTALL)
+                    
+                    if data_section and chat_section:
+                        data_text = data_section.group(1).strip()
+                        chat_text = chat_section.group(1).strip()
+                        content = f"📊 数据回顾\n\n{data_text}\n\n💬 小伙伴想对你说\n\n{chat_text}"
+                        print(f"[DEBUG] 提取报告格式: 成功")
+                    elif data_section or chat_section:
+                        # 至少有一部分
+                        content = (data_section.group(0) if data_section else "") + "\n\n" + (chat_section.group(0) if chat_section else "")
+                        content = content.strip()
+                        print(f"[DEBUG] 提取报告格式: 部分成功")
+                
+                # 策略4：提取最后一个完整段落（不含推理词汇）
+                if not content:
+                    paragraphs = [p.strip() for p in reasoning.split('\n\n') if p.strip()]
+                    # 从后往前找，找第一个不含推理词汇的完整段落
+                    for para in reversed(paragraphs):
+                        if (len(para) > 20 and 
+                            any(para.endswith(p) for p in ['。', '！', '？', '~']) and
+                            not any(word in para[:50] for word in ['比如', '思考', '调整', '不对', '策略', '应该', '分析'])):
+                            content = para
+                            print(f"[DEBUG] 提取纯净段落: {content[:50]}...")
+                            break
+                
+                # 如果以上都失败，说明这个模型不适合
+                if not content:
+                    content = REASONING_FORMAT_REPLY
+                    print(f"[ERROR] 无法从推理内容中提取有效回复")
+                    print(f"[DEBUG] reasoning全文: {reasoning}")
+            
+            # 如果连reasoning_content都没有
+            if not content:
+                content = EMPTY_REPLY
+                print(f"[ERROR] message中完全没有有效内容")
+        
+        return content
     
     def request_encouragement(self, trigger_scene: str, identity_id: int = None,
                             context: Dict[str, Any] = None, 
@@ -306,12 +445,12 @@ class AIService:
                 raise Exception("没有可用的AI身份")
             identity_id = identities[0]['id']
         
-        # 生成提示词
-        prompt = self.generate_prompt(identity_id, trigger_scene, context)
-        
-        # 调用API
+        # 先查回复缓存，未命中时生成提示词调用API
         start_time = time.time()
-        content = self.call_ai_api(prompt, identity_id)
+        content, cached = self.cached_encouragement(
+            self.db, identity_id, trigger_scene, context,
+            lambda prompt: self.call_ai_api(prompt, identity_id)
+        )
         response_time = time.time() - start_time
         
         # 保存记录
@@ -329,6 +468,7 @@ class AIService:
             'identity_id': identity_id,
             'trigger_scene': trigger_scene,
             'response_time': response_time,
+            'cached': cached,
             'created_at': datetime.now().isoformat()
         }
     
@@ -336,99 +476,142 @@ class AIService:
                                    callback: Callable[[Optional[Dict], Optional[str]], None],
                                    identity_id: int = None,
                                    context: Dict[str, Any] = None,
-                                   user_mood: str = None):
+                                   user_mood: str = None,
+                                   on_partial: Callable[[str, str], None] = None,
+                                   owner: Any = None) -> AITask:
         """
-        异步请求AI鼓励
+        异步请求AI鼓励（在AI执行器的线程池中执行）
+        
+        相同身份、场景和学习数据的请求正在进行时不会重复调用API，
+        而是等待同一个结果。
         
         Args:
             trigger_scene: 触发场景
-            callback: 回调函数，参数为 (result, error)
+            callback: 回调函数，参数为 (result, error)，在主线程调用
             identity_id: AI身份ID
             context: 上下文信息
             user_mood: 用户心情
+            on_partial: 流式回调（可选），参数为 (累计content, 累计reasoning_content)，
+                        在主线程节流调用；提供时以流式请求API（合并的请求只回调第一个发起方）
+            owner: 发起方（离开页面时用 ai_executor.cancel_owner(owner) 取消）
+            
+        Returns:
+            请求任务
         """
-        from threading import Thread
-        from kivy.clock import Clock
-        from database.db_manager import DatabaseManager
-        
-        def _thread_task():
-            try:
-                # 在子线程中创建新的数据库连接
-                thread_db = DatabaseManager()
-                
-                # 获取默认身份
-                if identity_id is None:
-                    identities = thread_db.get_all_ai_identities()
-                    if not identities:
-                        raise Exception("没有可用的AI身份")
-                    thread_identity_id = identities[0]['id']
-                else:
-                    thread_identity_id = identity_id
-                
-                # 生成提示词（传入子线程的数据库连接）
-                prompt = self.generate_prompt(thread_identity_id, trigger_scene, context, db=thread_db)
-                
-                # 调用API（使用子线程的数据库连接获取配置）
-                config = thread_db.get_default_api_config()
-                if not config:
-                    raise Exception("未配置API，请先在设置中配置API")
-                
-                # 补充默认的base_url和model_id（如果为空）
-                from config.constants import API_PLATFORMS
-                platform_defaults = API_PLATFORMS.get(config['platform_type'], {})
-                if not config.get('base_url'):
-                    config['base_url'] = platform_defaults.get('base_url', '')
-                if not config.get('model_id'):
-                    default_models = platform_defaults.get('models', [])
-                    config['model_id'] = default_models[0] if default_models else 'gpt-3.5-turbo'
-                
-                start_time = time.time()
-                content = self._call_openai_compatible(config, prompt)
-                response_time = time.time() - start_time
-                
-                # 调试：打印AI返回的内容
-                print(f"[DEBUG] AI返回内容长度: {len(content)}")
-                print(f"[DEBUG] AI返回内容: {content[:100]}...")
-                
-                # 在主线程保存记录（通过Clock调度）
-                def save_to_db(dt):
-                    try:
-                        print(f"[DEBUG] 准备保存到数据库: content长度={len(content)}")
-                        encouragement_id = self.db.save_ai_encouragement(
-                            identity_id=thread_identity_id,
-                            trigger_scene=trigger_scene,
-                            content=content,
-                            response_time=response_time,
-                            user_mood=user_mood
-                        )
-                        print(f"[DEBUG] 保存成功: ID={encouragement_id}")
-                        
-                        result = {
-                            'id': encouragement_id,
-                            'content': content,
-                            'identity_id': thread_identity_id,
-                            'trigger_scene': trigger_scene,
-                            'response_time': response_time,
-                            'created_at': datetime.now().isoformat()
-                        }
-                        callback(result, None)
-                    except Exception as e:
-                        callback(None, str(e))
-                
-                Clock.schedule_once(save_to_db, 0)
-                
-                # 关闭子线程的数据库连接
-                thread_db.close()
-                
-            except Exception as e:
-                # 错误回调
-                error_msg = str(e)
-                Clock.schedule_once(lambda dt: callback(None, error_msg), 0)
-        
-        # 启动后台线程
-        thread = Thread(target=_thread_task)
-        thread.daemon = True
-        thread.start()
+        db_path = self.db.db_path
+        
+        def _task(task: AITask) -> Dict[str, Any]:
+            # 工作线程的数据库连接由连接注册表按线程复用
+            thread_db = DatabaseManager(db_path)
+            
+            # 获取默认身份
+            if identity_id is None:
+                identities = thread_db.get_all_ai_identities()
+                if not identities:
+                    raise Exception("没有可用的AI身份")
+                thread_identity_id = identities[0]['id']
+            else:
+                thread_identity_id = identity_id
+            
+            # 调用API（使用子线程的数据库连接获取配置）
+            def _fetch(prompt: str) -> str:
+                if on_partial:
+                    # 流式：收到第一段文本即显示，取消后停止读取
+                    return self.stream_ai_api(
+                        prompt, lambda c, r: None if task.cancelled else on_partial(c, r),
+                        db=thread_db, cancelled=lambda: task.cancelled
+                    )
+                return self._call_openai_compatible(self._get_api_config(thread_db), prompt)
+            
+            # 先查回复缓存（命中时不调用API，也没有流式回调）
+            start_time = time.time()
+            content, cached = self.cached_encouragement(thread_db, thread_identity_id, trigger_scene,
+                                                        context, _fetch, cancelled=lambda: task.cancelled)
+            response_time = time.time() - start_time
+            
+            if task.cancelled:
+                return None
+            
+            # 调试：打印AI返回的内容
+            print(f"[DEBUG] AI返回内容长度: {len(content)}")
+            print(f"[DEBUG] AI返回内容: {content[:100]}...")
+            
+            # 保存记录（合并的请求只保存一次）
+            encouragement_id = thread_db.save_ai_encouragement(
+                identity_id=thread_identity_id,
+                trigger_scene=trigger_scene,
+                content=content,
+                response_time=response_time,
+                user_mood=user_mood
+            )
+            print(f"[DEBUG] 保存成功: ID={encouragement_id}")
+            
+            return {
+                'id': encouragement_id,
+                'content': content,
+                'identity_id': thread_identity_id,
+                'trigger_scene': trigger_scene,
+                'response_time': response_time,
+                'cached': cached,
+                'created_at': datetime.now().isoformat()
+            }
+        
+        # 触发间隔从提交时算起（命中缓存的请求不经过API调用）
+        self.last_request_time = datetime.now()
+        
+        key = self.request_key('encouragement', identity_id, trigger_scene, context)
+        return self.executor.submit(key, _task, callback, owner=owner)
+    
+    def cached_encouragement(self, db: DatabaseManager, identity_id: int, trigger_scene: str,
+                             context: Optional[Dict[str, Any]], fetch: Callable[[str], str],
+                             cancelled: Callable[[], bool] = None) -> Tuple[str, bool]:
+        """
+        经回复缓存获取鼓励内容
+        
+        命中缓存时直接返回；否则生成提示词并调用 fetch(prompt) 请求API，
+        成功后加入缓存。连不上API时改用缓存的回复（之后一段时间内不再等待网络）。
+        
+        Args:
+            db: 数据库连接（子线程传入自己的连接）
+            identity_id: AI身份ID
+            trigger_scene: 触发场景
+            context: 上下文信息
+            fetch: 请求API的函数，参数为提示词，返回回复内容
+            cancelled: 返回True时不把（不完整的）回复加入缓存
+            
+        Returns:
+            (鼓励内容, 是否来自缓存)
+        """
+        cache = get_response_cache(db)
+        key = cache_key(identity_id, trigger_scene, get_stats_snapshot(db), context)
+        
+        content = cache.get(key)
+        if content is None and cache.offline:
+            content = cache.fallback(key, identity_id, trigger_scene)
+        if content is not None:
+            return content, True
+        
+        prompt = self.generate_prompt(identity_id, trigger_scene, context, db=db)
+        try:
+            content = fetch(prompt)
+        except AIUnavailableError:
+            cache.mark_offline()
+            content = cache.fallback(key, identity_id, trigger_scene)
+            if content is None:
+                raise
+            print(f"[WARN] 连不上AI平台，使用缓存的鼓励")
+            return content, True
+        
+        cache.mark_online()
+        if content and content not in UNUSABLE_REPLIES and not (cancelled and cancelled()):
+            cache.put(key, identity_id, trigger_scene, content)
+        return content, False
+    
+    def request_key(self, kind: str, *parts) -> tuple:
+        """请求去重键：请求内容 + 当前学习数据（统计快照）"""
+        snapshot = get_stats_snapshot(self.db)
+        data = (snapshot.total_count, snapshot.streak_days, snapshot.today_progress.get('current'))
+        return (kind, json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str), data)
     
     def check_trigger_conditions(self, event_type: str, event_data: Dict = None) -> Optional[str]:
         """
@@ -451,7 +634,7 @@ class AIService:
         
         # 根据事件类型判断
         if event_type == 'daily_goal_complete':
-            today_progress = self.study_service.get_today_progress()
+            today_progress = self.study_service.get_snapshot().today_progress
             if today_progress['current'] >= today_progress['target']:
                 return 'daily_goal_complete'
         
@@ -459,8 +642,8 @@ class AIService:
             return 'achievement_unlock'
         
         elif event_type == 'streak_milestone':
-            streak_days = self.study_service.get_streak_days()
-            if streak_days in [7, 30, 100]:  # 里程碑天数
+            streak_days = self.study_service.get_snapshot().streak_days
+            if streak_days in STREAK_MILESTONES:
                 return 'streak_milestone'
         
         elif event_type == 'big_progress':
@@ -469,7 +652,7 @@ class AIService:
         
         elif event_type == 'comeback':
             days_since = self.study_service.get_days_since_last_study()
-            if days_since >= 3:  # 3天未学习
+            if days_since >= COMEBACK_IDLE_DAYS:
                 return 'comeback'
         
         elif event_type == 'manual_request':
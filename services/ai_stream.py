@@ -0,0 +1,148 @@
+"""AI流式响应
+
+OpenAI兼容接口设置 stream: true 后以SSE（text/event-stream）逐块返回：
+
+    data: {"choices": [{"delta": {"content": "你"}}]}
+    data: {"choices": [{"delta": {"reasoning_content": "用户..."}}]}
+    data: [DONE]
+
+本模块解析SSE事件并累计 content / reasoning_content 增量；界面回调经
+Kivy Clock 在主线程执行，并按最小间隔合并，避免每个字都重新排版。
+"""
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+# 流结束标记
+SSE_DONE = '[DONE]'
+
+
+def _kivy_scheduler(callback: Callable, delay: float):
+    """默认调度器：Kivy主线程定时回调（可在子线程调用）"""
+    from kivy.clock import Clock
+    return Clock.schedule_once(callback, delay)
+
+
+def iter_sse_data(lines: Iterable[str]) -> Iterator[str]:
+    """
+    解析SSE行，逐个返回事件的data（多行data以换行拼接，注释和其他字段忽略）
+
+    Args:
+        lines: 已解码的响应行（不含换行符）
+    """
+    data = []
+    for line in lines:
+        if not line:
+            # 空行结束一个事件
+            if data:
+                yield '\n'.join(data)
+                data = []
+            continue
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(':')
+        if field == 'data':
+            data.append(value[1:] if value.startswith(' ') else value)
+    if data:
+        yield '\n'.join(data)
+
+
+class StreamAccumulator:
+    """累计流式响应的增量"""
+
+    def __init__(self):
+        self.content = ''
+        self.reasoning = ''
+        self.finish_reason = None
+        self.done = False
+
+    def feed(self, data: str) -> bool:
+        """
+        处理一个SSE事件
+
+        Returns:
+            本事件是否带来了新的文本
+        """
+        if data.strip() == SSE_DONE:
+            self.done = True
+            return False
+
+        chunk = json.loads(data)
+        if 'error' in chunk:
+            raise Exception(f"API流式响应错误: {chunk['error']}")
+
+        changed = False
+        for choice in chunk.get('choices') or []:
+            delta = choice.get('delta') or {}
+            if delta.get('content'):
+                self.content += delta['content']
+                changed = True
+            if delta.get('reasoning_content'):
+                self.reasoning += delta['reasoning_content']
+                changed = True
+            if choice.get('finish_reason'):
+                self.finish_reason = choice['finish_reason']
+        return changed
+
+    def message(self) -> Dict[str, str]:
+        """累计后的消息（同非流式响应的 choices[0].message）"""
+        return {'content': self.content, 'reasoning_content': self.reasoning}
+
+
+class ThrottledCallback:
+    """
+    节流的界面回调
+
+    子线程每收到新文本调用 push()，主线程最多每 interval 秒收到一次最新文本；
+    finish() 立即送出尚未送出的最后文本。
+    """
+
+    def __init__(self, callback: Callable[[str, str], None], interval: float,
+                 scheduler: Callable = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            callback: 主线程回调 callback(累计content, 累计reasoning)
+            interval: 两次回调的最小间隔（秒）
+            scheduler: 调度函数 scheduler(callback, delay)，默认使用Kivy Clock
+            clock: 当前时间函数
+        """
+        self.callback = callback
+        self.interval = interval
+        self.scheduler = scheduler or _kivy_scheduler
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._latest: Optional[tuple] = None
+        self._scheduled = False
+        self._last_fire = None
+
+    def push(self, content: str, reasoning: str):
+        """记录最新文本，没有待执行的回调时安排一次"""
+        with self._lock:
+            self._latest = (content, reasoning)
+            if self._scheduled:
+                return
+            self._scheduled = True
+            if self._last_fire is None:
+                delay = 0
+            else:
+                delay = max(0.0, self._last_fire + self.interval - self.clock())
+        self.scheduler(self._fire, delay)
+
+    def finish(self):
+        """送出最后的文本（已送出时不重复回调）"""
+        with self._lock:
+            if self._latest is None or self._scheduled:
+                return
+            self._scheduled = True
+        self.scheduler(self._fire, 0)
+
+    def _fire(self, *args):
+        """主线程：回调最新文本"""
+        with self._lock:
+            latest, self._latest = self._latest, None
+            self._scheduled = False
+            self._last_fire = self.clock()
+        if latest is not None:
+            self.callback(*latest)
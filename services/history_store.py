@@ -0,0 +1,264 @@
+"""内存中的学习历史
+
+把全部学习记录按天展开为紧凑数组：每日总题数一列，每个科目一列，
+数组下标为天编号减去起始天编号。第一次使用时从数据库加载一次，
+之后由写入事件原地增量更新，统计页面直接读内存。
+
+- 占用超过内存预算时停用，调用方回退到SQL查询
+- 其他进程提交写入（PRAGMA data_version 变化，而本进程的连接没有提交过写入）后，下次读取时重新加载
+"""
+import threading
+from array import array
+from datetime import date
+from typing import Dict, Optional
+from database.connection import registry
+from database.day_numbers import day_number, day_to_str, zero_series
+from database.events import events, COUNT_ADDED, RECORDS_DELETED
+from config.settings import HISTORY_STORE_MAX_BYTES
+
+_TYPECODE = 'l'
+
+
+class HistoryStore:
+    """内存学习历史类（按天的列式数组）"""
+
+    def __init__(self, db, max_bytes: int = HISTORY_STORE_MAX_BYTES):
+        """
+        初始化内存历史（不立即加载）
+
+        Args:
+            db: 数据库管理器实例
+            max_bytes: 数组占用的内存上限（字节）
+        """
+        self.db = db
+        self.max_bytes = max_bytes
+
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._disabled = False
+        self._start_day = 0
+        self._totals = array(_TYPECODE)
+        self._subjects: Dict[int, array] = {}
+        # 各线程上次读取时的 (连接, data_version, 本进程提交次数)
+        self._seen: Dict[int, tuple] = {}
+
+        events.subscribe(COUNT_ADDED, self._on_event)
+        events.subscribe(RECORDS_DELETED, self._on_event)
+
+    # ==================== 读取 ====================
+
+    @property
+    def available(self) -> bool:
+        """是否可用（未超出内存预算）"""
+        return self._ensure_loaded()
+
+    def daily_series(self, start_date, end_date, subject_id: int = None):
+        """
+        获取日期范围内每天的题数（与 DatabaseManager.get_daily_series 结果相同）
+
+        Args:
+            start_date: 开始日期（date或'YYYY-MM-DD'，包含）
+            end_date: 结束日期（包含）
+            subject_id: 科目ID，默认所有科目合计
+
+        Returns:
+            连续序列，不可用时返回None
+        """
+        start = day_number(start_date)
+        length = max(0, day_number(end_date) - start + 1)
+
+        with self._lock:
+            if not self._ensure_loaded():
+                return None
+
+            series = zero_series(length)
+            column = self._totals if subject_id is None else self._subjects.get(subject_id)
+            if column is None:
+                return series
+
+            # 与数组范围的重叠部分
+            begin = max(start, self._start_day)
+            end = min(start + length, self._start_day + len(column))
+            if begin < end:
+                series[begin - start:end - start] = column[begin - self._start_day:end - self._start_day]
+            return series
+
+    def day_totals(self) -> Optional[Dict[str, int]]:
+        """
+        获取有记录的每一天的总题数
+
+        Returns:
+            {'YYYY-MM-DD': 题数}，不可用时返回None
+        """
+        with self._lock:
+            if not self._ensure_loaded():
+                return None
+            return {day_to_str(self._start_day + i): count
+                    for i, count in enumerate(self._totals) if count}
+
+    def memory_bytes(self) -> int:
+        """数组当前占用的内存（字节）"""
+        return (1 + len(self._subjects)) * len(self._totals) * self._totals.itemsize
+
+    def invalidate(self):
+        """丢弃内存数据，下次读取时重新加载（也会重新尝试超出预算时停用的情况）"""
+        with self._lock:
+            self._loaded = False
+            self._disabled = False
+            self._totals = array(_TYPECODE)
+            self._subjects = {}
+            self._seen = {}
+
+    # ==================== 加载 ====================
+
+    def _ensure_loaded(self) -> bool:
+        """需要时加载，返回是否可用"""
+        with self._lock:
+            if self._loaded and not self._is_stale():
+                return True
+            if self._disabled:
+                return False
+            self._load()
+            return self._loaded
+
+    def _is_stale(self) -> bool:
+        """
+        其他进程是否提交过写入
+
+        本进程的写入由事件增量更新；本线程第一次读取或连接更换过时没有比较基准，视为未变化。
+        """
+        seen = self._data_version()
+        last = self._seen.get(threading.get_ident())
+        self._seen[threading.get_ident()] = seen
+        if last is None or last[0] is not seen[0]:
+            return False
+        return last[1] != seen[1] and last[2] == seen[2]
+
+    def _data_version(self) -> tuple:
+        """本线程的 (连接, data_version, 本进程提交次数)"""
+        conn = self.db.get_connection()
+        return conn, conn.execute("PRAGMA data_version").fetchone()[0], registry.local_commits(self.db.db_path)
+
+    def _load(self):
+        """从学习记录加载全部历史"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT MIN(day), MAX(day), COUNT(DISTINCT subject_id) FROM study_records")
+        min_day, max_day, subject_count = cursor.fetchone()
+        today = day_number(date.today())
+        start_day = today if min_day is None else min(min_day, today)
+        length = (today if max_day is None else max(max_day, today)) - start_day + 1
+
+        needed = (1 + subject_count) * length * array(_TYPECODE).itemsize
+        if needed > self.max_bytes:
+            self._disable(needed)
+            return
+
+        totals = array(_TYPECODE, [0]) * length
+        subjects: Dict[int, array] = {}
+        cursor.execute("SELECT subject_id, day, count FROM study_records")
+        for subject_id, day, count in cursor:
+            column = subjects.get(subject_id)
+            if column is None:
+                column = subjects[subject_id] = array(_TYPECODE, [0]) * length
+            column[day - start_day] += count
+            totals[day - start_day] += count
+
+        self._start_day = start_day
+        self._totals = totals
+        self._subjects = subjects
+        self._loaded = True
+        self._seen = {threading.get_ident(): self._data_version()}
+
+    def _disable(self, needed: int):
+        """超出内存预算，停用并释放数组"""
+        print(f"[WARN] 学习历史需要 {needed} 字节，超出内存预算 {self.max_bytes} 字节，改用SQL查询")
+        self._loaded = False
+        self._disabled = True
+        self._totals = array(_TYPECODE)
+        self._subjects = {}
+
+    # ==================== 增量更新 ====================
+
+    def _on_event(self, event: str, db_path: str, payload: Dict):
+        """写入事件：原地更新数组（尚未加载时忽略）"""
+        if db_path != self.db.db_path:
+            return
+
+        with self._lock:
+            if not self._loaded:
+                return
+            if event == COUNT_ADDED:
+                self._apply_added(payload['records'])
+            elif event == RECORDS_DELETED:
+                self._apply_deleted(payload.get('day'), payload.get('subject_id'))
+
+            if self._loaded and self.memory_bytes() > self.max_bytes:
+                self._disable(self.memory_bytes())
+
+    def _apply_added(self, records):
+        """累加新增记录"""
+        for subject_id, day, count in records:
+            self._cover(day)
+            column = self._subjects.get(subject_id)
+            if column is None:
+                column = self._subjects[subject_id] = array(_TYPECODE, [0]) * len(self._totals)
+            column[day - self._start_day] += count
+            self._totals[day - self._start_day] += count
+
+    def _apply_deleted(self, day: Optional[int], subject_id: Optional[int]):
+        """清除被删除的记录"""
+        if day is None and subject_id is None:
+            length = len(self._totals)
+            self._totals = array(_TYPECODE, [0]) * length
+            self._subjects = {}
+            return
+
+        if subject_id is None:
+            columns = list(self._subjects.items())
+        elif subject_id in self._subjects:
+            columns = [(subject_id, self._subjects[subject_id])]
+        else:
+            columns = []
+
+        if day is None:
+            for sid, column in columns:
+                for i, count in enumerate(column):
+                    if count:
+                        self._totals[i] -= count
+                del self._subjects[sid]
+            return
+
+        index = day - self._start_day
+        if 0 <= index < len(self._totals):
+            for _, column in columns:
+                self._totals[index] -= column[index]
+                column[index] = 0
+
+    def _cover(self, day: int):
+        """扩展数组使其包含指定的天"""
+        if day < self._start_day:
+            padding = array(_TYPECODE, [0]) * (self._start_day - day)
+            self._totals = padding + self._totals
+            for sid, column in self._subjects.items():
+                self._subjects[sid] = padding + column
+            self._start_day = day
+        elif day >= self._start_day + len(self._totals):
+            padding = array(_TYPECODE, [0]) * (day - self._start_day - len(self._totals) + 1)
+            self._totals.extend(padding)
+            for column in self._subjects.values():
+                column.extend(padding)
+
+
+_stores: Dict[str, HistoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_history_store(db) -> HistoryStore:
+    """获取数据库对应的内存历史（同一数据库共用一个）"""
+    with _stores_lock:
+        store = _stores.get(db.db_path)
+        if store is None:
+            store = _stores[db.db_path] = HistoryStore(db)
+        return store
@@ -0,0 +1,113 @@
+"""AI平台HTTP连接池
+
+每个平台（按 base_url 区分）共用一个 requests.Session：连接保持（keep-alive），
+后续请求复用已建立的TCP/TLS连接，不再重复DNS解析和握手。
+
+后台线程（异步鼓励、AI报告）每次请求都是新线程，所以会话在进程内共享，
+而不是按线程保存；urllib3的连接池本身是线程安全的，请求头按请求传入，
+不修改会话状态。关闭会话时，正在进行的请求结束后才关闭其连接。
+"""
+import atexit
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from config.settings import AI_HTTP_POOL_CONNECTIONS, AI_HTTP_POOL_MAXSIZE
+
+
+def _pool_key(base_url: str) -> str:
+    """连接池的键：协议 + 主机（同一主机的不同路径共用连接）"""
+    parts = urlsplit(base_url)
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+
+class _PooledSession:
+    """共享会话及正在使用它的请求数"""
+
+    def __init__(self, session: requests.Session):
+        self.session = session
+        self.in_use = 0
+        self.closing = False
+
+
+class HttpSessionPool:
+    """按平台复用的HTTP会话池"""
+
+    def __init__(self, pool_connections: int = AI_HTTP_POOL_CONNECTIONS,
+                 pool_maxsize: int = AI_HTTP_POOL_MAXSIZE):
+        """
+        初始化会话池
+
+        Args:
+            pool_connections: 每个会话缓存的主机连接池数
+            pool_maxsize: 每个主机保持的最大连接数（同时请求的后台线程数）
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._sessions: Dict[str, _PooledSession] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, base_url: str) -> Iterator[requests.Session]:
+        """
+        借用平台的会话（用完自动归还）
+
+        Args:
+            base_url: 平台API基础URL
+        """
+        key = _pool_key(base_url)
+        with self._lock:
+            pooled = self._sessions.get(key)
+            if pooled is None:
+                pooled = self._sessions[key] = _PooledSession(self._new_session())
+            pooled.in_use += 1
+
+        try:
+            yield pooled.session
+        finally:
+            with self._lock:
+                pooled.in_use -= 1
+                if pooled.closing and pooled.in_use == 0:
+                    pooled.session.close()
+
+    def post(self, base_url: str, path: str, **kwargs) -> requests.Response:
+        """用平台的会话发送POST请求（参数同 requests.post）"""
+        with self.session(base_url) as session:
+            return session.post(f"{base_url.rstrip('/')}/{path.lstrip('/')}", **kwargs)
+
+    def close(self, base_url: str = None):
+        """
+        关闭会话（默认全部），正在进行的请求结束后才真正关闭连接
+
+        修改API配置或应用退出时调用；之后的请求会建立新会话。
+        """
+        with self._lock:
+            keys = [_pool_key(base_url)] if base_url else list(self._sessions)
+            for key in keys:
+                pooled = self._sessions.pop(key, None)
+                if pooled is None:
+                    continue
+                pooled.closing = True
+                if pooled.in_use == 0:
+                    pooled.session.close()
+
+    def stats(self) -> Dict[str, int]:
+        """各平台会话正在进行的请求数"""
+        with self._lock:
+            return {key: pooled.in_use for key, pooled in self._sessions.items()}
+
+    def _new_session(self) -> requests.Session:
+        """创建会话（调整连接池大小）"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+
+# 进程内共用的会话池
+http_pool = HttpSessionPool()
+atexit.register(http_pool.close)
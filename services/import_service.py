@@ -0,0 +1,157 @@
+"""学习记录导入服务"""
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Any, Iterator, Tuple
+from database.db_manager import DatabaseManager
+from config.settings import IMPORT_CHUNK_SIZE
+
+
+class ImportService:
+    """学习记录导入服务类（流式读取CSV/JSONL，分块批量写入）"""
+
+    # 最多保留的错误信息条数（避免大文件导入时错误列表无限增长）
+    MAX_ERRORS = 20
+
+    def __init__(self, db=None, chunk_size: int = IMPORT_CHUNK_SIZE,
+                 create_missing_subjects: bool = True):
+        """
+        初始化导入服务
+
+        Args:
+            db: 数据库管理器实例（可选）
+            chunk_size: 每个事务写入的记录数
+            create_missing_subjects: 遇到不存在的科目名时是否自动创建
+        """
+        self.db = db if db else DatabaseManager()
+        self.chunk_size = chunk_size
+        self.create_missing_subjects = create_missing_subjects
+        self._subject_ids: Dict[str, int] = {}
+        self._known_ids = set()
+
+    def import_file(self, path: str, file_format: str = None,
+                    progress_callback: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
+        """
+        导入学习记录文件
+
+        每行包含日期（date / record_date）、科目（subject 科目名 或 subject_id）和题数（count）。
+
+        Args:
+            path: 文件路径
+            file_format: 'csv' 或 'jsonl'，默认根据扩展名判断
+            progress_callback: 每写入一块后回调，参数为当前统计
+
+        Returns:
+            {'rows': 写入记录数, 'skipped': 跳过行数, 'errors': 错误信息,
+             'seconds': 耗时, 'rows_per_second': 每秒写入行数}
+        """
+        if file_format is None:
+            file_format = 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson') else 'csv'
+        if file_format not in ('csv', 'jsonl'):
+            raise ValueError(f"不支持的导入格式: {file_format}")
+
+        self._subject_ids = {s['name']: s['id'] for s in self.db.get_all_subjects()}
+        self._known_ids = set(self._subject_ids.values())
+        stats = {'rows': 0, 'skipped': 0, 'errors': [], 'seconds': 0.0, 'rows_per_second': 0.0}
+
+        start = time.perf_counter()
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            raw_rows = self._iter_csv(f) if file_format == 'csv' else self._iter_jsonl(f)
+            records = self._iter_records(raw_rows, stats)
+
+            while True:
+                chunk = list(islice(records, self.chunk_size))
+                if not chunk:
+                    break
+
+                result = self.db.add_study_records_bulk(chunk)
+                stats['rows'] += result['rows']
+
+                stats['seconds'] = time.perf_counter() - start
+                stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+                if progress_callback:
+                    progress_callback(stats)
+
+        stats['seconds'] = time.perf_counter() - start
+        stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        print(f"[INFO] 导入完成: {stats['rows']} 条记录，跳过 {stats['skipped']} 行，"
+              f"{stats['rows_per_second']:.0f} 行/秒")
+        return stats
+
+    def _iter_csv(self, f) -> Iterator[Tuple[int, Dict]]:
+        """逐行读取CSV（第一行为表头）"""
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            yield line_no, row
+
+    def _iter_jsonl(self, f) -> Iterator[Tuple[int, Dict]]:
+        """逐行读取JSONL（每行一个JSON对象，空行忽略）"""
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, {'_error': f"JSON解析失败: {e.msg}"}
+
+    def _iter_records(self, raw_rows: Iterator[Tuple[int, Dict]],
+                      stats: Dict[str, Any]) -> Iterator[Tuple[int, int, str]]:
+        """把原始行转换为 (科目ID, 题数, 日期)，无效行计入跳过数"""
+        for line_no, row in raw_rows:
+            try:
+                yield self._parse_row(row)
+            except ValueError as e:
+                stats['skipped'] += 1
+                if len(stats['errors']) < self.MAX_ERRORS:
+                    stats['errors'].append(f"第{line_no}行: {e}")
+
+    def _parse_row(self, row: Dict) -> Tuple[int, int, str]:
+        """解析单行数据"""
+        if not isinstance(row, dict):
+            raise ValueError("数据格式错误")
+        if '_error' in row:
+            raise ValueError(row['_error'])
+
+        raw_date = row.get('record_date') or row.get('date')
+        if not raw_date:
+            raise ValueError("缺少日期")
+        try:
+            record_date = datetime.strptime(str(raw_date).strip()[:10], '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f"日期格式错误: {raw_date}")
+
+        try:
+            count = int(row.get('count'))
+        except (TypeError, ValueError):
+            raise ValueError(f"题数无效: {row.get('count')}")
+        if count <= 0:
+            raise ValueError(f"题数必须大于0: {count}")
+
+        return self._resolve_subject(row), count, record_date
+
+    def _resolve_subject(self, row: Dict) -> int:
+        """根据科目ID或科目名得到科目ID"""
+        subject_id = row.get('subject_id')
+        if subject_id not in (None, ''):
+            try:
+                subject_id = int(subject_id)
+            except (TypeError, ValueError):
+                raise ValueError(f"科目ID无效: {subject_id}")
+            if subject_id not in self._known_ids:
+                raise ValueError(f"科目ID {subject_id} 不存在")
+            return subject_id
+
+        name = str(row.get('subject') or '').strip()
+        if not name:
+            raise ValueError("缺少科目")
+
+        if name not in self._subject_ids:
+            if not self.create_missing_subjects:
+                raise ValueError(f"科目 '{name}' 不存在")
+            self._subject_ids[name] = self.db.add_subject(name)
+            self._known_ids.add(self._subject_ids[name])
+            print(f"[INFO] 导入时新建科目: {name}")
+        return self._subject_ids[name]
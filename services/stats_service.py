@@ -1,16 +1,26 @@
 """统计分析服务"""
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from database.db_manager import DatabaseManager
+from database.day_numbers import day_number
 from .study_service import StudyService
+from .history_store import get_history_store
 
 
 class StatsService:
     """统计分析服务类"""
     
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.study_service = StudyService()
+    def __init__(self, db=None):
+        """
+        初始化统计服务
+        
+        Args:
+            db: 数据库管理器实例（可选）
+        """
+        self.db = db if db else DatabaseManager()
+        self.study_service = StudyService(db=self.db)
+        self.history = get_history_store(self.db)
+        self._series_cache = None
     
     def get_heatmap_data(self, year: int = None) -> List[Dict]:
         """
@@ -25,11 +35,6 @@ class StatsService:
         if year is None:
             year = datetime.now().year
         
-        raw_data = self.db.get_heatmap_data(year)
-        
-        # 转换为字典便于查找
-        data_dict = {item['record_date']: item['count'] for item in raw_data}
-        
         # 获取每日目标
         conn = self.db.get_connection()
         cursor = conn.cursor()
@@ -39,12 +44,13 @@ class StatsService:
         # 从今天往前推365天（而不是从1月1日开始）
         today = date.today()
         start_date = today - timedelta(days=364)  # 包括今天共365天
+        counts = self._series_slice(start_date, 365)
         heatmap_data = []
         
         for i in range(365):
             current_date = start_date + timedelta(days=i)
             date_str = current_date.strftime('%Y-%m-%d')
-            count = data_dict.get(date_str, 0)
+            count = int(counts[i])
             
             # 计算等级：
             # 0 - 没打卡（灰色）
@@ -77,8 +83,7 @@ class StatsService:
         today = date.today()
         week_start = today - timedelta(days=today.weekday())
         
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+        counts = self._series_slice(week_start, 7)
         
         daily_data = []
         total_week = 0
@@ -87,13 +92,7 @@ class StatsService:
             day = week_start + timedelta(days=i)
             date_str = day.strftime('%Y-%m-%d')
             
-            cursor.execute("""
-                SELECT COALESCE(SUM(count), 0) as count
-                FROM study_records
-                WHERE record_date = ?
-            """, (date_str,))
-            
-            count = cursor.fetchone()['count']
+            count = int(counts[i])
             total_week += count
             
             daily_data.append({
@@ -131,8 +130,7 @@ class StatsService:
         
         days_in_month = (next_month - month_start).days
         
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+        counts = self._series_slice(month_start, days_in_month)
         
         daily_data = []
         total_month = 0
@@ -141,13 +139,7 @@ class StatsService:
             day = month_start + timedelta(days=i)
             date_str = day.strftime('%Y-%m-%d')
             
-            cursor.execute("""
-                SELECT COALESCE(SUM(count), 0) as count
-                FROM study_records
-                WHERE record_date = ?
-            """, (date_str,))
-            
-            count = cursor.fetchone()['count']
+            count = int(counts[i])
             total_month += count
             
             daily_data.append({
@@ -167,6 +159,84 @@ class StatsService:
             'days_in_month': days_in_month
         }
     
+    def get_yearly_trend(self) -> Dict[str, Any]:
+        """
+        获取今年每月趋势数据
+        
+        Returns:
+            包含每月数据的字典
+        """
+        today = date.today()
+        
+        monthly_data = []
+        total_year = 0
+        
+        for month in range(1, 13):
+            month_start = date(today.year, month, 1)
+            next_month = date(today.year + 1, 1, 1) if month == 12 else date(today.year, month + 1, 1)
+            days_in_month = (next_month - month_start).days
+            
+            count = int(sum(self._series_slice(month_start, days_in_month)))
+            total_year += count
+            
+            monthly_data.append({
+                'month': month,
+                'count': count,
+                'is_current': month == today.month
+            })
+        
+        days_passed = (today - date(today.year, 1, 1)).days + 1
+        
+        return {
+            'year': today.year,
+            'monthly_data': monthly_data,
+            'total_year': total_year,
+            'avg_daily': round(total_year / days_passed, 1) if total_year > 0 else 0
+        }
+    
+    def _series_slice(self, start: date, length: int):
+        """
+        从共用的每日序列中取出一段
+        
+        优先读内存历史；内存历史不可用时，周、月、年和热力图视图共用一个
+        覆盖今年和最近365天的序列，只查询一次数据库，数据库有写入或日期变化后重新查询。
+        """
+        series = self.history.daily_series(start, start + timedelta(days=length - 1))
+        if series is not None:
+            return series
+        
+        today = date.today()
+        window_start = min(today - timedelta(days=364), date(today.year, 1, 1))
+        window_end = max(date(today.year, 12, 31), today + timedelta(days=6 - today.weekday()))
+        
+        key = (today, self._data_version())
+        if self._series_cache is None or self._series_cache[0] != key:
+            self._series_cache = (key, self.db.get_daily_series(window_start, window_end))
+        
+        offset = (start - window_start).days
+        return self._series_cache[1][offset:offset + length]
+    
+    def _data_version(self) -> tuple:
+        """数据版本（本连接的修改次数 + 其他连接的提交次数）"""
+        conn = self.db.get_connection()
+        return conn.total_changes, conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def get_day_totals(self) -> Dict[str, int]:
+        """
+        获取有记录的每一天的总题数（日历用）
+        
+        Returns:
+            {'YYYY-MM-DD': 题数}
+        """
+        totals = self.history.day_totals()
+        if totals is not None:
+            return totals
+        
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT record_date, total FROM daily_totals")
+        return {row['record_date']: row['total'] for row in cursor.fetchall()}
+    
     def get_subject_stats(self) -> List[Dict]:
         """
         获取科目统计
@@ -242,8 +312,8 @@ class StatsService:
             SELECT sr.count, s.name, s.color, s.icon
             FROM study_records sr
             JOIN subjects s ON sr.subject_id = s.id
-            WHERE sr.record_date = ?
-        """, (target_date,))
+            WHERE sr.day = ?
+        """, (day_number(target_date),))
         
         records = [dict(row) for row in cursor.fetchall()]
         
@@ -264,34 +334,43 @@ class StatsService:
         Returns:
             最长连续天数
         """
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT DISTINCT record_date 
-            FROM study_records 
-            ORDER BY record_date
-        """)
-        
-        dates = [row['record_date'] for row in cursor.fetchall()]
+        return self.db.get_best_streak()
+    
+    def get_best_streak_run(self) -> Optional[Dict]:
+        """
+        获取历史最佳连续打卡段
         
-        if not dates:
-            return 0
+        Returns:
+            {'start_date', 'end_date', 'length'}，没有记录时返回None
+        """
+        return self.db.get_best_streak_run()
+    
+    def get_top_streak_runs(self, limit: int = 10) -> List[Dict]:
+        """
+        获取最长的若干段连续打卡
         
-        max_streak = 1
-        current_streak = 1
+        Args:
+            limit: 返回段数
+        """
+        return self.db.get_top_streak_runs(limit)
+    
+    def get_streak_run_containing(self, target_date) -> Optional[Dict]:
+        """
+        获取包含指定日期的连续打卡段
         
-        for i in range(len(dates) - 1):
-            current_date = datetime.strptime(dates[i], '%Y-%m-%d').date()
-            next_date = datetime.strptime(dates[i + 1], '%Y-%m-%d').date()
-            
-            if (next_date - current_date).days == 1:
-                current_streak += 1
-                max_streak = max(max_streak, current_streak)
-            else:
-                current_streak = 1
+        Args:
+            target_date: 日期（date或'YYYY-MM-DD'）
+        """
+        return self.db.get_streak_run_containing(target_date)
+    
+    def get_streak_runs(self, min_length: int = 1) -> List[Dict]:
+        """
+        获取所有连续打卡段
         
-        return max_streak
+        Args:
+            min_length: 最短天数
+        """
+        return self.db.get_streak_runs(min_length)
     
     def get_total_days_studied(self) -> int:
         """
@@ -304,8 +383,7 @@ class StatsService:
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT COUNT(DISTINCT record_date) as days
-            FROM study_records
+            SELECT COUNT(*) as days FROM daily_totals
         """)
         
         return cursor.fetchone()['days']
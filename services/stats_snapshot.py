@@ -0,0 +1,123 @@
+"""学习统计快照
+
+首页、刷题页和AI提示词都需要总题数、今日进度、连续打卡天数和等级。
+快照按数据版本缓存：版本不变时所有调用方共用同一个不可变快照，不再查询数据库。
+
+数据版本由三部分组成：
+- 影响统计的写入事件（STATS_EVENTS）的次数，AI缓存、学习会话等其他写入不算
+- 当天日期（跨天后今日进度和连续天数会变化）
+- 其他进程的写入：本线程连接的 PRAGMA data_version 变化，而本进程的连接没有提交过写入
+"""
+import threading
+from datetime import date
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, NamedTuple
+from database.connection import registry
+from database.events import (events, COUNT_ADDED, DAY_ROLLED, RECORDS_DELETED, SUBJECT_ADDED,
+                             SUBJECTS_CHANGED, GOALS_CHANGED)
+
+# 使快照失效的写入事件
+STATS_EVENTS = (COUNT_ADDED, DAY_ROLLED, RECORDS_DELETED, SUBJECT_ADDED, SUBJECTS_CHANGED, GOALS_CHANGED)
+
+
+class StatsSnapshot(NamedTuple):
+    """学习统计快照（不可变）"""
+    total_count: int
+    today_progress: Mapping[str, Any]
+    streak_days: int
+    level_info: Mapping[str, Any]
+
+
+class StatsSnapshotCache:
+    """学习统计快照缓存类（同一数据库共用一个）"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._version = 0
+        self._key = None
+        self._snapshot = None
+        # 各线程上次读取时的 (连接, data_version, 本进程提交次数)
+        self._seen: Dict[int, tuple] = {}
+
+        for event in STATS_EVENTS:
+            events.subscribe(event, self._on_event)
+
+    def get(self, db) -> StatsSnapshot:
+        """
+        获取当前数据版本的快照（版本变化时重新计算）
+
+        Args:
+            db: 数据库管理器实例（子线程传入自己的实例）
+        """
+        with self._lock:
+            key = (self._version, date.today())
+            changed = self._external_changed(db)
+            if self._snapshot is not None and key == self._key and not changed:
+                self.hits += 1
+                return self._snapshot
+
+            self.misses += 1
+            self._snapshot = self._compute(db)
+            self._key = key
+            return self._snapshot
+
+    def invalidate(self):
+        """丢弃快照，下次读取时重新计算"""
+        with self._lock:
+            self._snapshot = None
+            self._seen = {}
+
+    def stats(self) -> Dict[str, int]:
+        """命中和未命中次数"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def _on_event(self, event: str, db_path: str, payload: Dict):
+        """影响统计的写入事件：数据版本加1"""
+        if db_path == self.db_path:
+            with self._lock:
+                self._version += 1
+
+    def _external_changed(self, db) -> bool:
+        """其他进程是否提交过写入（本线程第一次读取或连接更换过时没有比较基准，视为未变化）"""
+        conn = db.get_connection()
+        seen = (conn, conn.execute("PRAGMA data_version").fetchone()[0], registry.local_commits(self.db_path))
+        last = self._seen.get(threading.get_ident())
+        self._seen[threading.get_ident()] = seen
+        if last is None or last[0] is not conn:
+            return False
+        return last[1] != seen[1] and last[2] == seen[2]
+
+    def _compute(self, db) -> StatsSnapshot:
+        """查询数据库生成快照"""
+        from .study_service import StudyService
+
+        study_service = StudyService(db=db)
+        total_count = study_service.get_total_count()
+        return StatsSnapshot(
+            total_count=total_count,
+            today_progress=MappingProxyType(study_service.get_today_progress()),
+            streak_days=study_service.get_streak_days(),
+            level_info=MappingProxyType(study_service.get_level_info(total_count)),
+        )
+
+
+_caches: Dict[str, StatsSnapshotCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_snapshot_cache(db) -> StatsSnapshotCache:
+    """获取数据库对应的快照缓存"""
+    with _caches_lock:
+        cache = _caches.get(db.db_path)
+        if cache is None:
+            cache = _caches[db.db_path] = StatsSnapshotCache(db.db_path)
+        return cache
+
+
+def get_stats_snapshot(db) -> StatsSnapshot:
+    """获取数据库当前的学习统计快照"""
+    return get_snapshot_cache(db).get(db)
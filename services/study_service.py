@@ -27,8 +27,8 @@ class StudyService:
         Returns:
             包含更新后统计信息的字典
         """
-        # 添加记录
-        record_id = self.db.add_study_record(subject_id, count)
+        # 添加记录（同时返回科目当天题数和科目总数）
+        record = self.db.record_study(subject_id, count)
         
         # 获取更新后的统计信息
         today_progress = self.db.get_today_progress()
@@ -36,7 +36,9 @@ class StudyService:
         streak_days = self.db.get_streak_days()
         
         return {
-            'record_id': record_id,
+            'record_id': record['record_id'],
+            'subject_day_count': record['day_count'],
+            'subject_total': record['subject_total'],
             'today_progress': today_progress,
             'total_count': total_count,
             'streak_days': streak_days,
@@ -55,16 +57,20 @@ class StudyService:
         """获取连续打卡天数"""
         return self.db.get_streak_days()
     
-    def get_level_info(self) -> Dict[str, Any]:
+    def get_level_info(self, total_count: int = None) -> Dict[str, Any]:
         """
         获取等级信息
         
+        Args:
+            total_count: 总题数，默认查询数据库
+            
         Returns:
             包含等级、称号、进度的字典
         """
         from config.constants import LEVEL_THRESHOLDS
         
-        total_count = self.get_total_count()
+        if total_count is None:
+            total_count = self.get_total_count()
         
         # 确定当前等级
         current_level = 0
@@ -102,6 +108,15 @@ class StudyService:
             'remaining': max(0, next_threshold - total_count)
         }
     
+    def get_snapshot(self):
+        """
+        获取学习统计快照（总题数、今日进度、连续天数、等级）
+        
+        数据没有变化时直接返回缓存的快照，不查询数据库。
+        """
+        from .stats_snapshot import get_stats_snapshot
+        return get_stats_snapshot(self.db)
+    
     def get_subject_distribution(self) -> list:
         """获取科目分布"""
         subjects = self.db.get_all_subjects()
@@ -171,7 +186,7 @@ class StudyService:
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT MAX(record_date) as last_date FROM study_records
+            SELECT MAX(record_date) as last_date FROM daily_totals
         """)
         
         result = cursor.fetchone()
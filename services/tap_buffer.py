@@ -0,0 +1,157 @@
+"""点击写入缓冲
+
+"+1"连续点击时先在内存中按科目累计，停止点击一段时间后（或离开页面、
+应用退出时）合并为一次批量写入，避免每次点击都提交一次事务。
+"""
+import atexit
+import threading
+import weakref
+from datetime import date
+from typing import Callable, Dict, Optional, Tuple
+from database.db_manager import DatabaseManager
+from config.settings import TAP_FLUSH_IDLE_SECONDS
+
+
+def _kivy_scheduler(callback: Callable, delay: float):
+    """默认调度器：Kivy主线程定时回调"""
+    from kivy.clock import Clock
+    return Clock.schedule_once(callback, delay)
+
+
+# 尚未关闭的缓冲（弱引用，重新创建的缓冲可以被回收）
+_live_buffers = weakref.WeakSet()
+
+
+def _flush_all():
+    """进程退出时写入所有缓冲中剩余的点击（不触发回调）"""
+    for buffer in list(_live_buffers):
+        buffer.flush(notify=False)
+
+
+atexit.register(_flush_all)
+
+
+class TapBuffer:
+    """点击合并写入缓冲类"""
+
+    def __init__(self, db=None, idle_seconds: float = TAP_FLUSH_IDLE_SECONDS,
+                 scheduler: Callable = None,
+                 on_flush: Callable[[Dict[Tuple[int, str], int]], None] = None):
+        """
+        初始化点击缓冲
+
+        Args:
+            db: 数据库管理器实例（可选）
+            idle_seconds: 最后一次点击后等待多久写入
+            scheduler: 调度函数 scheduler(callback, delay)，返回带 cancel() 的事件，默认使用Kivy Clock
+            on_flush: 写入成功后的回调，参数为 {(科目ID, 日期): 题数}
+        """
+        self.db = db if db else DatabaseManager()
+        self.idle_seconds = idle_seconds
+        self.scheduler = scheduler or _kivy_scheduler
+        self.on_flush = on_flush
+
+        self._pending: Dict[Tuple[int, str], int] = {}
+        self._lock = threading.Lock()
+        self._event = None
+
+        # 进程退出时写入剩余点击（不触发回调）
+        _live_buffers.add(self)
+
+    def add(self, subject_id: int, count: int = 1) -> int:
+        """
+        记录点击（不写数据库），并重新开始空闲计时
+
+        Args:
+            subject_id: 科目ID
+            count: 题目数量
+
+        Returns:
+            该科目今天尚未写入的题数
+        """
+        key = (subject_id, date.today().strftime('%Y-%m-%d'))
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + count
+            pending = self._pending[key]
+
+        self._schedule()
+        return pending
+
+    def pending_count(self, subject_id: Optional[int] = None) -> int:
+        """
+        获取今天尚未写入的题数
+
+        Args:
+            subject_id: 科目ID，默认统计所有科目
+        """
+        today = date.today().strftime('%Y-%m-%d')
+        with self._lock:
+            return sum(count for (sid, day), count in self._pending.items()
+                       if day == today and (subject_id is None or sid == subject_id))
+
+    def flush(self, notify: bool = True) -> Optional[Dict[Tuple[int, str], int]]:
+        """
+        把缓冲的点击合并写入数据库（一个事务）
+
+        写入成功后才从缓冲中移除；写入失败时点击保留在缓冲中，空闲计时到期后重试。
+
+        Args:
+            notify: 写入成功后是否调用 on_flush 回调
+
+        Returns:
+            本次写入的 {(科目ID, 日期): 题数}，没有待写入点击或写入失败时返回None
+        """
+        self._cancel()
+
+        with self._lock:
+            batch = dict(self._pending)
+        if not batch:
+            return None
+
+        try:
+            self.db.add_study_records_bulk(
+                (subject_id, count, day) for (subject_id, day), count in batch.items()
+            )
+        except Exception as e:
+            print(f"[ERROR] 点击缓冲写入失败，保留 {sum(batch.values())} 题待重试: {e}")
+            # 空闲计时到期后重试（如WAL下短暂的 database is locked）
+            self._schedule()
+            return None
+
+        # 写入期间新增的点击保留在缓冲中
+        with self._lock:
+            for key, count in batch.items():
+                remaining = self._pending.get(key, 0) - count
+                if remaining > 0:
+                    self._pending[key] = remaining
+                else:
+                    self._pending.pop(key, None)
+            has_more = bool(self._pending)
+
+        if has_more:
+            self._schedule()
+
+        if notify and self.on_flush:
+            self.on_flush(batch)
+        return batch
+
+    def close(self):
+        """写入剩余点击（不触发回调），不再在进程退出时写入"""
+        self.flush(notify=False)
+        _live_buffers.discard(self)
+
+    def _schedule(self):
+        """重新开始空闲计时"""
+        self._cancel()
+        self._event = self.scheduler(self._on_idle, self.idle_seconds)
+
+    def _cancel(self):
+        """取消尚未触发的空闲写入"""
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def _on_idle(self, *args):
+        """空闲计时到期"""
+        self._event = None
+        self.flush()
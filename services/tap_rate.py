@@ -0,0 +1,226 @@
+"""点击速率跟踪
+
+速率型速度成就（如"10分钟内完成30题"）需要知道最近一段时间内的题数。
+每个科目、每个时间窗口维护一个 (时间戳, 题数) 队列和累计和：新点击从右端加入，
+超出窗口的点击从左端移出，每次点击均摊O(1)，不需要回查历史记录。
+
+点击同时按学习会话（停止刷题超过 STUDY_SESSION_GAP_SECONDS 即结束）保存到
+study_sessions：每个会话一行，点击序列压缩为 (毫秒偏移, 题数) 的整数数组。
+应用重启后从最近的会话恢复窗口内的点击。
+"""
+import atexit
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Tuple
+from database.db_manager import DatabaseManager
+from config.settings import STUDY_SESSION_GAP_SECONDS
+
+
+class RateWindow:
+    """单个时间窗口内的题数（时间戳队列 + 累计和）"""
+
+    __slots__ = ('seconds', 'total', '_taps')
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.total = 0
+        self._taps = deque()
+
+    def add(self, timestamp: float, count: int) -> Tuple[int, int]:
+        """
+        加入一次点击
+
+        Returns:
+            (加入前窗口内题数, 加入后窗口内题数)，加入前的题数已移出过期点击
+        """
+        self._evict(timestamp)
+        before = self.total
+        self._taps.append((timestamp, count))
+        self.total += count
+        return before, self.total
+
+    def _evict(self, now: float):
+        """移出不在 (now - seconds, now] 内的点击"""
+        taps = self._taps
+        while taps and taps[0][0] <= now - self.seconds:
+            self.total -= taps.popleft()[1]
+
+
+class _Session:
+    """进行中的学习会话"""
+
+    __slots__ = ('session_id', 'start', 'last', 'questions', 'taps', 'saved')
+
+    def __init__(self, start: float, session_id: int = None):
+        self.session_id = session_id
+        self.start = int(start)
+        self.last = start
+        self.questions = 0
+        # 交替保存 毫秒偏移, 题数
+        self.taps = array('i')
+        # 上次保存时的点击序列长度
+        self.saved = 0
+
+    def add(self, timestamp: float, count: int):
+        self.taps.extend((int((timestamp - self.start) * 1000), count))
+        self.questions += count
+        self.last = timestamp
+
+    def iter_taps(self) -> Iterable[Tuple[float, int]]:
+        """(时间戳, 题数)"""
+        taps = self.taps
+        for i in range(0, len(taps), 2):
+            yield self.start + taps[i] / 1000, taps[i + 1]
+
+
+class TapRateTracker:
+    """点击速率跟踪类（同一数据库共用一个）"""
+
+    def __init__(self, db=None, session_gap: float = STUDY_SESSION_GAP_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        """
+        初始化速率跟踪
+
+        Args:
+            db: 数据库管理器实例（可选）
+            session_gap: 停止刷题多久后结束会话（秒）
+            clock: 当前时间函数（测试时替换）
+        """
+        self.db = db if db else DatabaseManager()
+        self.session_gap = session_gap
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._window_seconds: Tuple[int, ...] = ()
+        # 科目ID -> {窗口秒数: 窗口}
+        self._windows: Dict[int, Dict[int, RateWindow]] = {}
+        self._sessions: Dict[int, _Session] = {}
+
+        # 进程退出时保存进行中的会话
+        atexit.register(self.save_sessions)
+
+    def set_windows(self, window_seconds: Iterable[int]):
+        """
+        设置需要跟踪的时间窗口（成就规则变化时调用）
+
+        窗口变化后用进行中会话的点击重建窗口。
+        """
+        window_seconds = tuple(sorted(set(window_seconds)))
+        with self._lock:
+            if window_seconds == self._window_seconds:
+                return
+            self._window_seconds = window_seconds
+            self._windows = {}
+            for subject_id, session in self._sessions.items():
+                windows = self._new_windows()
+                for timestamp, count in session.iter_taps():
+                    for window in windows.values():
+                        window.add(timestamp, count)
+                self._windows[subject_id] = windows
+
+    def add(self, subject_id: int, count: int = 1) -> Dict[int, Tuple[int, int]]:
+        """
+        记录一次刷题（点击或一次提交的题数）
+
+        Args:
+            subject_id: 科目ID
+            count: 题目数量
+
+        Returns:
+            {窗口秒数: (加入前窗口内题数, 加入后窗口内题数)}
+        """
+        now = self.clock()
+        finished = None
+        with self._lock:
+            session = self._sessions.get(subject_id)
+            if session is None:
+                session = self._restore(subject_id, now)
+            elif now - session.last > self.session_gap:
+                finished = session
+                session = self._sessions[subject_id] = _Session(now)
+            session.add(now, count)
+
+            windows = self._windows.get(subject_id)
+            if windows is None:
+                windows = self._windows[subject_id] = self._new_windows()
+            changes = {seconds: window.add(now, count) for seconds, window in windows.items()}
+
+        if finished is not None:
+            self._save(subject_id, finished)
+        return changes
+
+    def save_sessions(self):
+        """保存所有进行中的会话（离开刷题页、应用退出时调用）"""
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for subject_id, session in sessions:
+            self._save(subject_id, session)
+
+    def _new_windows(self) -> Dict[int, RateWindow]:
+        return {seconds: RateWindow(seconds) for seconds in self._window_seconds}
+
+    def _restore(self, subject_id: int, now: float) -> _Session:
+        """科目第一次点击：从最近的会话恢复窗口内的点击（最后一个会话未结束时继续该会话）"""
+        longest = max(self._window_seconds, default=0)
+        since = datetime.fromtimestamp(now - max(longest, self.session_gap))
+        try:
+            rows = self.db.get_study_sessions(subject_id, since)
+        except Exception as e:
+            print(f"[WARN] 读取学习会话失败: {e}")
+            rows = []
+
+        previous = None
+        windows = self._windows[subject_id] = self._new_windows()
+        for row in rows:
+            if not row['taps']:
+                continue
+            start = datetime.strptime(row['start_time'], '%Y-%m-%d %H:%M:%S').timestamp()
+            previous = _Session(start, session_id=row['id'])
+            previous.taps.frombytes(row['taps'])
+            previous.questions = row['questions_completed'] or 0
+            previous.saved = len(previous.taps)
+            for timestamp, count in previous.iter_taps():
+                previous.last = timestamp
+                for window in windows.values():
+                    window.add(timestamp, count)
+
+        if previous is not None and now - previous.last <= self.session_gap:
+            session = previous
+        else:
+            session = _Session(now)
+        self._sessions[subject_id] = session
+        return session
+
+    def _save(self, subject_id: int, session: _Session):
+        """保存会话（已保存过的会话更新同一行，没有新点击时跳过）"""
+        if len(session.taps) == session.saved:
+            return
+        saved = len(session.taps)
+        try:
+            session.session_id = self.db.save_study_session(
+                subject_id,
+                datetime.fromtimestamp(session.start),
+                datetime.fromtimestamp(session.last),
+                session.questions,
+                session.taps.tobytes(),
+                session_id=session.session_id,
+            )
+            session.saved = saved
+        except Exception as e:
+            print(f"[ERROR] 保存学习会话失败: {e}")
+
+
+_trackers: Dict[str, TapRateTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_tap_rate_tracker(db) -> TapRateTracker:
+    """获取数据库对应的点击速率跟踪"""
+    with _trackers_lock:
+        tracker = _trackers.get(db.db_path)
+        if tracker is None:
+            tracker = _trackers[db.db_path] = TapRateTracker(db)
+        return tracker
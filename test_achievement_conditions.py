@@ -0,0 +1,171 @@
+"""测试成就条件语言"""
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from database.day_numbers import day_number
+from services.achievement_conditions import (
+    ConditionError, compile_condition, evaluate_conditions, validate_condition
+)
+
+
+def _evaluate(conn, conditions):
+    """求值 {编号: 条件}，返回满足的编号"""
+    return evaluate_conditions(conn, [(key, compile_condition(c)) for key, c in conditions.items()])
+
+
+def test_conditions_evaluate(db_path):
+    """各类条件和组合的求值结果"""
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+    subjects = db.get_all_subjects()
+    first, second = subjects[0], subjects[1]
+    today = date.today()
+
+    db.add_study_records_bulk([
+        (first['id'], 40, today),
+        (first['id'], 30, today - timedelta(days=1)),
+        (first['id'], 100, today - timedelta(days=20)),
+        (second['id'], 60, today - timedelta(days=2)),
+    ])
+    # 今天的记录在早上6点开始
+    conn.execute("UPDATE study_records SET created_at = datetime(date('now', 'localtime') || ' 06:00', 'utc') "
+                 "WHERE day = ?", (day_number(today),))
+    conn.commit()
+
+    satisfied = _evaluate(conn, {
+        1: {'total_count': 230},
+        2: {'total_count': 231},
+        3: {'streak_days': 3},
+        4: {'streak_days': 4},
+        5: {'subject_total': {'subject': first['name'], 'at_least': 170}},
+        6: {'subject_total': {'subject': second['id'], 'at_least': 61}},
+        7: {'subjects_over': {'at_least': 60, 'count': 2}},
+        8: {'subjects_over': {'at_least': 60, 'count': 2, 'subjects': [first['name'], subjects[2]['id']]}},
+        9: {'window_count': {'days': 7, 'at_least': 130}},
+        10: {'window_count': {'days': 7, 'at_least': 71, 'subject': first['name']}},
+        11: {'window_count': {'days': 30, 'at_least': 170, 'subject': first['id']}},
+        12: {'time_of_day': {'days': 7, 'before': '07:00', 'at_least': 1}},
+        13: {'time_of_day': {'days': 7, 'after': '22:00', 'before': '06:30', 'at_least': 1}},
+        14: {'time_of_day': {'days': 7, 'after': '05:00', 'before': '06:30', 'at_least': 2}},
+        15: {'all': [{'total_count': 100}, {'any': [{'streak_days': 30}, {'subject_total': {
+            'subject': '不存在的科目', 'at_least': 1}}]}]},
+        16: {'any': [{'streak_days': 30}, {'all': [{'total_count': 100}, {'window_count': {
+            'days': 1, 'at_least': 40}}]}]},
+    })
+    assert satisfied == {1, 3, 5, 7, 9, 11, 12, 13, 16}, satisfied
+    print("✅ 条件求值正确")
+
+
+def test_validator_rejects_bad_conditions(db_path):
+    """格式错误、超过范围或无法走索引的条件被拒绝"""
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+    validate_condition(conn, {'all': [{'window_count': {'days': 30, 'at_least': 5, 'subject': '数学专题'}},
+                                      {'time_of_day': {'days': 7, 'after': '22:00', 'at_least': 1}}]})
+
+    bad = [
+        {'unknown_kind': 1},
+        {'total_count': 0},
+        {'total_count': True},
+        {'single_submit': 50},
+        {'window_count': {'days': 400, 'at_least': 1}},
+        {'window_count': {'at_least': 1}},
+        {'window_count': {'days': 7, 'at_least': 1, 'month': 3}},
+        {'time_of_day': {'days': 7, 'at_least': 1}},
+        {'time_of_day': {'days': 7, 'before': '7:00', 'at_least': 1}},
+        {'subject_total': {'subject': '', 'at_least': 1}},
+        {'all': []},
+        {'total_count': 1, 'streak_days': 1},
+        {'all': [{'all': [{'all': [{'all': [{'all': [{'all': [{'total_count': 1}]}]}]}]}]}]},
+    ]
+    for condition in bad:
+        try:
+            validate_condition(conn, condition)
+            assert False, f"应拒绝: {condition}"
+        except ConditionError:
+            pass
+
+    # 编译结果需要全表扫描学习记录时被拒绝
+    conn.execute("DROP INDEX idx_study_records_day")
+    try:
+        validate_condition(conn, {'window_count': {'days': 7, 'at_least': 1}})
+        assert False, "应拒绝全表扫描"
+    except ConditionError as e:
+        assert 'study_records' in str(e)
+    print(f"✅ 拒绝 {len(bad) + 1} 个无效条件")
+
+
+class _OldPlanConnection:
+    """查询计划使用 SQLite 3.36 之前格式（"SCAN TABLE 表名"）的连接"""
+
+    def __init__(self, detail):
+        self.detail = detail
+
+    def execute(self, sql, parameters=()):
+        return self
+
+    def fetchall(self):
+        return [(2, 0, 0, self.detail)]
+
+
+def test_validator_reads_old_plan_format():
+    """旧版SQLite的查询计划格式同样识别全表扫描"""
+    condition = {'window_count': {'days': 7, 'at_least': 1}}
+    for detail in ('SCAN TABLE study_records', 'SCAN TABLE daily_totals USING COVERING INDEX idx'):
+        try:
+            validate_condition(_OldPlanConnection(detail), condition)
+            assert False, f"应拒绝: {detail}"
+        except ConditionError as e:
+            assert detail.split()[2] in str(e)
+
+    validate_condition(_OldPlanConnection('SEARCH TABLE study_records USING COVERING INDEX '
+                                          'idx_study_records_day (day>?)'), condition)
+    validate_condition(_OldPlanConnection('SCAN TABLE subjects'), condition)
+    print("✅ 旧版查询计划格式")
+
+
+def test_service_unlocks_custom_in_one_query(db_path):
+    """自定义成就一条查询求值，写入后解锁"""
+    from services.achievement_service import AchievementService
+
+    db = DatabaseManager(db_path)
+    service = AchievementService(db)
+    subject_id = db.get_all_subjects()[0]['id']
+    service.check_achievements()
+
+    for n in range(1, 31):
+        service.add_custom_achievement(f'一周{n * 10}题', '', {'window_count': {'days': 7, 'at_least': n * 10}})
+    try:
+        service.add_custom_achievement('全部历史', '', {'window_count': {'days': 3650, 'at_least': 1}})
+        assert False, "应拒绝超过范围的条件"
+    except ConditionError:
+        pass
+    assert len(service.rules.custom_pending()) == 30
+
+    db.record_study(subject_id, 45, date.today())
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    unlocked = service.check_achievements()
+    conn.set_trace_callback(None)
+
+    custom = sorted(a['condition']['window_count']['at_least'] for a in unlocked if a['type'] == 'CUSTOM')
+    assert custom == [10, 20, 30, 40]
+    assert sum('UNION ALL' in sql for sql in statements) == 1
+
+    # 已解锁的不再求值；没有写入时不查询
+    assert len(service.rules.custom_pending()) == 26
+    assert service.check_achievements() == []
+    db.record_study(subject_id, 10, date.today())
+    assert [a['name'] for a in service.check_achievements() if a['type'] == 'CUSTOM'] == ['一周50题']
+    print("✅ 自定义成就一条查询求值")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
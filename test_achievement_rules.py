@@ -0,0 +1,202 @@
+"""测试成就规则编译"""
+import os
+import sys
+import random
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from services.achievement_rules import AchievementRules, TYPE_METRICS
+
+
+def _random_catalog(rng, size):
+    """随机成就目录（部分已解锁、部分可重复）"""
+    catalog = []
+    for achievement_id in range(1, size + 1):
+        achievement_type = rng.choice(list(TYPE_METRICS))
+        catalog.append({
+            'id': achievement_id,
+            'type': achievement_type,
+            'condition': {TYPE_METRICS[achievement_type]: rng.randint(1, 500)},
+            'repeatable': int(rng.random() < 0.1),
+            'is_unlocked': int(rng.random() < 0.3),
+        })
+    return catalog
+
+
+def _linear_reached(catalog, unlocked, metric, value):
+    """逐条判断（原做法）"""
+    return sorted(
+        a['id'] for a in catalog
+        if TYPE_METRICS[a['type']] == metric and a['condition'][metric] <= value
+        and (a['repeatable'] or not (a['is_unlocked'] or a['id'] in unlocked))
+    )
+
+
+def test_rules_match_linear_scan():
+    """二分查找结果与逐条判断一致"""
+    rng = random.Random(15)
+    catalog = _random_catalog(rng, 300)
+    rules = AchievementRules(catalog)
+    unlocked = set()
+
+    for _ in range(500):
+        metric = rng.choice(list(TYPE_METRICS.values()))
+        value = rng.randint(0, 520)
+        reached = rules.reached(metric, value)
+        assert sorted(a['id'] for a in reached) == _linear_reached(catalog, unlocked, metric, value)
+
+        # 部分成就解锁后不再出现
+        for achievement in reached:
+            if rng.random() < 0.5:
+                rules.mark_unlocked(achievement['id'])
+                unlocked.add(achievement['id'])
+    print(f"✅ {len(rules)} 条规则与逐条判断一致")
+
+
+def test_service_unlocks_newly_crossed_only(db_path):
+    """成就服务只解锁新达到的阈值"""
+    from services.achievement_service import AchievementService
+
+    db = DatabaseManager(db_path)
+    service = AchievementService(db)
+    subject_id = db.get_all_subjects()[0]['id']
+
+    db.record_study(subject_id, 12, date.today())
+    names = {a['name'] for a in service.check_achievements()}
+    expected = {a['name'] for a in db.get_all_achievements()
+                if a['type'] == 'QUANTITY' and a['condition']['total_count'] <= 12}
+    assert names == expected and expected
+
+    # 没有新达到的阈值时不解锁、不查询成就表
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    assert service.check_achievements() == []
+    conn.set_trace_callback(None)
+    assert not any('achievements' in sql for sql in statements)
+
+    # 连续7天
+    db.add_study_records_bulk((subject_id, 1, date.today() - timedelta(days=i)) for i in range(1, 7))
+    unlocked = service.check_achievements()
+    assert any(a['type'] == 'STREAK' and a['condition']['streak_days'] == 7 for a in unlocked)
+
+    # 速度型成就可重复
+    first = service.check_speed_achievement(25)
+    second = service.check_speed_achievement(25)
+    assert [a['count'] for a in first] == [1] and [a['count'] for a in second] == [2]
+
+    # 清空成就后重新编译
+    db.clear_all_records()
+    db.record_study(subject_id, 12, date.today())
+    assert {a['name'] for a in service.check_achievements()} == expected
+    print("✅ 成就服务按阈值解锁")
+
+
+def test_events_select_rule_types(db_path):
+    """写入事件决定需要检查的成就类型"""
+    from services.achievement_service import AchievementService
+
+    db = DatabaseManager(db_path)
+    service = AchievementService(db)
+    subject_ids = [s['id'] for s in db.get_all_subjects()]
+    service.check_achievements()
+
+    # 当天第一条记录：总数、连续天数和单次提交
+    db.record_study(subject_ids[0], 3, date.today())
+    dirty, submits = service.tracker.take()
+    assert dirty == {'total_count', 'streak_days', 'single_submit', 'all_subjects', 'custom'} and submits == [3]
+
+    # 同一天再次记录（其他科目）：不检查连续天数
+    db.record_study(subject_ids[1], 30, date.today())
+    dirty, submits = service.tracker.take()
+    assert 'streak_days' not in dirty and submits == [30]
+
+    # 合并写入的点击不是单次提交
+    db.add_study_records_bulk([(subject_ids[0], 1, date.today()), (subject_ids[0], 1, date.today())])
+    dirty, submits = service.tracker.take()
+    assert dirty == {'total_count', 'all_subjects', 'custom'} and submits == []
+
+    # 补录以前的日期会改变连续天数
+    db.add_study_records_bulk([(subject_ids[0], 1, date.today() - timedelta(days=3))])
+    assert 'streak_days' in service.tracker.take()[0]
+
+    # 新增科目只影响全能型和自定义成就
+    db.add_subject('新科目')
+    assert service.tracker.take()[0] == {'all_subjects', 'custom'}
+
+    # 单次提交30题，速度成就由记录事件触发
+    db.record_study(subject_ids[0], 30, date.today())
+    unlocked = service.check_achievements()
+    assert sorted(a['condition']['single_submit'] for a in unlocked if a['type'] == 'SPEED') == [20, 30]
+    print("✅ 按写入事件选择成就类型")
+
+
+def test_unlock_batch_single_commit(db_path):
+    """批量解锁一次查询、一次提交，结果与逐个解锁相同"""
+    db = DatabaseManager(db_path)
+    ids = [a['id'] for a in db.get_all_achievements()][:5]
+    assert db.unlock_achievement(ids[0]) == {'unlocked': True, 'count': 1, 'is_first': True}
+    db.unlock_achievement(ids[1], repeatable=True)
+
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    results = db.unlock_achievements_batch(
+        [(ids[0], False), (ids[1], True), (ids[2], False), (ids[3], True), (ids[3], True),
+         (ids[2], False), (ids[0], False)]
+    )
+    conn.set_trace_callback(None)
+
+    assert results == {
+        ids[0]: {'unlocked': False, 'count': 1, 'is_first': False},
+        ids[1]: {'unlocked': True, 'count': 2, 'is_first': False},
+        ids[2]: {'unlocked': True, 'count': 1, 'is_first': True},
+        ids[3]: {'unlocked': True, 'count': 2, 'is_first': False},
+    }
+    assert statements.count('COMMIT') == 1
+    assert sum(stmt.lstrip().upper().startswith('SELECT') for stmt in statements) == 1
+
+    rows = conn.execute("SELECT achievement_id, count FROM user_achievements ORDER BY achievement_id")
+    assert [tuple(row) for row in rows] == [(ids[0], 1), (ids[1], 2), (ids[2], 1), (ids[3], 2)]
+    assert db.unlock_achievements_batch([]) == {}
+    print("✅ 批量解锁一次提交")
+
+
+def test_all_progress_single_pass(db_path):
+    """全部成就进度一次读取，与逐个查询结果相同"""
+    from services.achievement_service import AchievementService
+
+    db = DatabaseManager(db_path)
+    service = AchievementService(db)
+    subject_id = db.get_all_subjects()[0]['id']
+    db.add_study_records_bulk((subject_id, 20, date.today() - timedelta(days=i)) for i in range(8))
+    service.check_achievements()
+    speed = next(a for a in db.get_all_achievements() if a['type'] == 'SPEED')
+    db.unlock_achievements_batch([(speed['id'], True), (speed['id'], True)])
+    service.study_service.get_snapshot()
+
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    data = service.get_all_achievement_progress()
+    conn.set_trace_callback(None)
+    assert sum('achievements' in sql for sql in statements) == 1
+
+    achievements = data['unlocked'] + data['locked']
+    assert data['total'] == len(achievements) and data['unlocked_count'] == len(data['unlocked'])
+    for achievement in achievements:
+        assert achievement['progress'] == service.get_achievement_progress(achievement['id'])
+
+    by_id = {a['id']: a for a in achievements}
+    assert by_id[speed['id']]['count'] == 2
+    quantity = next(a for a in data['locked'] if a['type'] == 'QUANTITY')
+    assert quantity['progress']['current'] == 160
+    print(f"✅ {len(achievements)} 个成就进度一次读取")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
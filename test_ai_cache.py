@@ -0,0 +1,121 @@
+"""测试AI回复缓存"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from services.ai_cache import ResponseCache, cache_key, stats_bucket
+from services.ai_service import AIService, AIUnavailableError, EMPTY_REPLY
+
+
+def _snapshot(current, target=20, streak=0, level=1):
+    return SimpleNamespace(today_progress={'current': current, 'target': target},
+                           streak_days=streak, level_info={'level': level})
+
+
+def test_cache_key_buckets():
+    """今日进度同一档位、上下文数量同一量级时缓存键相同"""
+    assert stats_bucket(_snapshot(6)) == stats_bucket(_snapshot(9))
+    assert stats_bucket(_snapshot(9)) != stats_bucket(_snapshot(11))
+    assert stats_bucket(_snapshot(20)) == stats_bucket(_snapshot(35))
+    assert stats_bucket(_snapshot(0, streak=8)) == stats_bucket(_snapshot(0, streak=13))
+    assert stats_bucket(_snapshot(0, streak=6)) != stats_bucket(_snapshot(0, streak=7))
+
+    assert (cache_key(1, 'big_progress', _snapshot(5), {'count': 50})
+            == cache_key(1, 'big_progress', _snapshot(5), {'count': 60}))
+    assert (cache_key(1, 'big_progress', _snapshot(5), {'count': 50})
+            != cache_key(1, 'big_progress', _snapshot(5), {'count': 100}))
+    assert cache_key(1, 'manual_request', _snapshot(5)) != cache_key(2, 'manual_request', _snapshot(5))
+    print("✅ 缓存键分档")
+
+
+def test_variants_ttl_and_lru(db_path):
+    """集满回复后轮换使用；过期后重新请求；超出总数淘汰最久未用的"""
+    db = DatabaseManager(db_path)
+    now = [1000.0]
+    cache = ResponseCache(db, ttl=100, variants=3, max_entries=4, clock=lambda: now[0])
+
+    # 集满之前不命中，重复的回复不算新的一条
+    for text in ('甲', '乙', '乙'):
+        assert cache.get('k') is None
+        cache.put('k', 1, 'manual_request', text)
+        now[0] += 1
+    assert cache.get('k') is None
+    cache.put('k', 1, 'manual_request', '丙')
+
+    # 轮换：连续三次不重复
+    now[0] += 1
+    served = [cache.get('k') for _ in range(3)]
+    assert sorted(served) == ['丙', '乙', '甲']
+    assert cache.get('k') == served[0]
+
+    # 过期后不再直接使用，新回复替换最旧的一条
+    now[0] += 100
+    assert cache.get('k') is None
+    cache.put('k', 1, 'manual_request', '丁')
+    assert sorted(r['content'] for r in db.get_cached_responses('k')) == ['丁', '丙', '乙']
+
+    # 总数超出上限时淘汰最久未用的
+    now[0] += 1
+    cache.put('other', 1, 'daily_goal_complete', '戊')
+    cache.put('other', 1, 'daily_goal_complete', '己')
+    contents = [r['content'] for key in ('k', 'other') for r in db.get_cached_responses(key)]
+    assert len(contents) == 4 and '乙' not in contents
+
+    stats = cache.stats()
+    assert stats['requests'] == 9 and stats['hits'] == 4
+    assert abs(stats['hit_rate'] - 4 / 9) < 1e-9
+    print(f"✅ 回复轮换，命中率 {stats['hit_rate']:.0%}")
+
+
+def test_service_uses_cache_and_offline_fallback(db_path):
+    """鼓励请求命中缓存时不调用API；连不上API时立即使用缓存"""
+    db = DatabaseManager(db_path)
+    service = AIService(db=db)
+    identity_id = db.get_all_ai_identities()[0]['id']
+    replies = iter(['第一条鼓励', '第二条鼓励', EMPTY_REPLY, '第三条鼓励'])
+    calls = []
+
+    def fake_call(prompt, identity_id=None):
+        calls.append(prompt)
+        reply = next(replies, None)
+        if reply is None:
+            raise AIUnavailableError("网络请求失败")
+        return reply
+
+    service.call_ai_api = fake_call
+
+    results = [service.request_encouragement('manual_request', identity_id) for _ in range(4)]
+    assert len(calls) == 4 and not any(r['cached'] for r in results)
+
+    # 集满三条后命中缓存
+    result = service.request_encouragement('manual_request', identity_id)
+    assert result['cached'] and result['content'] == '第一条鼓励' and len(calls) == 4
+    assert len(db.get_ai_encouragement_history(limit=10)) == 3
+
+    # 进度变化到下一档后未命中，且连不上API：使用其他档位的缓存
+    db.record_study(db.get_all_subjects()[0]['id'], 10)
+    calls.clear()
+    result = service.request_encouragement('manual_request', identity_id)
+    assert result['cached'] and result['content'] == '第二条鼓励' and len(calls) == 1
+
+    # 离线期间不再等待网络
+    result = service.request_encouragement('manual_request', identity_id)
+    assert result['cached'] and result['content'] == '第三条鼓励' and len(calls) == 1
+
+    # 修改身份提示词后缓存失效
+    db.update_ai_identity(identity_id, '新的提示词')
+    try:
+        service.request_encouragement('manual_request', identity_id)
+        assert False, "没有缓存时应报告网络错误"
+    except AIUnavailableError:
+        pass
+    print("✅ 缓存命中与离线回复")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
@@ -0,0 +1,166 @@
+"""测试AI请求执行器"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from services.ai_executor import AIExecutor
+
+
+class _MainThread:
+    """代替Kivy Clock：回调先排队，run() 时在测试线程执行"""
+
+    def __init__(self):
+        self.pending = []
+        self._lock = threading.Lock()
+
+    def __call__(self, callback, delay):
+        with self._lock:
+            self.pending.append(callback)
+
+    def run(self):
+        with self._lock:
+            pending, self.pending = self.pending, []
+        for callback in pending:
+            callback(0)
+
+
+def _blocking_task(release, calls, started=None):
+    """等待 release 后返回的任务"""
+    def _task(task):
+        calls.append(threading.current_thread().name)
+        if started is not None:
+            started.set()
+        release.wait(5)
+        return 'done'
+    return _task
+
+
+def test_deduplicate_and_deliver_on_main_thread():
+    """相同键只执行一次，结果在主线程回调给所有发起方"""
+    main = _MainThread()
+    executor = AIExecutor(max_workers=2, scheduler=main)
+    release = threading.Event()
+    calls, results = [], []
+    try:
+        first = executor.submit('k', _blocking_task(release, calls), lambda r, e: results.append(('a', r, e)))
+        second = executor.submit('k', _blocking_task(release, calls), lambda r, e: results.append(('b', r, e)))
+        assert first is second
+
+        failing = executor.submit('bad', lambda task: 1 / 0, lambda r, e: results.append(('c', r, e)))
+        release.set()
+        first.future.result(5)
+        failing.future.result(5)
+
+        # 工作线程中不回调
+        assert results == [] and len(calls) == 1 and calls[0].startswith('ai-worker')
+        main.run()
+        delivered = {name: (result, error) for name, result, error in results}
+        assert delivered['a'] == delivered['b'] == ('done', None)
+        assert delivered['c'][0] is None and 'division' in delivered['c'][1]
+
+        stats = executor.stats()
+        assert stats['submitted'] == 2 and stats['deduplicated'] == 1
+        assert stats['completed'] == 1 and stats['failed'] == 1
+        assert stats['queued'] == 0 and stats['running'] == 0
+
+        # 完成后相同键重新执行
+        release.clear()
+        again = executor.submit('k', _blocking_task(release, calls), lambda r, e: None)
+        assert again is not first
+        release.set()
+        again.future.result(5)
+        print("✅ 请求去重，主线程回调")
+    finally:
+        executor.shutdown(wait=True)
+
+
+def test_cancel_owner_and_queue_depth():
+    """离开页面取消排队和执行中的请求，记录队列深度"""
+    main = _MainThread()
+    executor = AIExecutor(max_workers=1, scheduler=main)
+    release, started = threading.Event(), threading.Event()
+    calls, results = [], []
+    screen, other_screen = object(), object()
+    try:
+        running = executor.submit('running', _blocking_task(release, calls, started),
+                                  lambda r, e: results.append('running'), owner=screen)
+        started.wait(5)
+        queued = [executor.submit(f'queued{i}', _blocking_task(release, calls),
+                                  lambda r, e: results.append('queued'), owner=screen) for i in range(3)]
+        shared = executor.submit('shared', _blocking_task(release, calls),
+                                 lambda r, e: results.append('shared-screen'), owner=screen)
+        executor.submit('shared', _blocking_task(release, calls),
+                        lambda r, e: results.append('shared-other'), owner=other_screen)
+        assert executor.stats()['max_queue_depth'] == 4
+
+        # 共享的请求还有其他页面在等待，不取消
+        assert executor.cancel_owner(screen) == 4
+        assert all(task.cancelled for task in [running] + queued) and not shared.cancelled
+        assert executor.stats()['queued'] == 1
+
+        release.set()
+        shared.future.result(5)
+        running.future.result(5)
+        main.run()
+
+        # 排队中的请求没有执行，执行中的请求结束后不回调
+        assert results == ['shared-other']
+        assert len(calls) == 2
+        stats = executor.stats()
+        assert stats['cancelled'] == 4 and stats['queued'] == 0 and stats['running'] == 0
+        print(f"✅ 取消请求，最大排队 {stats['max_queue_depth']}")
+    finally:
+        executor.shutdown(wait=True)
+
+
+def test_encouragement_requests_deduplicated(db_path):
+    """重复请求同一场景的鼓励只调用一次API、只保存一条记录"""
+    from services.ai_service import AIService
+
+    main = _MainThread()
+    executor = AIExecutor(max_workers=2, scheduler=main)
+    release = threading.Event()
+    try:
+        db = DatabaseManager(db_path)
+        service = AIService(db=db, executor=executor)
+        api_calls = []
+
+        def fake_call(config, prompt):
+            api_calls.append(prompt)
+            release.wait(5)
+            return '加油！'
+
+        service._call_openai_compatible = fake_call
+        service._get_api_config = lambda db: {}
+
+        results = []
+        tasks = [service.request_encouragement_async('manual_request', lambda r, e: results.append((r, e)))
+                 for _ in range(3)]
+        assert tasks[0] is tasks[1] is tasks[2]
+
+        # 学习数据变化后是新的请求
+        db.record_study(db.get_all_subjects()[0]['id'], 5)
+        newer = service.request_encouragement_async('manual_request', lambda r, e: results.append((r, e)))
+        assert newer is not tasks[0]
+
+        release.set()
+        tasks[0].future.result(5)
+        newer.future.result(5)
+        main.run()
+
+        assert len(api_calls) == 2
+        assert [r['content'] for r, e in results] == ['加油！'] * 4
+        assert len({r['id'] for r, e in results}) == 2
+        assert len(db.get_ai_encouragement_history(limit=10)) == 2
+        print("✅ 鼓励请求去重")
+    finally:
+        executor.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
@@ -0,0 +1,173 @@
+"""测试AI鼓励预生成"""
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from services.ai_executor import AIExecutor
+from services.ai_pregenerator import AIPregenerator
+from services.ai_service import AIService, AIUnavailableError
+from services.stats_snapshot import get_stats_snapshot
+
+
+def _immediate(callback, delay):
+    """测试用调度器：立即回调"""
+    callback(0)
+
+
+def _setup(db_path, studied_today=True, **kwargs):
+    """已配置API、今日进度接近目标的数据库和预生成器（API调用记录在 calls 中）"""
+    db = DatabaseManager(db_path)
+    db.save_api_config(platform_type='deepseek', api_key='test',
+                       base_url='http://127.0.0.1:9/v1', model_id='stub')
+    if studied_today:
+        target = get_stats_snapshot(db).today_progress['target']
+        db.record_study(db.get_all_subjects()[0]['id'], target - 2)
+
+    service = AIService(db=db, executor=AIExecutor(max_workers=1, scheduler=_immediate))
+    calls = []
+
+    def fake_call(config, prompt):
+        calls.append(prompt)
+        return f"预生成的鼓励{len(calls)}"
+
+    service._call_openai_compatible = fake_call
+    service.call_ai_api = lambda prompt, identity_id=None: fake_call(None, prompt)
+    kwargs.setdefault('network_check', lambda base_url: True)
+    return db, service, AIPregenerator(service, **kwargs), calls
+
+
+def test_pregenerated_reply_served_when_trigger_fires(db_path):
+    """接近目标时预生成"完成每日目标"，完成目标时直接使用，不调用API"""
+    db, service, pregenerator, calls = _setup(db_path)
+    scenes = [scene for scene, _ in pregenerator.predict()]
+    assert scenes[0] == 'daily_goal_complete' and scenes[-1] == 'manual_request'
+
+    assert pregenerator.run_once() == 'daily_goal_complete'
+    assert '今日完成：' in calls[0] and pregenerator.calls_today() == 1
+
+    # 等待使用的回复已达队列长度时不再生成
+    pregenerator.queue_size = 1
+    assert pregenerator.run_once() is None and len(calls) == 1
+
+    # 完成目标后触发
+    db.record_study(db.get_all_subjects()[0]['id'], 2)
+    result = service.request_encouragement('daily_goal_complete')
+    assert result['cached'] and result['content'] == '预生成的鼓励1' and len(calls) == 1
+
+    # 预生成的回复只直接使用一次
+    result = service.request_encouragement('daily_goal_complete')
+    assert not result['cached'] and len(calls) == 2
+    print("✅ 触发时直接使用预生成的鼓励")
+
+
+def test_pregenerated_milestone_served_async(db_path):
+    """预生成的里程碑鼓励经异步请求（刷题页触发的路径）直接使用"""
+    try:
+        db, service, pregenerator, calls = _setup(db_path, studied_today=False)
+        subject_id = db.get_all_subjects()[0]['id']
+        # 今天之前连续6天打卡，今天尚未刷题
+        for days_ago in range(1, 7):
+            db.record_study(subject_id, 3, date.today() - timedelta(days=days_ago))
+        assert get_stats_snapshot(db).streak_days == 6
+
+        scenes = [scene for scene, _ in pregenerator.predict()]
+        assert 'streak_milestone' in scenes and 'comeback' not in scenes
+        assert pregenerator.run_once() == 'streak_milestone' and len(calls) == 1
+
+        # 今天第一次刷题（题数不定）后到达里程碑
+        db.record_study(subject_id, 7)
+        assert service.check_trigger_conditions('streak_milestone') == 'streak_milestone'
+        results = []
+        task = service.request_encouragement_async('streak_milestone', lambda r, e: results.append((r, e)))
+        task.future.result(5)
+        result, error = results[0]
+        assert error is None and result['cached'] and len(calls) == 1
+        print("✅ 异步触发时直接使用预生成的里程碑鼓励")
+    finally:
+        service.executor.shutdown(wait=True)
+
+
+def test_budget_and_network(db_path):
+    """每日调用预算和网络检查"""
+    day = [date(2026, 1, 1)]
+    online = [False]
+    db, service, pregenerator, calls = _setup(
+        db_path, daily_calls=2, queue_size=3,
+        network_check=lambda base_url: online[0], today=lambda: day[0]
+    )
+
+    # 连不上API主机时不调用API
+    assert pregenerator.run_once() is None and calls == []
+    online[0] = True
+
+    # 每天最多2次
+    assert pregenerator.run_once() == 'daily_goal_complete'
+    assert pregenerator.run_once() == 'manual_request'
+    assert pregenerator.run_once() is None and len(calls) == 2
+
+    # 第二天恢复预算；预测的场景都已准备好时不再调用
+    day[0] += timedelta(days=1)
+    assert pregenerator.calls_today() == 0
+    assert pregenerator.run_once() is None and len(calls) == 2
+
+    # 最近连不上API时不预生成
+    db.update_ai_identity(db.get_all_ai_identities()[0]['id'], '新的提示词')
+    def unreachable(config, prompt):
+        raise AIUnavailableError("网络请求失败")
+
+    service._call_openai_compatible = unreachable
+    try:
+        pregenerator.run_once()
+        assert False, "应报告网络错误"
+    except AIUnavailableError:
+        pass
+    assert pregenerator.run_once() is None and pregenerator.calls_today() == 1
+    print("✅ 预算与网络检查")
+
+
+def test_identity_change_invalidates(db_path):
+    """修改身份提示词后预生成的回复失效；生成期间修改的回复丢弃"""
+    db, service, pregenerator, calls = _setup(db_path)
+    identity_id = db.get_all_ai_identities()[0]['id']
+    assert pregenerator.run_once() == 'daily_goal_complete'
+
+    db.update_ai_identity(identity_id, '新的提示词')
+    from services.ai_cache import get_response_cache
+    assert get_response_cache(db).ready_keys(identity_id) == set()
+
+    def call_while_editing(config, prompt):
+        db.update_ai_identity(identity_id, '又改了提示词')
+        return '旧提示词的鼓励'
+
+    service._call_openai_compatible = call_while_editing
+    assert pregenerator.run_once() is None
+    assert get_response_cache(db).ready_keys(identity_id) == set()
+    print("✅ 身份修改后预生成失效")
+
+
+def test_tick_only_when_idle(db_path):
+    """有操作时不预生成，空闲后在执行器中预生成"""
+    try:
+        now = [0.0]
+        db, service, pregenerator, calls = _setup(db_path, idle_seconds=30, clock=lambda: now[0])
+
+        pregenerator.note_activity()
+        now[0] = 10
+        assert pregenerator.tick(0) is None
+
+        now[0] = 40
+        task = pregenerator.tick(0)
+        task.future.result(5)
+        assert pregenerator.generated == 1 and len(calls) == 1
+        print("✅ 空闲时预生成")
+    finally:
+        service.executor.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
@@ -0,0 +1,154 @@
+"""测试AI流式响应"""
+import os
+import sys
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from services.ai_service import AIService
+from services.ai_stream import StreamAccumulator, ThrottledCallback, iter_sse_data
+
+# 第一块之后服务端的停顿（模拟模型继续生成）
+CHUNK_DELAY = 0.05
+
+
+def _chunk(**delta):
+    return 'data: ' + json.dumps({'choices': [{'index': 0, 'delta': delta}]}, ensure_ascii=False) + '\n\n'
+
+
+class _FakeSSEHandler(BaseHTTPRequestHandler):
+    """模拟OpenAI兼容的流式接口（分块发送，块之间停顿）"""
+
+    protocol_version = 'HTTP/1.1'
+    events = []
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        type(self).requests.append(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for event in type(self).events:
+            data = event.encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(CHUNK_DELAY)
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def _immediate(callback, delay):
+    """测试用调度器：立即回调"""
+    callback(0)
+
+
+def test_sse_parsing():
+    """SSE事件解析：注释、多行data、[DONE]和推理增量"""
+    lines = [': keep-alive', '', 'data: {"choices": [{"delta": {"reasoning_content": "想"}}]}', '',
+             'data: {"choices": [{"delta":', 'data:  {"content": "你好"}}]}', '',
+             'event: ping', '', 'data: [DONE]']
+    events = list(iter_sse_data(lines))
+    assert len(events) == 3
+
+    accumulator = StreamAccumulator()
+    assert [accumulator.feed(event) for event in events] == [True, True, False]
+    assert accumulator.message() == {'content': '你好', 'reasoning_content': '想'} and accumulator.done
+    print("✅ SSE解析正确")
+
+
+def test_throttled_callback():
+    """节流：间隔内的多次推送合并为一次回调，finish送出最后的文本"""
+    scheduled = []
+    now = [0.0]
+    received = []
+    throttle = ThrottledCallback(lambda c, r: received.append(c), 0.1,
+                                 scheduler=lambda cb, delay: scheduled.append((cb, delay)),
+                                 clock=lambda: now[0])
+
+    throttle.push('a', '')
+    assert [delay for _, delay in scheduled] == [0]
+    scheduled.pop()[0](0)
+    for text in ('ab', 'abc', 'abcd'):
+        throttle.push(text, '')
+    assert len(scheduled) == 1 and abs(scheduled[0][1] - 0.1) < 1e-9
+    now[0] = 0.1
+    scheduled.pop()[0](0)
+    assert received == ['a', 'abcd']
+
+    throttle.finish()
+    assert scheduled == []
+    throttle.push('abcde', '')
+    throttle.finish()
+    scheduled.pop()[0](0)
+    assert received == ['a', 'abcd', 'abcde']
+    print("✅ 界面回调节流")
+
+
+def test_stream_first_text_before_completion(db_path):
+    """流式请求：第一块文本在响应结束前送达，最终内容与完整拼接一致"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeSSEHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        pieces = ['加油', '！你已经', '坚持了', '七天', '啦～']
+        _FakeSSEHandler.events = ([_chunk(role='assistant'), _chunk(reasoning_content='用户很努力')]
+                                  + [_chunk(content=piece) for piece in pieces] + ['data: [DONE]\n\n'])
+        _FakeSSEHandler.requests = []
+
+        db = DatabaseManager(db_path)
+        db.save_api_config(platform_type='deepseek', api_key='test',
+                           base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", model_id='stub')
+        service = AIService(db=db)
+
+        partials = []
+        start = time.perf_counter()
+        content = service.stream_ai_api('鼓励一下', lambda c, r: partials.append((time.perf_counter() - start, c, r)),
+                                        scheduler=_immediate, interval=0)
+        total = time.perf_counter() - start
+
+        assert _FakeSSEHandler.requests[0]['stream'] is True
+        assert content == ''.join(pieces)
+        assert partials[0][1:] == ('', '用户很努力')
+        assert partials[-1][1] == content
+
+        # 第一段文本比完整响应早到
+        first_text = next(elapsed for elapsed, c, r in partials if c)
+        assert first_text < total - CHUNK_DELAY * (len(pieces) - 1)
+        print(f"✅ 首段文本 {first_text * 1000:.0f} ms，完整响应 {total * 1000:.0f} ms")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_stream_reasoning_only(db_path):
+    """推理模型只有reasoning_content时按非流式的规则提取回复"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeSSEHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        reply = '「今天的你比昨天更努力了，继续保持这份专注，胜利就在前方！」'
+        _FakeSSEHandler.events = [_chunk(reasoning_content='我想对用户说：'), _chunk(reasoning_content=reply),
+                                  'data: [DONE]\n\n']
+        db = DatabaseManager(db_path)
+        db.save_api_config(platform_type='deepseek', api_key='test',
+                           base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", model_id='stub')
+
+        content = AIService(db=db).stream_ai_api('鼓励一下', lambda c, r: None, scheduler=_immediate, interval=0)
+        assert content == reply.strip('「」')
+        print("✅ 推理内容提取")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
@@ -0,0 +1,89 @@
+"""测试数据库连接注册表"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from database.connection import registry
+
+
+def test_schema_initialized_once(db_path):
+    """多次创建DatabaseManager只初始化一次表结构"""
+    for _ in range(10):
+        db = DatabaseManager(db_path)
+        db.get_all_subjects()
+
+    assert registry.schema_init_count(db_path) == 1
+    print(f"✅ 表结构初始化次数: {registry.schema_init_count(db_path)}")
+
+
+def test_connection_shared_per_thread(db_path):
+    """同一线程共享连接，不同线程使用独立连接"""
+    conn_a = DatabaseManager(db_path).get_connection()
+    conn_b = DatabaseManager(db_path).get_connection()
+    assert conn_a is conn_b
+
+    other = {}
+
+    def _worker():
+        db = DatabaseManager(db_path)
+        other['conn'] = db.get_connection()
+        other['subjects'] = len(db.get_all_subjects())
+        db.close()
+
+    thread = threading.Thread(target=_worker)
+    thread.start()
+    thread.join()
+
+    assert other['conn'] is not conn_a
+    assert other['subjects'] == 3
+    assert registry.schema_init_count(db_path) == 1
+    print("✅ 连接按线程复用")
+
+
+def test_close_reopens(db_path):
+    """关闭后再次获取会重新打开连接"""
+    db = DatabaseManager(db_path)
+    first = db.get_connection()
+    db.close()
+    second = db.get_connection()
+    assert first is not second
+    assert db.get_total_count() == 0
+    print("✅ 关闭后可重新连接")
+
+
+def test_storage_profile_mismatch_rejected(db_path):
+    """同一数据库以其他存储方案打开时报错，而不是静默沿用第一次的设置"""
+    db = DatabaseManager(db_path)
+    assert db.get_connection().execute("PRAGMA synchronous").fetchone()[0] == 1
+
+    with pytest.raises(ValueError, match='durable'):
+        DatabaseManager(db_path, storage_profile='durable').get_connection()
+
+    # 其他线程同样报错
+    errors = []
+
+    def _worker():
+        try:
+            DatabaseManager(db_path, storage_profile='durable').get_connection()
+        except ValueError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=_worker)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+
+    # 重置后可以改用其他存储方案
+    registry.reset(db_path)
+    durable = DatabaseManager(db_path, storage_profile='durable')
+    assert durable.get_connection().execute("PRAGMA synchronous").fetchone()[0] == 2
+    print("✅ 存储方案不一致时报错")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
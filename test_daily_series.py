@@ -0,0 +1,110 @@
+"""测试每日题数连续序列"""
+import os
+import sys
+import random
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+
+
+def _seed(db, start, days, seed=0):
+    """随机写入一段时间的记录（约三成日期没有记录）"""
+    rng = random.Random(seed)
+    subject_ids = [s['id'] for s in db.get_all_subjects()]
+    records = [(rng.choice(subject_ids), rng.randint(1, 30), start + timedelta(days=offset))
+               for offset in range(days) for _ in range(2) if rng.random() < 0.7]
+    db.add_study_records_bulk(records)
+    return records
+
+
+def test_series_matches_records(db_path):
+    """序列与逐日求和一致，没有记录的日期为0"""
+    db = DatabaseManager(db_path)
+    start = date(2023, 1, 1)
+    records = _seed(db, start, 400)
+    subject_id = db.get_all_subjects()[1]['id']
+
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    series = db.get_daily_series(start - timedelta(days=5), start + timedelta(days=409))
+    subject_series = db.get_daily_series(start, start + timedelta(days=399), subject_id)
+    conn.set_trace_callback(None)
+    assert len(statements) == 2
+
+    assert len(series) == 415
+    assert list(series[:5]) == [0] * 5 and list(series[-10:]) == [0] * 10
+    for offset in range(400):
+        day = start + timedelta(days=offset)
+        assert series[offset + 5] == sum(c for _, c, d in records if d == day)
+        assert subject_series[offset] == sum(c for s, c, d in records if d == day and s == subject_id)
+
+    assert len(db.get_daily_series(start, start - timedelta(days=1))) == 0
+    print(f"✅ 序列长度 {len(series)}，类型 {type(series).__name__}")
+
+
+def test_stats_views_share_one_query(db_path):
+    """周、月、年、热力图视图共用一次序列查询（内存历史不可用时）"""
+    from services.stats_service import StatsService
+    from services.history_store import HistoryStore
+
+    db = DatabaseManager(db_path)
+    today = date.today()
+    records = _seed(db, today - timedelta(days=500), 501)
+
+    stats_service = StatsService(db)
+    stats_service.history = HistoryStore(db, max_bytes=0)
+
+    calls = []
+    original = db.get_daily_series
+    db.get_daily_series = lambda *args: calls.append(args) or original(*args)
+
+    weekly = stats_service.get_weekly_trend()
+    monthly = stats_service.get_monthly_trend()
+    yearly = stats_service.get_yearly_trend()
+    heatmap = stats_service.get_heatmap_data()
+    assert len(calls) == 1
+
+    def expected(day):
+        return sum(c for _, c, d in records if d == day)
+
+    week_start = today - timedelta(days=today.weekday())
+    assert weekly['total_week'] == sum(expected(week_start + timedelta(days=i)) for i in range(7))
+    assert monthly['daily_data'][today.day - 1]['count'] == expected(today)
+    assert yearly['total_year'] == sum(c for _, c, d in records if d.year == today.year)
+    assert heatmap[-1]['count'] == expected(today) and len(heatmap) == 365
+
+    # 写入后重新查询
+    db.add_study_record(db.get_all_subjects()[0]['id'], 5)
+    assert stats_service.get_weekly_trend()['total_week'] == weekly['total_week'] + 5
+    assert len(calls) == 2
+
+    # 内存历史可用时不再查询序列，结果相同
+    memory_service = StatsService(db)
+    assert memory_service.get_yearly_trend() == stats_service.get_yearly_trend()
+    assert memory_service.get_heatmap_data() == stats_service.get_heatmap_data()
+    assert len(calls) == 2
+    print("✅ 统计视图共用序列")
+
+
+def test_overview_uses_injected_db(db_path):
+    """总览统计和日期详情读取传入的数据库"""
+    from services.stats_service import StatsService
+
+    db = DatabaseManager(db_path)
+    db.record_study(db.get_all_subjects()[0]['id'], 5)
+
+    stats_service = StatsService(db)
+    overview = stats_service.get_overview_stats()
+    assert overview['total_count'] == 5 and overview['today_current'] == 5
+    assert overview['streak_days'] == 1
+    assert stats_service.get_date_detail(date.today().strftime('%Y-%m-%d'))['total_count'] == 5
+    print("✅ 总览统计使用传入的数据库")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
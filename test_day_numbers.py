@@ -0,0 +1,91 @@
+"""测试整数天编号与区间查询"""
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from database.day_numbers import day_number, day_to_date, day_to_str
+
+
+def test_day_number_conversion():
+    """天编号与日期互相转换"""
+    assert day_number(date(1970, 1, 1)) == 0
+    assert day_number('2024-01-01') == 19723
+    assert day_to_date(19723) == date(2024, 1, 1)
+    assert day_to_str(day_number('2024-02-29')) == '2024-02-29'
+    print("✅ 天编号转换正确")
+
+
+def test_raw_insert_fills_day(db_path):
+    """直接写SQL插入或修改日期时由触发器补上天编号"""
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+    subject_id = db.get_all_subjects()[0]['id']
+
+    conn.execute("INSERT INTO study_records (subject_id, count, record_date) VALUES (?, 3, '2024-05-01')",
+                 (subject_id,))
+    conn.execute("UPDATE study_records SET record_date = '2024-05-03'")
+    conn.commit()
+    assert conn.execute("SELECT day FROM study_records").fetchone()[0] == day_number('2024-05-03')
+
+    db.add_study_records_bulk([(subject_id, 2, date(2024, 5, 4))])
+    db.add_study_record(subject_id, 1, date(2024, 5, 5))
+    rows = conn.execute("SELECT record_date, day FROM study_records ORDER BY day").fetchall()
+    assert all(day_number(row['record_date']) == row['day'] for row in rows)
+    print("✅ 天编号随写入同步")
+
+
+def test_range_queries_use_covering_index(db_path):
+    """区间查询结果正确，且查询计划是覆盖索引查找"""
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+    subjects = db.get_all_subjects()
+    start = date(2024, 3, 1)
+    for offset in range(60):
+        for i, subject in enumerate(subjects):
+            db.add_study_record(subject['id'], offset + i + 1, start + timedelta(days=offset))
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    total = db.get_total_between('2024-03-10', '2024-03-19')
+    daily = db.get_daily_counts_between('2024-03-10', '2024-03-19')
+    by_subject = db.get_subject_counts_between(date(2024, 3, 10), date(2024, 3, 19))
+    conn.set_trace_callback(None)
+
+    expected = sum((offset + i + 1) for offset in range(9, 19) for i in range(len(subjects)))
+    assert total == expected
+    assert len(daily) == 10 and daily[0]['date'] == '2024-03-10'
+    assert sum(row['count'] for row in daily) == expected
+    assert sum(row['count'] for row in by_subject) == expected
+    assert by_subject[0]['name'] == subjects[-1]['name']
+
+    for sql in statements:
+        plan = ' | '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+        assert 'SEARCH study_records USING COVERING INDEX idx_study_records_day' in plan, plan
+        assert 'SCAN study_records' not in plan, plan
+    print(f"✅ {len(statements)} 条区间查询均使用覆盖索引")
+
+
+def test_clear_records_for_date(db_path):
+    """清除某天数据同时扣减科目总数和每日汇总"""
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+    subject_ids = [s['id'] for s in db.get_all_subjects()]
+    db.add_study_record(subject_ids[0], 5, date(2024, 4, 1))
+    db.add_study_record(subject_ids[0], 7, date(2024, 4, 2))
+    db.add_study_record(subject_ids[1], 3, date(2024, 4, 2))
+
+    assert db.clear_records_for_date('2024-04-02') == 10
+    totals = {s['id']: s['total_count'] for s in db.get_all_subjects()}
+    assert totals[subject_ids[0]] == 5 and totals[subject_ids[1]] == 0
+    assert [tuple(row) for row in conn.execute("SELECT record_date, total FROM daily_totals")] == \
+        [('2024-04-01', 5)]
+    print("✅ 清除指定日期数据")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
@@ -0,0 +1,174 @@
+"""测试内存学习历史"""
+import os
+import sys
+import random
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from services.history_store import HistoryStore
+
+
+def _assert_matches_sql(store, db, start, end):
+    """内存历史与SQL查询结果一致"""
+    assert list(store.daily_series(start, end)) == list(db.get_daily_series(start, end))
+    for subject in db.get_all_subjects():
+        assert list(store.daily_series(start, end, subject['id'])) == \
+            list(db.get_daily_series(start, end, subject['id']))
+
+    conn = db.get_connection()
+    rows = conn.execute("SELECT record_date, total FROM daily_totals").fetchall()
+    assert store.day_totals() == {row['record_date']: row['total'] for row in rows}
+
+
+def test_matches_sql_after_random_writes(db_path):
+    """随机写入、删除后与SQL结果一致"""
+    db = DatabaseManager(db_path)
+    store = HistoryStore(db)
+    rng = random.Random(13)
+    today = date.today()
+    start, end = today - timedelta(days=400), today + timedelta(days=30)
+
+    db.add_study_records_bulk(
+        (rng.choice([s['id'] for s in db.get_all_subjects()]), rng.randint(1, 20),
+         today - timedelta(days=rng.randint(0, 200)))
+        for _ in range(300)
+    )
+    _assert_matches_sql(store, db, start, end)
+
+    for step in range(200):
+        subject_ids = [s['id'] for s in db.get_all_subjects()]
+        action = rng.random()
+        if action < 0.5:
+            # 包括早于和晚于已加载范围的日期
+            day = today + timedelta(days=rng.randint(-380, 20))
+            db.record_study(rng.choice(subject_ids), rng.randint(1, 10), day)
+        elif action < 0.7:
+            db.add_study_records_bulk(
+                (rng.choice(subject_ids), rng.randint(1, 5), today - timedelta(days=rng.randint(0, 60)))
+                for _ in range(5)
+            )
+        elif action < 0.85:
+            db.clear_records_for_date(today - timedelta(days=rng.randint(0, 60)))
+        elif action < 0.93:
+            db.clear_subject_records(rng.choice(subject_ids))
+        elif action < 0.97:
+            subject_id = db.add_subject(f"科目{step}")
+            db.record_study(subject_id, 3, today)
+        elif len(subject_ids) > 1:
+            db.delete_subject(rng.choice(subject_ids))
+
+        if step % 20 == 0:
+            _assert_matches_sql(store, db, start, end)
+
+    _assert_matches_sql(store, db, start, end)
+    db.clear_all_records()
+    _assert_matches_sql(store, db, start, end)
+    assert store.day_totals() == {}
+    print(f"✅ 200步随机写入后一致，占用 {store.memory_bytes()} 字节")
+
+
+def test_reads_memory_without_sql(db_path):
+    """加载后读取不查询学习记录"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    db.record_study(subject_id, 5, date.today())
+    store = HistoryStore(db)
+    assert store.available
+
+    db.record_study(subject_id, 7, date.today())
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    series = store.daily_series(date.today(), date.today())
+    conn.set_trace_callback(None)
+
+    assert list(series) == [12]
+    assert not any('study_records' in sql for sql in statements)
+    print("✅ 增量更新后直接读内存")
+
+
+def test_reload_after_external_write(db_path):
+    """其他连接写入后（data_version变化）重新加载"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    db.record_study(subject_id, 5, date.today())
+    store = HistoryStore(db)
+    assert list(store.daily_series(date.today(), date.today())) == [5]
+
+    # 绕过DatabaseManager直接写入（不发布事件）
+    other = sqlite3.connect(db_path)
+    other.execute(
+        "INSERT INTO study_records (subject_id, count, record_date) VALUES (?, ?, ?)",
+        (subject_id, 4, (date.today() - timedelta(days=1)).strftime('%Y-%m-%d'))
+    )
+    other.commit()
+    other.close()
+
+    yesterday = date.today() - timedelta(days=1)
+    assert list(store.daily_series(yesterday, date.today())) == [4, 5]
+    print("✅ data_version 变化后重新加载")
+
+
+def test_unrelated_writes_keep_memory(db_path):
+    """本进程其他线程的写入不重新加载（刷题由事件增量更新）"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    db.record_study(subject_id, 5, date.today())
+    store = HistoryStore(db)
+    assert list(store.daily_series(date.today(), date.today())) == [5]
+
+    def write_in_thread():
+        other = DatabaseManager(db_path)
+        other.set_setting('theme', 'dark')
+        other.record_study(subject_id, 2, date.today())
+
+    thread = threading.Thread(target=write_in_thread)
+    thread.start()
+    thread.join()
+
+    statements = []
+    db.get_connection().set_trace_callback(statements.append)
+    assert list(store.daily_series(date.today(), date.today())) == [7]
+    db.get_connection().set_trace_callback(None)
+    assert not any('study_records' in sql for sql in statements)
+    print("✅ 本进程其他线程写入后直接读内存")
+
+
+def test_memory_budget_fallback(db_path):
+    """超出内存预算时停用，统计服务回退到SQL"""
+    from services.stats_service import StatsService
+
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    db.record_study(subject_id, 6, date.today())
+    db.record_study(subject_id, 2, date.today() - timedelta(days=3000))
+
+    store = HistoryStore(db, max_bytes=1024)
+    assert not store.available
+    assert store.daily_series(date.today(), date.today()) is None
+    assert store.day_totals() is None
+
+    stats_service = StatsService(db)
+    stats_service.history = store
+    assert stats_service.get_weekly_trend()['total_week'] == 6
+    assert len(stats_service.get_day_totals()) == 2
+
+    # 加载后因写入超出预算同样停用
+    store = HistoryStore(db, max_bytes=64 * 1024)
+    assert store.available
+    db.record_study(subject_id, 1, date.today() - timedelta(days=9000))
+    assert not store.available
+    store.max_bytes = 1024 * 1024
+    store.invalidate()
+    assert store.available
+    print("✅ 超出内存预算时回退到SQL")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
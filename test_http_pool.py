@@ -0,0 +1,88 @@
+"""测试AI平台HTTP连接池"""
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.http_pool import HttpSessionPool
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """返回固定JSON的HTTP/1.1服务"""
+
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_sessions_reused_per_platform():
+    """同一主机复用会话和连接，不同主机各自一个会话"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    pool = HttpSessionPool(pool_maxsize=2)
+    try:
+        _StubHandler.connections = 0
+        for _ in range(5):
+            assert pool.post(base_url, 'chat/completions', json={}, timeout=5).json() == {'ok': True}
+        assert _StubHandler.connections == 1
+
+        # 每次请求一个新线程（同异步鼓励），连接数不超过连接池大小
+        threads = [threading.Thread(target=pool.post, args=(base_url + '/', '/chat/completions'),
+                                    kwargs={'json': {}, 'timeout': 5}) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert _StubHandler.connections <= 2
+
+        with pool.session(base_url) as first, pool.session(base_url.upper().replace('/V1', '/v2')) as second:
+            assert first is second
+        with pool.session('https://api.example.com/v1') as other:
+            assert other is not first
+        assert pool.stats() == {f"http://127.0.0.1:{server.server_address[1]}": 0,
+                                'https://api.example.com': 0}
+        print("✅ 按平台复用keep-alive会话")
+    finally:
+        pool.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_close_waits_for_requests_in_flight():
+    """关闭时正在使用的会话在请求结束后才关闭"""
+    pool = HttpSessionPool()
+    closed = []
+
+    with pool.session('https://api.example.com/v1') as session:
+        session.close = lambda: closed.append(True)
+        pool.close()
+        assert closed == [] and pool.stats() == {}
+    assert closed == [True]
+
+    # 关闭后重新建立会话
+    with pool.session('https://api.example.com/v1') as new_session:
+        assert new_session is not session
+    pool.close()
+    print("✅ 请求结束后关闭会话")
+
+
+if __name__ == '__main__':
+    test_sessions_reused_per_platform()
+    test_close_waits_for_requests_in_flight()
@@ -0,0 +1,77 @@
+"""测试学习记录批量导入"""
+import os
+import sys
+import json
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from services.import_service import ImportService
+
+
+def _write_temp_file(suffix, content):
+    """写入临时导入文件"""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return path
+
+
+def test_import_csv_in_chunks(db_path):
+    """CSV分块导入，无效行跳过并记录原因"""
+    lines = ['date,subject,count']
+    for day in range(1, 29):
+        lines.append(f'2024-02-{day:02d},算法训练,{day}')
+        lines.append(f'2024-02-{day:02d},新科目,1')
+    lines.append('2024-02-30,算法训练,1')
+    lines.append('2024-02-01,算法训练,abc')
+    csv_path = _write_temp_file('.csv', '\n'.join(lines))
+    try:
+        db = DatabaseManager(db_path)
+        chunks = []
+        stats = ImportService(db, chunk_size=10).import_file(
+            csv_path, progress_callback=lambda s: chunks.append(s['rows'])
+        )
+
+        assert stats['rows'] == 56
+        assert stats['skipped'] == 2
+        assert len(stats['errors']) == 2
+        assert chunks == [10, 20, 30, 40, 50, 56]
+
+        subjects = {s['name']: s['total_count'] for s in db.get_all_subjects()}
+        assert subjects['算法训练'] == sum(range(1, 29))
+        assert subjects['新科目'] == 28
+        print(f"✅ CSV导入: {stats['rows']} 行，{stats['rows_per_second']:.0f} 行/秒")
+    finally:
+        os.remove(csv_path)
+
+
+def test_import_jsonl_merges_same_day(db_path):
+    """JSONL导入时同一科目同一天的记录合并"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    rows = [
+        {'record_date': '2024-03-01', 'subject_id': subject_id, 'count': 3},
+        {'record_date': '2024-03-01', 'subject_id': subject_id, 'count': 4},
+        {'record_date': '2024-03-02', 'subject_id': 9999, 'count': 1},
+    ]
+    jsonl_path = _write_temp_file('.jsonl', '\n'.join(json.dumps(r) for r in rows) + '\n\n{bad')
+
+    stats = ImportService(db).import_file(jsonl_path)
+    os.remove(jsonl_path)
+
+    assert stats['rows'] == 2
+    assert stats['skipped'] == 2
+    count = db.get_connection().execute(
+        "SELECT count FROM study_records WHERE subject_id = ? AND record_date = '2024-03-01'",
+        (subject_id,)
+    ).fetchone()[0]
+    assert count == 7
+    print("✅ JSONL导入合并同日记录")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
@@ -0,0 +1,123 @@
+"""测试数据库版本化迁移"""
+import os
+import sys
+import sqlite3
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from database.connection import registry
+from database.migrations import MIGRATIONS, SCHEMA_VERSION, get_schema_version
+
+
+def _create_legacy_database(db_path):
+    """创建没有版本号的旧版数据库"""
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE subjects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            color TEXT DEFAULT '#4A7FFF',
+            icon TEXT DEFAULT '📚',
+            total_count INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        );
+        CREATE TABLE achievements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            description TEXT,
+            type TEXT NOT NULL,
+            rarity TEXT NOT NULL,
+            condition TEXT NOT NULL,
+            icon TEXT DEFAULT '🏆',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE user_achievements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            achievement_id INTEGER NOT NULL,
+            unlocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE study_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            record_date DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO subjects (name) VALUES ('旧科目');
+        INSERT INTO study_records (subject_id, count, record_date) VALUES (1, 3, '2024-01-01');
+        INSERT INTO study_records (subject_id, count, record_date) VALUES (1, 4, '2024-01-01');
+        INSERT INTO study_records (subject_id, count, record_date) VALUES (1, 5, '2024-01-02');
+        INSERT INTO achievements (name, type, rarity, condition)
+        VALUES ('一年坚持', 'STREAK', 'LEGEND', '{"streak_days": 365}');
+        INSERT INTO achievements (name, type, rarity, condition)
+        VALUES ('全能选手', 'VERSATILE', 'GOLD', '{"all_subjects": 10}');
+        INSERT INTO achievements (name, type, rarity, condition)
+        VALUES ('疾风', 'SPEED', 'SILVER', '{"single_submit": 50}');
+        INSERT INTO user_achievements (achievement_id) VALUES (3);
+        INSERT INTO user_achievements (achievement_id) VALUES (3);
+    """)
+    conn.commit()
+    conn.close()
+
+
+def test_legacy_database_migrated(db_path):
+    """旧版数据库一次性迁移到最新版本"""
+    _create_legacy_database(db_path)
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    assert [version for version, _, _ in MIGRATIONS] == list(range(1, SCHEMA_VERSION + 1))
+
+    columns = [col[1] for col in conn.execute("PRAGMA table_info(subjects)")]
+    assert 'daily_target' in columns and 'total_target' in columns
+
+    names = {row['name']: row for row in conn.execute("SELECT * FROM achievements")}
+    assert '年度传奇' in names
+    assert '御风而行' in names
+    assert '一气呵成' in names
+    assert '全能选手' not in names
+    assert names['疾风']['repeatable'] == 1
+
+    # 同一科目同一天的重复记录已合并
+    rows = conn.execute(
+        "SELECT record_date, count FROM study_records ORDER BY record_date"
+    ).fetchall()
+    assert [tuple(row) for row in rows] == [('2024-01-01', 7), ('2024-01-02', 5)]
+    days = [row[0] for row in conn.execute("SELECT day FROM study_records ORDER BY day")]
+    assert days == [19723, 19724]
+
+    # 连续打卡段由v8生成
+    runs = conn.execute("SELECT start_date, end_date, length FROM streak_runs").fetchall()
+    assert [tuple(row) for row in runs] == [('2024-01-01', '2024-01-02', 2)]
+
+    # 同一成就的重复解锁记录已合并
+    rows = conn.execute("SELECT achievement_id, count FROM user_achievements").fetchall()
+    assert [tuple(row) for row in rows] == [(3, 2)]
+
+    # 旧库已有科目，不再插入默认科目
+    assert [s['name'] for s in db.get_all_subjects()] == ['旧科目']
+    print(f"✅ 旧版数据库已迁移到 v{SCHEMA_VERSION}")
+
+
+def test_current_database_skips_setup(db_path):
+    """已是最新版本的数据库只读取版本号"""
+    DatabaseManager(db_path)
+    registry.reset(db_path)
+
+    statements = []
+    conn = registry.get_connection(db_path)
+    conn.set_trace_callback(statements.append)
+    DatabaseManager(db_path)
+    conn.set_trace_callback(None)
+
+    assert statements == ['PRAGMA user_version']
+    print(f"✅ 最新版本数据库启动只执行: {statements}")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
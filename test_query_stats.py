@@ -0,0 +1,62 @@
+"""测试SQL查询统计"""
+import os
+import sys
+import shutil
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from database.connection import registry
+from database.instrumentation import set_profiling, profiler, normalize_sql
+
+
+def test_normalize_sql():
+    """常量替换为?，空白合并"""
+    sql = normalize_sql("SELECT *  FROM t\n WHERE name = 'a''b' AND id = 42")
+    assert sql == "SELECT * FROM t WHERE name = ? AND id = ?"
+    print(f"✅ {sql}")
+
+
+def test_query_stats_and_slow_log():
+    """开启统计后记录调用位置、行数、查询计划，并写入慢查询日志"""
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, 'profile.db')
+    saved = (profiler.slow_query_ms, profiler.explain_sample_rate, profiler.slow_log_path)
+    try:
+        set_profiling(True)
+        profiler.reset()
+        profiler.slow_query_ms = 0
+        profiler.explain_sample_rate = 1.0
+        profiler.slow_log_path = os.path.join(temp_dir, 'slow.log')
+
+        db = DatabaseManager(db_path)
+        subject_id = db.get_all_subjects()[0]['id']
+        for offset in range(5):
+            db.add_study_record(subject_id, offset + 1, date.today() - timedelta(days=offset))
+        db.get_heatmap_data()
+
+        stats = db.query_stats(limit=100)
+        heatmap = [s for s in stats if 'get_heatmap_data' in s['site']]
+        assert heatmap and heatmap[0]['site'].startswith(os.path.join('database', 'db_manager.py'))
+        assert heatmap[0]['rows'] == 5
+        assert heatmap[0]['plan'] and 'daily_totals' in heatmap[0]['plan'][0]
+
+        upsert = [s for s in stats if s['sql'].startswith('INSERT INTO study_records')]
+        assert upsert[0]['calls'] == 5
+
+        with open(profiler.slow_log_path, encoding='utf-8') as f:
+            assert 'get_heatmap_data' in f.read()
+        print(f"✅ 统计了 {len(stats)} 类语句")
+    finally:
+        set_profiling(False)
+        profiler.slow_query_ms, profiler.explain_sample_rate, profiler.slow_log_path = saved
+        profiler.reset()
+        registry.reset(db_path)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_normalize_sql()
+    test_query_stats_and_slow_log()
@@ -0,0 +1,105 @@
+"""测试学习统计快照缓存"""
+import os
+import sys
+import sqlite3
+import threading
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from services.study_service import StudyService
+from services.stats_snapshot import get_snapshot_cache
+
+
+def test_snapshot_hits_without_queries(db_path):
+    """数据没有变化时重复读取只命中缓存，不查询任何表"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    db.record_study(subject_id, 12, date.today())
+    study_service = StudyService(db=db)
+    cache = get_snapshot_cache(db)
+
+    snapshot = study_service.get_snapshot()
+    assert snapshot.total_count == 12
+    assert snapshot.today_progress['current'] == 12
+    assert snapshot.streak_days == 1
+    assert snapshot.level_info == study_service.get_level_info()
+    assert cache.stats() == {'hits': 0, 'misses': 1}
+
+    # 模拟多次切换页面
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    for _ in range(10):
+        assert study_service.get_snapshot() is snapshot
+    conn.set_trace_callback(None)
+
+    assert cache.stats() == {'hits': 10, 'misses': 1}
+    assert all(sql.strip().upper() == 'PRAGMA DATA_VERSION' for sql in statements)
+
+    # 快照不可修改
+    try:
+        snapshot.today_progress['current'] = 0
+        assert False, "快照应不可修改"
+    except TypeError:
+        pass
+    print(f"✅ 命中 {cache.hits} 次，未命中 {cache.misses} 次")
+
+
+def test_snapshot_invalidated_by_writes(db_path):
+    """本进程写入（事件）和其他连接写入（data_version）都会使快照失效"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    study_service = StudyService(db=db)
+    cache = get_snapshot_cache(db)
+
+    assert study_service.get_snapshot().total_count == 0
+
+    db.record_study(subject_id, 5, date.today())
+    assert study_service.get_snapshot().total_count == 5
+
+    db.update_user_config(daily_target=50)
+    assert study_service.get_snapshot().today_progress['target'] == 50
+
+    other = sqlite3.connect(db_path)
+    other.execute("UPDATE users SET daily_target = 10")
+    other.commit()
+    other.close()
+    snapshot = study_service.get_snapshot()
+    assert snapshot.today_progress['target'] == 10
+    assert snapshot.today_progress['percentage'] == 50
+
+    assert cache.misses == 4 and cache.hits == 0
+    print("✅ 写入后快照重新计算")
+
+
+def _in_thread(func):
+    """在其他线程（使用自己的连接）执行"""
+    thread = threading.Thread(target=func)
+    thread.start()
+    thread.join()
+
+
+def test_unrelated_writes_keep_snapshot(db_path):
+    """本进程其他线程写入设置等不影响统计的数据时仍然命中，刷题时失效"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    study_service = StudyService(db=db)
+    cache = get_snapshot_cache(db)
+    study_service.get_snapshot()
+
+    _in_thread(lambda: DatabaseManager(db_path).set_setting('theme', 'dark'))
+    study_service.get_snapshot()
+    assert cache.hits == 1 and cache.misses == 1
+
+    _in_thread(lambda: DatabaseManager(db_path).record_study(subject_id, 3))
+    assert study_service.get_snapshot().total_count == 3
+    assert cache.hits == 1 and cache.misses == 2
+    print("✅ 无关写入不使快照失效")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
@@ -0,0 +1,175 @@
+"""测试增量维护的连续打卡段（与逐日扫描算法对比）"""
+import os
+import sys
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from database.connection import registry
+
+
+def _scan_streak_days(conn):
+    """原有算法：扫描所有打卡日期计算连续天数"""
+    dates = [row[0] for row in conn.execute(
+        "SELECT DISTINCT record_date FROM study_records ORDER BY record_date DESC"
+    )]
+    if not dates:
+        return 0
+
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    date_objs = [datetime.strptime(d, '%Y-%m-%d').date() for d in dates]
+
+    if date_objs[0] == today:
+        start_date = today
+    elif date_objs[0] == yesterday:
+        start_date = yesterday
+    else:
+        return 0
+
+    streak = 1
+    for i in range(1, len(date_objs)):
+        if date_objs[i] == start_date - timedelta(days=i):
+            streak += 1
+        else:
+            break
+    return streak
+
+
+def _scan_best_streak(conn):
+    """原有算法：扫描所有打卡日期计算最佳连续天数"""
+    dates = [row[0] for row in conn.execute(
+        "SELECT DISTINCT record_date FROM study_records ORDER BY record_date"
+    )]
+    if not dates:
+        return 0
+
+    max_streak = 1
+    current_streak = 1
+    for i in range(len(dates) - 1):
+        current_date = datetime.strptime(dates[i], '%Y-%m-%d').date()
+        next_date = datetime.strptime(dates[i + 1], '%Y-%m-%d').date()
+        if (next_date - current_date).days == 1:
+            current_streak += 1
+            max_streak = max(max_streak, current_streak)
+        else:
+            current_streak = 1
+    return max_streak
+
+
+def _scan_runs(conn):
+    """逐日扫描得到所有连续打卡段 [(开始, 结束, 天数)]"""
+    dates = [datetime.strptime(row[0], '%Y-%m-%d').date() for row in conn.execute(
+        "SELECT DISTINCT record_date FROM study_records ORDER BY record_date"
+    )]
+    runs = []
+    for d in dates:
+        if runs and (d - runs[-1][1]).days == 1:
+            runs[-1][1] = d
+            runs[-1][2] += 1
+        else:
+            runs.append([d, d, 1])
+    return [(s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d'), n) for s, e, n in runs]
+
+
+def _random_history(db_path, seed, steps=150):
+    """随机写入/删除历史，每一步后对比两种算法"""
+    rng = random.Random(seed)
+    try:
+        db = DatabaseManager(db_path)
+        conn = db.get_connection()
+        subject_ids = [s['id'] for s in db.get_all_subjects()]
+        today = date.today()
+
+        for _ in range(steps):
+            action = rng.random()
+            if action < 0.55:
+                # 大多数是按时间顺序打卡，少量补录过去的日期
+                offset = rng.choice([0, 0, 1, 1, 2]) if rng.random() < 0.7 else rng.randint(0, 40)
+                db.add_study_record(rng.choice(subject_ids), rng.randint(1, 5),
+                                    today - timedelta(days=offset))
+            elif action < 0.75:
+                day = (today - timedelta(days=rng.randint(0, 40))).strftime('%Y-%m-%d')
+                conn.execute("DELETE FROM study_records WHERE record_date = ?", (day,))
+                conn.commit()
+            elif action < 0.85:
+                conn.execute("DELETE FROM study_records WHERE subject_id = ?",
+                             (rng.choice(subject_ids),))
+                conn.commit()
+            elif action < 0.88:
+                conn.execute("DELETE FROM study_records")
+                conn.commit()
+            else:
+                # 新的一段连续打卡
+                start = rng.randint(0, 40)
+                for offset in range(start, max(-1, start - rng.randint(1, 10)), -1):
+                    db.add_study_record(rng.choice(subject_ids), 1, today - timedelta(days=offset))
+
+            assert db.get_streak_days() == _scan_streak_days(conn)
+            assert db.get_best_streak() == _scan_best_streak(conn)
+            assert [(r['start_date'], r['end_date'], r['length'])
+                    for r in db.get_streak_runs()] == _scan_runs(conn)
+    finally:
+        registry.reset(db_path)
+
+
+def test_streak_matches_scan_on_random_histories(tmp_path):
+    """随机历史下增量状态与扫描算法结果一致"""
+    for seed in range(20):
+        _random_history(str(tmp_path / f'history_{seed}.db'), seed)
+    print("✅ 20组随机历史全部一致")
+
+
+def test_streak_run_queries(db_path):
+    """最佳连续段、前N段、包含指定日期的连续段"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    start = date(2024, 3, 1)
+
+    # 三段：3月1-5日、3月8-9日、3月12-18日
+    for first, days in ((0, 5), (7, 2), (11, 7)):
+        for offset in range(first, first + days):
+            db.add_study_record(subject_id, 1, start + timedelta(days=offset))
+
+    best = db.get_best_streak_run()
+    assert (best['start_date'], best['end_date'], best['length']) == ('2024-03-12', '2024-03-18', 7)
+    assert [r['length'] for r in db.get_top_streak_runs(2)] == [7, 5]
+    assert db.get_streak_run_containing(date(2024, 3, 9))['start_date'] == '2024-03-08'
+    assert db.get_streak_run_containing('2024-03-10') is None
+    assert len(db.get_streak_runs(min_length=3)) == 2
+
+    # 删除中间一天，连续段被拆开
+    db.get_connection().execute("DELETE FROM study_records WHERE record_date = '2024-03-15'")
+    db.get_connection().commit()
+    assert [r['length'] for r in db.get_top_streak_runs(3)] == [5, 3, 3]
+    print("✅ 连续打卡段查询正确")
+
+
+def test_streak_fast_path_does_not_rescan(db_path):
+    """按时间顺序打卡时读取连续天数不需要重算"""
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+    subject_id = db.get_all_subjects()[0]['id']
+    today = date.today()
+
+    for offset in range(30, -1, -1):
+        db.add_study_record(subject_id, 1, today - timedelta(days=offset))
+    assert db.get_streak_days() == 31
+
+    db.add_study_record(subject_id, 1, today)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert db.get_streak_days() == 31
+    assert db.get_best_streak() == 31
+    conn.set_trace_callback(None)
+
+    assert not any('daily_totals' in stmt for stmt in statements)
+    print(f"✅ 读取连续天数执行语句: {len(statements)}")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
@@ -0,0 +1,150 @@
+"""测试学习记录写入"""
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import db_manager
+from database.db_manager import DatabaseManager
+
+
+def test_upsert_returns_totals(db_path):
+    """同一天多次添加合并为一行，并返回科目当天题数和总数"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+
+    first = db.record_study(subject_id, 3)
+    second = db.record_study(subject_id, 2)
+
+    assert first['record_id'] == second['record_id']
+    assert second['day_count'] == 5
+    assert second['subject_total'] == 5
+
+    rows = db.get_connection().execute("SELECT COUNT(*) FROM study_records").fetchone()[0]
+    assert rows == 1
+    print(f"✅ UPSERT结果: {second}")
+
+
+def test_single_commit_per_record(db_path):
+    """每次添加只执行两条语句和一次提交"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    db.add_study_record(subject_id, 1, date(2024, 5, 1))
+    conn.set_trace_callback(None)
+
+    assert statements.count('COMMIT') == 1
+    assert not any(stmt.lstrip().upper().startswith('SELECT') for stmt in statements)
+    print(f"✅ 单次添加执行语句数: {len(statements)}")
+
+
+def _daily_totals(conn):
+    """读取每日汇总表"""
+    rows = conn.execute(
+        "SELECT record_date, total, subjects_touched FROM daily_totals ORDER BY record_date"
+    ).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def _expected_daily_totals(conn):
+    """从原始记录计算每日汇总"""
+    rows = conn.execute("""
+        SELECT record_date, SUM(count), COUNT(*) FROM study_records
+        GROUP BY record_date ORDER BY record_date
+    """).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def test_daily_totals_follow_writes(db_path):
+    """每日汇总随新增、累加和删除同步更新"""
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+    subject_ids = [s['id'] for s in db.get_all_subjects()]
+
+    db.add_study_record(subject_ids[0], 3, date(2024, 5, 1))
+    db.add_study_record(subject_ids[1], 4, date(2024, 5, 1))
+    db.add_study_record(subject_ids[0], 2, date(2024, 5, 1))
+    db.add_study_record(subject_ids[2], 6, date(2024, 5, 2))
+    assert _daily_totals(conn) == [('2024-05-01', 9, 2), ('2024-05-02', 6, 1)]
+
+    # 设置页面的清除操作直接删除原始记录
+    conn.execute("DELETE FROM study_records WHERE record_date = '2024-05-02'")
+    conn.execute("DELETE FROM study_records WHERE subject_id = ?", (subject_ids[1],))
+    conn.commit()
+    assert _daily_totals(conn) == [('2024-05-01', 5, 1)]
+    assert _daily_totals(conn) == _expected_daily_totals(conn)
+    print("✅ 每日汇总与原始记录一致")
+
+
+def test_rebuild_daily_totals(db_path):
+    """重建命令根据原始记录恢复每日汇总"""
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+    subject_id = db.get_all_subjects()[0]['id']
+    for day in range(1, 11):
+        db.add_study_record(subject_id, day, date(2024, 6, day))
+
+    conn.execute("DELETE FROM daily_totals")
+    conn.commit()
+    assert db.rebuild_daily_totals() == 10
+    assert _daily_totals(conn) == _expected_daily_totals(conn)
+    assert db.get_today_progress()['current'] == 0
+    print("✅ 每日汇总重建完成")
+
+
+def test_bulk_insert_single_transaction(db_path):
+    """批量写入只提交一次，科目总数与逐条写入一致"""
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+    subject_ids = [s['id'] for s in db.get_all_subjects()]
+
+    records = [(subject_ids[i % 3], i % 7 + 1, date(2024, 1, 1 + i % 28)) for i in range(300)]
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    result = db.add_study_records_bulk(iter(records))
+    conn.set_trace_callback(None)
+
+    assert result == {'rows': 300, 'subjects': 3}
+    assert statements.count('COMMIT') == 1
+    # 每个科目的总数只更新一次
+    assert sum('UPDATE subjects' in stmt for stmt in statements) == 3
+
+    for subject in db.get_all_subjects():
+        expected = sum(count for sid, count, _ in records if sid == subject['id'])
+        assert subject['total_count'] == expected
+    assert _daily_totals(conn) == _expected_daily_totals(conn)
+    print(f"✅ 批量写入: {result}")
+
+
+def test_fallback_without_returning(db_path):
+    """SQLite早于3.35（没有RETURNING和UPDATE ... FROM）时结果相同"""
+    saved = db_manager.SQLITE_RETURNING, db_manager.SQLITE_UPDATE_FROM
+    db_manager.SQLITE_RETURNING = db_manager.SQLITE_UPDATE_FROM = False
+    try:
+        db = DatabaseManager(db_path)
+        subject_ids = [s['id'] for s in db.get_all_subjects()]
+
+        first = db.record_study(subject_ids[0], 3, date(2024, 5, 1))
+        second = db.record_study(subject_ids[0], 2, date(2024, 5, 1))
+        db.record_study(subject_ids[1], 4, date(2024, 5, 1))
+        db.record_study(subject_ids[1], 6, date(2024, 5, 2))
+        assert first['record_id'] == second['record_id']
+        assert second == {'record_id': first['record_id'], 'day_count': 5, 'subject_total': 5}
+
+        assert db.clear_records_for_date(date(2024, 5, 1)) == 9
+        totals = {s['id']: s['total_count'] for s in db.get_all_subjects()}
+        assert totals[subject_ids[0]] == 0 and totals[subject_ids[1]] == 6
+        print("✅ 旧版SQLite回退路径结果一致")
+    finally:
+        db_manager.SQLITE_RETURNING, db_manager.SQLITE_UPDATE_FROM = saved
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
@@ -0,0 +1,151 @@
+"""测试"+1"点击合并写入缓冲"""
+import gc
+import os
+import sys
+import weakref
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from services import tap_buffer
+from services.tap_buffer import TapBuffer
+
+
+class _ManualScheduler:
+    """手动触发的调度器（代替Kivy Clock）"""
+
+    class _Event:
+        def __init__(self, callback):
+            self.callback = callback
+            self.cancelled = False
+
+        def cancel(self):
+            self.cancelled = True
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, callback, delay):
+        event = self._Event(callback)
+        self.events.append(event)
+        return event
+
+    def fire(self):
+        """触发最近一个未取消的定时回调"""
+        active = [e for e in self.events if not e.cancelled]
+        assert len(active) == 1
+        active[0].cancelled = True
+        active[0].callback(0)
+
+
+def test_taps_coalesce_into_one_commit(db_path):
+    """连续N次点击只产生一次提交"""
+    db = DatabaseManager(db_path)
+    conn = db.get_connection()
+    subject_ids = [s['id'] for s in db.get_all_subjects()]
+    scheduler = _ManualScheduler()
+    flushed = []
+    buffer = TapBuffer(db, scheduler=scheduler, on_flush=flushed.append)
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    for i in range(50):
+        buffer.add(subject_ids[i % 2])
+    assert statements == []
+    assert buffer.pending_count() == 50
+    assert buffer.pending_count(subject_ids[0]) == 25
+
+    scheduler.fire()
+    conn.set_trace_callback(None)
+
+    assert statements.count('COMMIT') == 1
+    assert buffer.pending_count() == 0
+    assert len(flushed) == 1
+    assert db.get_today_progress()['current'] == 50
+    assert db.get_subject_today_progress(subject_ids[0])['current'] == 25
+    print(f"✅ 50次点击 -> {statements.count('COMMIT')} 次提交")
+
+
+def test_failed_flush_keeps_taps(db_path):
+    """写入失败时点击保留在缓冲中，下次写入成功"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    buffer = TapBuffer(db, scheduler=_ManualScheduler())
+
+    original = db.add_study_records_bulk
+
+    def _failing_bulk(records):
+        raise Exception("磁盘已满")
+
+    db.add_study_records_bulk = _failing_bulk
+    for _ in range(5):
+        buffer.add(subject_id)
+    assert buffer.flush() is None
+    assert buffer.pending_count() == 5
+
+    db.add_study_records_bulk = original
+    assert sum(buffer.flush().values()) == 5
+    assert buffer.pending_count() == 0
+    assert buffer.flush() is None
+    assert db.get_today_progress()['current'] == 5
+    print("✅ 写入失败后点击未丢失")
+
+
+def test_failed_flush_retries(db_path):
+    """空闲写入失败后重新计时，到期时重试写入"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    scheduler = _ManualScheduler()
+    flushed = []
+    buffer = TapBuffer(db, scheduler=scheduler, on_flush=flushed.append)
+
+    original = db.add_study_records_bulk
+    failures = []
+
+    def _locked_once(records):
+        db.add_study_records_bulk = original
+        failures.append(list(records))
+        raise Exception("database is locked")
+
+    db.add_study_records_bulk = _locked_once
+    for _ in range(3):
+        buffer.add(subject_id)
+    scheduler.fire()
+    assert len(failures) == 1 and buffer.pending_count() == 3 and flushed == []
+
+    # 没有新的点击，重试也会写入
+    scheduler.fire()
+    assert buffer.pending_count() == 0 and sum(flushed[0].values()) == 3
+    assert db.get_today_progress()['current'] == 3
+    assert not any(not e.cancelled for e in scheduler.events)
+    print("✅ 写入失败后自动重试")
+
+
+def test_exit_hook_does_not_keep_buffers(db_path):
+    """退出时写入所有未关闭缓冲的点击；重新创建的缓冲可以被回收"""
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    flushed = []
+    live = TapBuffer(db, scheduler=_ManualScheduler(), on_flush=flushed.append)
+    live.add(subject_id, 2)
+
+    closed = TapBuffer(db, scheduler=_ManualScheduler())
+    closed.add(subject_id, 1)
+    closed.close()
+    assert closed not in tap_buffer._live_buffers
+
+    dropped = weakref.ref(TapBuffer(db, scheduler=_ManualScheduler()))
+    gc.collect()
+    assert dropped() is None
+
+    tap_buffer._flush_all()
+    assert live.pending_count() == 0 and flushed == []
+    assert db.get_today_progress()['current'] == 3
+    live.close()
+    print("✅ 退出时写入剩余点击，缓冲可回收")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
@@ -0,0 +1,90 @@
+"""测试点击速率型速度成就"""
+import os
+import sys
+import random
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_manager import DatabaseManager
+from services.tap_rate import RateWindow, TapRateTracker
+
+
+class _Clock:
+    """手动推进的时钟"""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_window_matches_rescan():
+    """窗口累计和与重新扫描全部点击的结果一致"""
+    rng = random.Random(20)
+    window = RateWindow(600)
+    taps = []
+    now = 0.0
+    for _ in range(5000):
+        now += rng.expovariate(1 / 30)
+        count = rng.choice([1, 1, 1, 5, 10])
+        before, after = window.add(now, count)
+        taps.append((now, count))
+        expected = sum(c for t, c in taps if t > now - 600)
+        assert after == expected and before == expected - count
+    print(f"✅ {len(taps)} 次点击窗口题数一致")
+
+
+def test_rate_achievements_unlock_on_crossing(db_path):
+    """窗口内题数越过阈值时解锁，会话压缩保存并在重启后恢复"""
+    from services.achievement_service import AchievementService
+
+    db = DatabaseManager(db_path)
+    subject_id = db.get_all_subjects()[0]['id']
+    service = AchievementService(db)
+    clock = _Clock()
+    service.tap_rate.clock = clock
+    assert service.rules.rate_windows() == [600, 1800]
+
+    # 每10秒一题：第30题解锁"10分钟30题"
+    unlocked = []
+    for _ in range(40):
+        clock.now += 10
+        unlocked += [a['name'] for a in service.record_tap(subject_id)]
+    assert unlocked == ['一气呵成']
+
+    # 休息15分钟（开始新会话），再次越过阈值时可重复解锁
+    clock.now += 900
+    unlocked = []
+    for _ in range(30):
+        clock.now += 10
+        unlocked += service.record_tap(subject_id)
+    assert [(a['name'], a['count']) for a in unlocked] == [('一气呵成', 2)]
+
+    # 一次提交也计入窗口
+    assert [a['name'] for a in service.record_tap(subject_id, 30)] == ['势如破竹']
+
+    # 每个会话保存为一行，点击序列每次8字节
+    service.tap_rate.save_sessions()
+    rows = db.get_connection().execute("SELECT questions_completed, taps FROM study_sessions ORDER BY id")
+    assert [(row[0], len(row[1])) for row in rows] == [(40, 40 * 8), (60, 31 * 8)]
+
+    # 重启后从两个会话恢复窗口，并继续未结束的会话
+    restarted = TapRateTracker(db, clock=clock)
+    restarted.set_windows([600, 1800])
+    clock.now += 10
+    assert restarted.add(subject_id) == {600: (60, 61), 1800: (100, 101)}
+
+    # 停止超过会话间隔后开始新会话
+    clock.now += 3600
+    restarted.add(subject_id)
+    restarted.save_sessions()
+    rows = db.get_connection().execute("SELECT questions_completed FROM study_sessions ORDER BY id")
+    assert [row[0] for row in rows] == [40, 61, 1]
+    print("✅ 速率型成就按窗口解锁")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-s']))
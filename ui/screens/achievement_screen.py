@@ -107,8 +107,8 @@ class AchievementScreen(MDScreen):
         # 清空现有成就
         self.achievement_grid.clear_widgets()
         
-        # 获取成就数据
-        achievements_data = self.achievement_service.get_all_achievements()
+        # 获取成就数据（含进度和解锁次数）
+        achievements_data = self.achievement_service.get_all_achievement_progress()
         
         # 根据筛选显示
         if self.current_filter == 'all':
@@ -165,15 +165,8 @@ class AchievementScreen(MDScreen):
         
         # 如果已解锁且是可重复成就，显示计数
         if is_unlocked and achievement.get('repeatable', False):
-            # 获取计数
-            from database.db_manager import DatabaseManager
-            db = DatabaseManager()
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT count FROM user_achievements WHERE achievement_id = ?", (achievement['id'],))
-            result = cursor.fetchone()
-            if result and result['count'] > 1:
-                name_text = f"{achievement['name']} ×{result['count']}"
+            if achievement.get('count', 0) > 1:
+                name_text = f"{achievement['name']} ×{achievement['count']}"
         
         name = MDLabel(
             text=name_text,
@@ -206,7 +199,7 @@ class AchievementScreen(MDScreen):
             card.add_widget(time_label)
         else:
             # 显示进度
-            progress_info = self.achievement_service.get_achievement_progress(achievement['id'])
+            progress_info = achievement.get('progress')
             if progress_info and progress_info['target'] > 0:
                 progress_text = f"进度: {progress_info['current']}/{progress_info['target']}"
                 progress_label = MDLabel(
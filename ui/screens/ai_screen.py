@@ -11,6 +11,7 @@ from kivy.uix.label import Label  # 使用Kivy原生Label
 from kivy.metrics import dp
 
 from services.ai_service import AIService
+from services.ai_pregenerator import get_pregenerator
 from utils.date_helper import format_relative_time
 from datetime import datetime
 
@@ -229,6 +230,7 @@ class AIScreen(MDScreen):
         content.bind(texture_size=update_text_height)
         
         card.add_widget(content)
+        card.content_label = content
         
         # 动态计算卡片高度
         def update_card_height(instance, height):
@@ -355,6 +357,8 @@ class AIScreen(MDScreen):
     def select_identity(self, identity_id):
         """选择AI身份"""
         self.current_identity_id = identity_id
+        # 空闲时为选中的身份预生成鼓励
+        get_pregenerator(self.ai_service.db).identity_id = identity_id
         self.load_identities()  # 刷新显示
         
         # 获取身份名称
@@ -591,10 +595,25 @@ class AIScreen(MDScreen):
         # 显示加载提示
         print("[INFO] AI正在思考中...")
         
+        # 流式显示的临时卡片（放在历史最上方）
+        identity = next((i for i in self.ai_service.db.get_all_ai_identities()
+                         if i['id'] == self.current_identity_id), None)
+        streaming_card = self.create_encouragement_card({
+            'identity_name': identity['name'] if identity else 'AI',
+            'created_at': datetime.now().isoformat(),
+            'content': '思考中...'
+        })
+        self.history_layout.add_widget(streaming_card, index=len(self.history_layout.children))
+        
+        def on_partial(content, reasoning):
+            # 推理模型先输出思考过程，只显示最近一段
+            streaming_card.content_label.text = content or f"思考中...\n{reasoning[-120:]}"
+        
         # 异步请求（使用当前选中的身份）
         def callback(result, error):
             if error:
                 print(f"[ERROR] 请求失败: {error}")
+                streaming_card.content_label.text = f"请求失败: {error}"
             else:
                 print("[OK] 收到AI鼓励！")
                 self.load_history()
@@ -603,7 +622,9 @@ class AIScreen(MDScreen):
             self.ai_service.request_encouragement_async(
                 trigger_scene='manual_request',
                 callback=callback,
-                identity_id=self.current_identity_id  # 使用当前选中的身份
+                identity_id=self.current_identity_id,  # 使用当前选中的身份
+                on_partial=on_partial,
+                owner=self
             )
         except Exception as e:
             print(f"[WARN] 未配置API: {str(e)}")
@@ -611,3 +632,7 @@ class AIScreen(MDScreen):
     def on_enter(self):
         """进入页面时刷新"""
         self.load_history()
+    
+    def on_leave(self, *args):
+        """离开页面时取消尚未返回的请求"""
+        self.ai_service.executor.cancel_owner(self)
@@ -95,7 +95,7 @@ class HomeScreen(MDScreen):
         card.add_widget(subtitle)
         
         # 大数字
-        level_info = self.study_service.get_level_info()
+        level_info = self.study_service.get_snapshot().level_info
         self.total_label = MDLabel(
             text=f"{level_info['total_count']:,}",
             font_style="H2",
@@ -145,7 +145,7 @@ class HomeScreen(MDScreen):
         title_layout.add_widget(title)
         
         # 进度百分比
-        today_progress = self.study_service.get_today_progress()
+        today_progress = self.study_service.get_snapshot().today_progress
         self.progress_percent = MDLabel(
             text=f"{today_progress['percentage']}%",
             font_style="H6",
@@ -226,7 +226,7 @@ class HomeScreen(MDScreen):
             spacing=dp(5)
         )
         
-        streak_days = self.study_service.get_streak_days()
+        streak_days = self.study_service.get_snapshot().streak_days
         
         streak_title = MDLabel(
             text=f"连续打卡: {streak_days}天",
@@ -253,7 +253,7 @@ class HomeScreen(MDScreen):
         self.progress_bg_rect.pos = instance.pos
         self.progress_bg_rect.size = instance.size
         
-        today_progress = self.study_service.get_today_progress()
+        today_progress = self.study_service.get_snapshot().today_progress
         width = instance.width * (today_progress['percentage'] / 100)
         self.progress_fg_rect.pos = instance.pos
         self.progress_fg_rect.size = (width, instance.height)
@@ -270,13 +270,15 @@ class HomeScreen(MDScreen):
         self.refresh_data()
     
     def refresh_data(self):
-        """刷新数据"""
+        """刷新数据（数据没有变化时使用缓存的快照，不查询数据库）"""
+        snapshot = self.study_service.get_snapshot()
+        
         # 刷新总题量
-        level_info = self.study_service.get_level_info()
+        level_info = snapshot.level_info
         self.total_label.text = f"{level_info['total_count']:,}"
         
         # 刷新今日进度
-        today_progress = self.study_service.get_today_progress()
+        today_progress = snapshot.today_progress
         self.progress_percent.text = f"{today_progress['percentage']}%"
         self.progress_text.text = f"{today_progress['current']}/{today_progress['target']} 题"
         
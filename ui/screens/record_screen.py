@@ -13,10 +13,13 @@ from kivy.metrics import dp
 from kivy.animation import Animation
 from kivy.clock import Clock
 import random
+from datetime import date
 
 from services.study_service import StudyService
 from services.achievement_service import AchievementService
 from services.ai_service import AIService
+from services.ai_pregenerator import get_pregenerator
+from services.tap_buffer import TapBuffer
 from ui.components.achievement_animation import show_achievement_unlock
 
 
@@ -31,6 +34,12 @@ class RecordScreen(MDScreen):
         self.study_service = StudyService()
         self.achievement_service = AchievementService()
         self.ai_service = AIService()
+        self.ai_pregenerator = get_pregenerator(self.ai_service.db)
+        # 今天已触发过的AI鼓励场景 (日期, 场景集合)
+        self._ai_triggered = (None, set())
+        
+        # "+1"点击缓冲（停止点击后合并写入）
+        self.tap_buffer = TapBuffer(on_flush=self.on_taps_flushed)
         
         # 动态加载当前科目（取第一个科目）
         from database.db_manager import DatabaseManager
@@ -91,17 +100,12 @@ class RecordScreen(MDScreen):
         quick_buttons = self.create_quick_buttons()
         content_layout.add_widget(quick_buttons)
         
-        # 今日目标提示
-        from database.db_manager import DatabaseManager
-        db = DatabaseManager()
-        user_config = db.get_user_config()
-        daily_target = user_config.get('daily_target', 20)
-        
-        # 获取今日已完成数
-        from services.study_service import StudyService
-        study_service = StudyService()
-        today_progress = study_service.get_today_progress()
+        # 今日目标提示（今日已完成数和每日目标）
+        today_progress = self.study_service.get_snapshot().today_progress
+        daily_target = today_progress.get('target', 20)
         today_count = today_progress.get('current', 0)
+        self.daily_target = daily_target
+        self.today_saved_count = today_count
         
         self.achievement_hint = MDLabel(
             text=f'今日目标：{today_count}/{daily_target}题  继续加油！💪',
@@ -146,6 +150,8 @@ class RecordScreen(MDScreen):
             progress = db.get_subject_today_progress(self.current_subject_id)
         else:
             progress = {'current': 0, 'target': 20, 'percentage': 0}
+        self.subject_target = progress['target']
+        self.subject_saved_count = progress['current']
         
         # 标题行
         title_layout = BoxLayout(
@@ -318,8 +324,20 @@ class RecordScreen(MDScreen):
         self.refresh_progress()
     
     def on_plus_one_click(self, *args):
-        """点击+1按钮"""
-        self.add_count(1)
+        """点击+1按钮（先记入缓冲并立即更新显示，停止点击后合并写入）"""
+        if self.current_subject_id is None:
+            print("[WARN] 请先在设置页面添加科目")
+            return
+        
+        self.tap_buffer.add(self.current_subject_id, 1)
+        self.ai_pregenerator.note_activity()
+        self.render_progress()
+        self.render_daily_hint()
+        
+        # 速率型速度成就（只判断最近时间窗口内的题数，不查询历史）
+        newly_unlocked = self.achievement_service.record_tap(self.current_subject_id, 1)
+        if newly_unlocked:
+            self.show_achievement_dialog(newly_unlocked[0])
         
         # 按钮动画（使用opacity替代scale）
         try:
@@ -342,6 +360,10 @@ class RecordScreen(MDScreen):
             print("[WARN] 请先在设置页面添加科目")
             return
         
+        # 先写入缓冲中的点击，保证成就检查基于完整数据
+        self.tap_buffer.flush(notify=False)
+        self.ai_pregenerator.note_activity()
+        
         # 添加记录
         result = self.study_service.add_record(self.current_subject_id, count)
         
@@ -354,20 +376,26 @@ class RecordScreen(MDScreen):
         # 获取全局进度用于AI和成就检查
         today_progress = result['today_progress']
         
-        # 检查成就
+        # 检查成就（本次写入影响到的类型，包括单次提交和速率型的速度成就）
         newly_unlocked = self.achievement_service.check_achievements()
+        newly_unlocked += self.achievement_service.record_tap(self.current_subject_id, count)
         if newly_unlocked:
             self.show_achievement_dialog(newly_unlocked[0])
         
-        # 检查速度成就
-        if count >= 50:
-            speed_achievements = self.achievement_service.check_speed_achievement(count)
-            if speed_achievements:
-                self.show_achievement_dialog(speed_achievements[0])
-        
         # 检查AI触发
         self.check_ai_trigger(today_progress)
     
+    def on_taps_flushed(self, batch):
+        """缓冲的点击写入数据库后：刷新显示并检查成就和AI触发"""
+        self.refresh_progress()
+        self.update_daily_hint()
+        
+        newly_unlocked = self.achievement_service.check_achievements()
+        if newly_unlocked:
+            self.show_achievement_dialog(newly_unlocked[0])
+        
+        self.check_ai_trigger(self.study_service.get_snapshot().today_progress)
+    
     def create_particle_effect(self):
         """创建粒子特效"""
         # 简化版粒子效果
@@ -471,17 +499,52 @@ class RecordScreen(MDScreen):
         show_achievement_unlock(achievement)
     
     def check_ai_trigger(self, today_progress):
-        """检查AI触发"""
+        """检查AI触发（每个场景每天最多一次）"""
+        event_types = ['streak_milestone']
         # 完成每日目标
         if today_progress['current'] >= today_progress['target']:
-            trigger_scene = self.ai_service.check_trigger_conditions('daily_goal_complete')
+            event_types.insert(0, 'daily_goal_complete')
+        
+        today = date.today()
+        if self._ai_triggered[0] != today:
+            self._ai_triggered = (today, set())
+        
+        for event_type in event_types:
+            if event_type in self._ai_triggered[1]:
+                continue
+            trigger_scene = self.ai_service.check_trigger_conditions(event_type)
             if trigger_scene:
+                self._ai_triggered[1].add(trigger_scene)
                 self.request_ai_encouragement(trigger_scene)
+                break
     
     def request_ai_encouragement(self, trigger_scene):
-        """请求AI鼓励"""
-        # 这里简化处理，实际应该异步调用
-        pass
+        """请求AI鼓励（空闲时预生成的鼓励直接命中缓存，不等待API）"""
+        def callback(result, error):
+            if error:
+                print(f"[WARN] AI鼓励请求失败: {error}")
+            elif result:
+                self.show_ai_encouragement(result['content'])
+        
+        try:
+            self.ai_service.request_encouragement_async(
+                trigger_scene=trigger_scene,
+                callback=callback,
+                identity_id=self.ai_pregenerator.identity_id
+            )
+        except Exception as e:
+            print(f"[WARN] 未配置API: {str(e)}")
+    
+    def show_ai_encouragement(self, content):
+        """显示AI鼓励"""
+        dialog = MDDialog(
+            title="AI鼓励",
+            text=content,
+            buttons=[
+                MDFlatButton(text="好的", on_release=lambda x: dialog.dismiss())
+            ]
+        )
+        dialog.open()
     
     def on_enter(self):
         """进入页面时刷新"""
@@ -505,6 +568,11 @@ class RecordScreen(MDScreen):
         # 2. 刷新今日进度
         self.refresh_progress()
     
+    def on_pre_leave(self, *args):
+        """离开页面前写入缓冲中的点击，保存学习会话"""
+        self.tap_buffer.flush()
+        self.achievement_service.tap_rate.save_sessions()
+    
     def refresh_progress(self):
         """刷新当前科目的进度显示"""
         from database.db_manager import DatabaseManager
@@ -512,24 +580,35 @@ class RecordScreen(MDScreen):
         
         if self.current_subject_id:
             progress = db.get_subject_today_progress(self.current_subject_id)
-            self.target_label.text = f"目标: {progress['target']}题"
-            self.progress_label.text = f"已完成: {progress['current']}题"
+            self.subject_target = progress['target']
+            self.subject_saved_count = progress['current']
         else:
-            self.target_label.text = "目标: 20题"
-            self.progress_label.text = "已完成: 0题"
+            self.subject_target = 20
+            self.subject_saved_count = 0
+        
+        self.render_progress()
+    
+    def render_progress(self):
+        """显示当前科目进度（已写入的题数加上缓冲中的点击）"""
+        current = self.subject_saved_count
+        if self.current_subject_id:
+            current += self.tap_buffer.pending_count(self.current_subject_id)
+        
+        self.target_label.text = f"目标: {self.subject_target}题"
+        self.progress_label.text = f"已完成: {current}题"
     
     def update_daily_hint(self):
         """更新今日目标提示"""
-        from database.db_manager import DatabaseManager
-        from services.study_service import StudyService
-        
-        db = DatabaseManager()
-        user_config = db.get_user_config()
-        daily_target = user_config.get('daily_target', 20)
+        today_progress = self.study_service.get_snapshot().today_progress
+        self.daily_target = today_progress.get('target', 20)
+        self.today_saved_count = today_progress.get('current', 0)
         
-        study_service = StudyService()
-        today_progress = study_service.get_today_progress()
-        today_count = today_progress.get('current', 0)
+        self.render_daily_hint()
+    
+    def render_daily_hint(self):
+        """显示今日目标提示（已写入的题数加上缓冲中的点击）"""
+        daily_target = self.daily_target
+        today_count = self.today_saved_count + self.tap_buffer.pending_count()
         
         # 更新提示文本
         if today_count >= daily_target:
@@ -70,6 +70,11 @@ class SettingsScreen(MDScreen):
         ai_card = self.create_ai_config_card()
         main_layout.add_widget(ai_card)
         
+        # 查询性能统计卡片（仅开启统计时显示）
+        from database.instrumentation import is_profiling_enabled
+        if is_profiling_enabled():
+            main_layout.add_widget(self.create_query_stats_card())
+        
         # 数据管理卡片（危险操作，放最后）
         data_card = self.create_data_management_card()
         main_layout.add_widget(data_card)
@@ -345,6 +350,78 @@ class SettingsScreen(MDScreen):
         
         return card
     
+    def create_query_stats_card(self):
+        """创建查询性能统计卡片"""
+        card = MDCard(
+            orientation='vertical',
+            size_hint=(1, None),
+            height=dp(150),
+            padding=dp(20),
+            radius=[dp(15)]
+        )
+        
+        title = MDLabel(
+            text="🛠️ 查询性能统计",
+            font_style="Subtitle1",
+            size_hint_y=None,
+            height=dp(30)
+        )
+        card.add_widget(title)
+        
+        desc = MDLabel(
+            text="查看本次运行中耗时最多的SQL语句",
+            font_style="Caption",
+            theme_text_color="Hint",
+            size_hint_y=None,
+            height=dp(40)
+        )
+        card.add_widget(desc)
+        
+        stats_btn = MDRaisedButton(
+            text="查看统计",
+            size_hint=(1, None),
+            height=dp(50),
+            on_release=self.show_query_stats_dialog
+        )
+        card.add_widget(stats_btn)
+        
+        return card
+    
+    def show_query_stats_dialog(self, *args):
+        """显示耗时最多的SQL语句"""
+        stats = self.db.query_stats(limit=10)
+        
+        if stats:
+            lines = []
+            for stat in stats:
+                lines.append(
+                    f"{stat['total_ms']:.1f}ms / {stat['calls']}次 / 最长{stat['max_ms']:.1f}ms\n"
+                    f"{stat['site']}\n{stat['sql'][:80]}"
+                )
+            text = "\n\n".join(lines)
+        else:
+            text = "暂无统计数据"
+        
+        content = BoxLayout(size_hint_y=None, height=dp(400))
+        scroll = MDScrollView()
+        label = MDLabel(text=text, font_style="Caption", size_hint_y=None)
+        label.bind(texture_size=lambda instance, size: setattr(instance, 'height', size[1]))
+        scroll.add_widget(label)
+        content.add_widget(scroll)
+        
+        stats_dialog = MDDialog(
+            title="查询性能统计（按总耗时）",
+            type="custom",
+            content_cls=content,
+            buttons=[
+                MDRaisedButton(
+                    text="确定",
+                    on_release=lambda x: stats_dialog.dismiss()
+                )
+            ]
+        )
+        stats_dialog.open()
+    
     def create_data_management_card(self):
         """创建数据管理卡片"""
         card = MDCard(
@@ -919,6 +996,10 @@ class SettingsScreen(MDScreen):
                 model_id=model_id if model_id else None
             )
             
+            # 平台或地址可能已变化，丢弃旧的keep-alive连接
+            from services.http_pool import http_pool
+            http_pool.close()
+            
             print(f"[OK] API配置已保存: {self.selected_platform}")
             print(f"  Base URL: {base_url}")
             print(f"  Model ID: {model_id}")
@@ -935,13 +1016,7 @@ class SettingsScreen(MDScreen):
         today = date.today().strftime('%Y-%m-%d')
         
         # 获取今日刷题数量
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT COALESCE(SUM(count), 0) FROM study_records WHERE DATE(record_date) = ?",
-            (today,)
-        )
-        today_count = cursor.fetchone()[0]
+        today_count = self.db.get_total_between(today, today)
         
         confirm_dialog = MDDialog(
             title="⚠️ 确认清除",
@@ -966,32 +1041,8 @@ class SettingsScreen(MDScreen):
             from datetime import date
             today = date.today().strftime('%Y-%m-%d')
             
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # 获取今日每个科目的刷题数
-            cursor.execute("""
-                SELECT subject_id, SUM(count) as today_count 
-                FROM study_records 
-                WHERE DATE(record_date) = ? 
-                GROUP BY subject_id
-            """, (today,))
-            subject_counts = cursor.fetchall()
-            
-            # 从subjects表中减去今日的count
-            for row in subject_counts:
-                cursor.execute("""
-                    UPDATE subjects 
-                    SET total_count = MAX(0, total_count - ?) 
-                    WHERE id = ?
-                """, (row['today_count'], row['subject_id']))
-            
-            # 删除今日所有刷题记录
-            cursor.execute(
-                "DELETE FROM study_records WHERE DATE(record_date) = ?",
-                (today,)
-            )
-            conn.commit()
+            # 删除今日记录并从科目总数中减去（每日汇总由触发器同步）
+            self.db.clear_records_for_date(today)
             
             dialog.dismiss()
             print(f"[OK] 已清除今日({today})数据并更新科目统计")
@@ -1102,22 +1153,8 @@ class SettingsScreen(MDScreen):
     def clear_subject_data(self, subject_id, dialog):
         """清除科目数据"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # 删除该科目的所有刷题记录
-            cursor.execute(
-                "DELETE FROM study_records WHERE subject_id = ?",
-                (subject_id,)
-            )
-            
-            # 重置科目的total_count为0
-            cursor.execute(
-                "UPDATE subjects SET total_count = 0 WHERE id = ?",
-                (subject_id,)
-            )
-            
-            conn.commit()
+            # 删除该科目的所有刷题记录并重置计数
+            self.db.clear_subject_records(subject_id)
             
             dialog.dismiss()
             print(f"[OK] 已清除科目ID={subject_id}的数据并重置计数")
@@ -1158,19 +1195,8 @@ class SettingsScreen(MDScreen):
     def clear_all_data(self, dialog):
         """清除全部数据"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # 删除所有刷题记录
-            cursor.execute("DELETE FROM study_records")
-            
-            # 重置所有科目的total_count为0
-            cursor.execute("UPDATE subjects SET total_count = 0")
-            
-            # 清除所有获得的成就（称号荣誉）
-            cursor.execute("DELETE FROM user_achievements")
-            
-            conn.commit()
+            # 删除所有刷题记录、重置科目计数并清除所有获得的成就（称号荣誉）
+            self.db.clear_all_records(reset_achievements=True)
             
             dialog.dismiss()
             print("[OK] 已清除全部刷题数据、科目计数和所有成就")
@@ -1322,23 +1348,12 @@ class SettingsScreen(MDScreen):
     def save_daily_goals_by_subject(self, *args):
         """保存每日目标（按科目）"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            total = 0
-            # 更新每个科目的每日目标
-            for subject_id, field in self.daily_goal_fields.items():
-                goal = int(field.text) if field.text else 0
-                total += goal
-                cursor.execute(
-                    "UPDATE subjects SET daily_target = ? WHERE id = ?",
-                    (goal, subject_id)
-                )
-            
-            # 更新用户的每日总目标
-            cursor.execute("UPDATE users SET daily_target = ? WHERE id = 1", (total,))
-            
-            conn.commit()
+            # 更新每个科目的每日目标，用户的每日总目标为各科目之和
+            targets = {
+                subject_id: int(field.text) if field.text else 0
+                for subject_id, field in self.daily_goal_fields.items()
+            }
+            total = self.db.save_subject_goals(targets, goal_type='daily')
             
             # 更新按钮显示
             self.daily_goal_label.text = f"题数    {total}"
@@ -1475,23 +1490,12 @@ class SettingsScreen(MDScreen):
     def save_total_goals_by_subject(self, *args):
         """保存终极目标（按科目）"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            total = 0
-            # 更新每个科目的终极目标
-            for subject_id, field in self.total_goal_fields.items():
-                goal = int(field.text) if field.text else 0
-                total += goal
-                cursor.execute(
-                    "UPDATE subjects SET total_target = ? WHERE id = ?",
-                    (goal, subject_id)
-                )
-            
-            # 更新用户的终极总目标
-            cursor.execute("UPDATE users SET total_target = ? WHERE id = 1", (total,))
-            
-            conn.commit()
+            # 更新每个科目的终极目标，用户的终极总目标为各科目之和
+            targets = {
+                subject_id: int(field.text) if field.text else 0
+                for subject_id, field in self.total_goal_fields.items()
+            }
+            total = self.db.save_subject_goals(targets, goal_type='total')
             
             # 更新按钮显示
             self.total_goal_label.text = f"题数    {total}"
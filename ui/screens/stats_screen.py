@@ -18,7 +18,7 @@ from services.stats_service import StatsService
 class HoverableDayBox(HoverBehavior, BoxLayout):
     """可悬停的日期单元格"""
     
-    def __init__(self, day, count, date_color, count_color, bg_color, **kwargs):
+    def __init__(self, day, count, date_color, count_color, bg_color, run_color=None, **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'vertical'
         self.padding = dp(5)  # 增大padding
@@ -47,12 +47,21 @@ class HoverableDayBox(HoverBehavior, BoxLayout):
         with self.canvas.before:
             self.bg_color_instruction = Color(*bg_color)
             self.bg_rect = Rectangle(pos=self.pos, size=self.size)
+            
+            # 连续打卡段下划线
+            self.run_rect = None
+            if run_color:
+                Color(*run_color)
+                self.run_rect = Rectangle(pos=self.pos, size=(self.width, dp(3)))
         
         self.bind(pos=self._update_rect, size=self._update_rect)
     
     def _update_rect(self, *args):
         self.bg_rect.pos = self.pos
         self.bg_rect.size = self.size
+        if self.run_rect:
+            self.run_rect.pos = self.pos
+            self.run_rect.size = (self.width, dp(3))
     
     def on_enter(self, *args):
         """鼠标进入时显示题数"""
@@ -86,6 +95,11 @@ class StatsScreen(MDScreen):
         # 构建UI
         self.build_ui()
     
+    def on_leave(self, *args):
+        """离开页面时取消尚未返回的报告请求"""
+        from services.ai_executor import ai_executor
+        ai_executor.cancel_owner(self)
+    
     def on_enter(self):
         """每次进入页面时刷新数据"""
         print("[INFO] 进入成长轨迹页面，刷新数据...")
@@ -560,27 +574,29 @@ class StatsScreen(MDScreen):
         )
         loading_dialog.open()
         
-        # 异步生成报告
-        import threading
-        from kivy.clock import Clock
+        # 在AI执行器中生成报告（重复点击同一报告时等待同一个结果）
+        from services.ai_service import AIService
+        ai_service = AIService()
         
-        def _generate():
-            try:
-                # 收集数据
-                data = self._collect_report_data(report_type)
-                
-                # 调用AI生成报告
-                report_text = self._call_ai_for_report(report_type, data)
-                
-                # 关闭加载对话框并显示报告
-                Clock.schedule_once(lambda dt: self._show_report(loading_dialog, report_type, report_text), 0)
-                
-            except Exception as err:
-                error_msg = str(err)
-                Clock.schedule_once(lambda dt: self._show_error(loading_dialog, error_msg), 0)
+        def _generate(task):
+            # 收集数据
+            data = self._collect_report_data(report_type)
+            
+            # 调用AI生成报告（流式显示在加载对话框中）
+            def on_partial(content, reasoning):
+                if content and not task.cancelled:
+                    loading_dialog.text = content
+            
+            return self._call_ai_for_report(ai_service, task, report_type, data, on_partial)
+        
+        def _done(report_text, error):
+            # 关闭加载对话框并显示报告（主线程）
+            if error:
+                self._show_error(loading_dialog, error)
+            else:
+                self._show_report(loading_dialog, report_type, report_text)
         
-        thread = threading.Thread(target=_generate)
-        thread.start()
+        ai_service.executor.submit(ai_service.request_key('report', report_type), _generate, _done, owner=self)
     
     def _collect_report_data(self, report_type):
         """收集报告数据"""
@@ -588,8 +604,6 @@ class StatsScreen(MDScreen):
         from database.db_manager import DatabaseManager
         
         db = DatabaseManager()
-        conn = db.get_connection()
-        cursor = conn.cursor()
         
         # 确定时间范围
         now = datetime.now()
@@ -605,34 +619,10 @@ class StatsScreen(MDScreen):
         
         end_date = now.strftime('%Y-%m-%d')
         
-        # 统计总题数
-        cursor.execute("""
-            SELECT COALESCE(SUM(count), 0) as total
-            FROM study_records
-            WHERE DATE(record_date) BETWEEN ? AND ?
-        """, (start_date, end_date))
-        total_count = cursor.fetchone()['total']
-        
-        # 每天的刷题数
-        cursor.execute("""
-            SELECT DATE(record_date) as date, SUM(count) as count
-            FROM study_records
-            WHERE DATE(record_date) BETWEEN ? AND ?
-            GROUP BY DATE(record_date)
-            ORDER BY date
-        """, (start_date, end_date))
-        daily_data = cursor.fetchall()
-        
-        # 每个科目的刷题数
-        cursor.execute("""
-            SELECT s.name, SUM(sr.count) as count
-            FROM study_records sr
-            JOIN subjects s ON sr.subject_id = s.id
-            WHERE DATE(sr.record_date) BETWEEN ? AND ?
-            GROUP BY s.name
-            ORDER BY count DESC
-        """, (start_date, end_date))
-        subject_data = cursor.fetchall()
+        # 统计总题数、每天的刷题数、每个科目的刷题数（按天编号区间查询）
+        total_count = db.get_total_between(start_date, end_date)
+        daily_data = db.get_daily_counts_between(start_date, end_date)
+        subject_data = db.get_subject_counts_between(start_date, end_date)
         
         # 打卡天数
         study_days = len(daily_data)
@@ -655,21 +645,19 @@ class StatsScreen(MDScreen):
             'study_days': study_days,
             'total_days': total_days,
             'avg_daily': avg_daily,
-            'daily_data': [dict(row) for row in daily_data],
-            'subject_data': [dict(row) for row in subject_data]
+            'daily_data': daily_data,
+            'subject_data': subject_data
         }
     
-    def _call_ai_for_report(self, report_type, data):
-        """调用AI生成报告"""
-        from services.ai_service import AIService
-        
-        ai_service = AIService()
-        
+    def _call_ai_for_report(self, ai_service, task, report_type, data, on_partial=None):
+        """调用AI生成报告（提供on_partial时流式生成，请求取消后停止读取，在子线程调用）"""
         # 构建提示词
         prompt = self._build_report_prompt(report_type, data)
         
         # 调用AI
         try:
+            if on_partial:
+                return ai_service.stream_ai_api(prompt, on_partial, cancelled=lambda: task.cancelled)
             report = ai_service.call_ai_api(prompt=prompt)
             return report
         except Exception as e:
@@ -858,18 +846,21 @@ class StatsScreen(MDScreen):
         from datetime import datetime, timedelta
         
         # 获取所有刷题记录
-        conn = self.stats_service.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DATE(record_date) as date, SUM(count) as count
-            FROM study_records
-            GROUP BY DATE(record_date)
-            ORDER BY date DESC
-        """)
-        all_records = {row['date']: row['count'] for row in cursor.fetchall()}
+        all_records = self.stats_service.get_day_totals()
         
         print(f"[DEBUG] 日历弹窗：找到 {len(all_records)} 天的记录")
         
+        # 标记连续打卡段：最佳连续段金色，3天以上的连续段橙色
+        run_marks = {}
+        best_run = self.stats_service.get_best_streak_run()
+        for run in self.stats_service.get_streak_runs(min_length=3):
+            is_best = best_run and run['start_date'] == best_run['start_date']
+            color = (1, 0.76, 0.03, 1) if is_best else (1, 0.55, 0.2, 1)
+            day = datetime.strptime(run['start_date'], '%Y-%m-%d')
+            for _ in range(run['length']):
+                run_marks[day.strftime('%Y-%m-%d')] = color
+                day += timedelta(days=1)
+        
         # 创建包装容器
         wrapper = BoxLayout(
             orientation='vertical',
@@ -913,7 +904,7 @@ class StatsScreen(MDScreen):
             
             while current >= end:
                 # 创建每个月的日历卡片
-                month_card = self.create_month_calendar_card(current, all_records)
+                month_card = self.create_month_calendar_card(current, all_records, run_marks)
                 main_content.add_widget(month_card)
                 
                 # 移动到上个月
@@ -940,8 +931,8 @@ class StatsScreen(MDScreen):
         )
         self.calendar_dialog.open()
     
-    def create_month_calendar_card(self, month_date, all_records):
-        """创建单个月份的日历卡片"""
+    def create_month_calendar_card(self, month_date, all_records, run_marks=None):
+        """创建单个月份的日历卡片（run_marks: 日期 -> 连续打卡段标记颜色）"""
         from datetime import datetime, timedelta
         import calendar
         
@@ -1052,7 +1043,8 @@ class StatsScreen(MDScreen):
                 count=count,
                 date_color=date_color,
                 count_color=count_color,
-                bg_color=bg_colors[level]
+                bg_color=bg_colors[level],
+                run_color=(run_marks or {}).get(date_str)
             )
             
             calendar_grid.add_widget(day_box)
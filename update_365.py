@@ -1,22 +1,10 @@
-"""快速更新365天成就名字"""
+"""查看365天成就名字（更名已并入数据库迁移 v5）"""
 from database.db_manager import DatabaseManager
-import json
 
 db = DatabaseManager()
 conn = db.get_connection()
 cursor = conn.cursor()
 
-print("🔄 更新365天成就名字...")
-
-# 更新365天成就
-cursor.execute("""
-    UPDATE achievements 
-    SET name = '年度传奇' 
-    WHERE type = 'STREAK' AND json_extract(condition, '$.streak_days') = 365
-""")
-
-conn.commit()
-
 # 验证
 cursor.execute("""
     SELECT name, json_extract(condition, '$.streak_days') as days 
@@ -26,7 +14,7 @@ cursor.execute("""
 
 result = cursor.fetchone()
 if result:
-    print(f"✅ 更新成功！365天成就现在是：{result['name']}")
+    print(f"✅ 365天成就现在是：{result['name']}")
 else:
     print("❌ 未找到365天成就")
 